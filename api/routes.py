@@ -1,25 +1,42 @@
 from services.summarizer import generate_summary_and_themes
 
-from fastapi import APIRouter, Query, UploadFile, File
+from fastapi import APIRouter, Query, Request, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
+from starlette.formparsers import MultiPartParser, MultiPartException
 
-from services.video_search import search_youtube_video
-from services.transcript import get_video_transcript
+from services.video_search import search_youtube_video, extract_videoid, video_id_from_query
+from services.transcript import get_video_transcript, prewarm_transcripts, has_transcript
+from services.transcript_store import transcript_store
+from services.batch import batch_store, create_batch, run_batch, follow_batch, BatchError
+from services.incremental import watch_store, submit_refresh, WATCH_INTERVAL, WATCH_MIN_INTERVAL
 
-from services.text_to_speech import text_to_speech
-from services.speech_to_text import speech_to_text  
+from services.speech_to_text import save_upload, transcribe_stream, UploadTooLargeError, STT_MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+from services.media_pool import media_pool, MediaPoolBusyError
+from services.cache import result_cache
+from services.search_cache import search_cache, normalize_query
+from services.coalesce import coalescing_stats
+from services.text_to_speech import stream_audio, AUDIO_DIR
+from services.pipeline import run_pipeline, cached_summary, store_summary, attach_audio, EventCallback
+from services.jobs import job_queue, batch_queue, job_store, QueueFullError, ProgressCallback, ACTIVE_STATUSES
+from services.metrics import registry, span, Family
+from services.profiler import PROFILING_ENABLED, PROFILE_DIR
+from services.circuit import CircuitOpenError, circuit_stats
+from services.health import lifecycle, readiness
 
-import speech_recognition as sr
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from pydub import AudioSegment
-from groq import Groq
+from typing import Literal
+from services.rate_limit import groq_chat_completion, groq_limiter, use_priority, PRIORITY_BACKGROUND
+from services.budget import PromptBudget, BudgetExceededError, AGENT_TRANSCRIPT_TOKENS
+from services.tokens import extract_key_sentences
+from groq import RateLimitError
 import logging
+import asyncio
 import json
 import re
 import os
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -32,6 +49,26 @@ class VideoSummaryResponse(BaseModel):
     key_themes: str
     audio: str | None
     error: str | None = None
+    fallback: bool = False  # Summarized by the local English-only models while Groq was unavailable
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class BatchRequest(BaseModel):
+    videos: list[str] = []  # Video IDs or YouTube links
+    playlist: str | None = None  # Playlist ID or link, expanded into its videos
+    tts: bool = False
+    language: str | None = None
+
+class PrewarmRequest(BaseModel):
+    videos: list[str]  # Video IDs or YouTube links
+
+class WatchRequest(BaseModel):
+    video: str  # Video ID or YouTube link of a live stream, premiere or video whose captions change
+    language: str | None = None
+    interval: int = WATCH_INTERVAL  # Seconds between refreshes
 
 tools = [
     {
@@ -99,31 +136,242 @@ tools = [
     }
 ]
 
-def extract_videoid(url: str) -> str:
-    """Extract YouTube video ID from URL"""
-    regex = r"(?:v=|/)([0-9A-Za-z-]{11}).*"
-    match = re.search(regex, url)
-    return match.group(1) if match else None
+SSE_HEARTBEAT = 15  # Seconds between keep-alive comments on an idle event stream
+SSE_AUDIO_TIMEOUT = 300  # Seconds an event stream waits for audio synthesis before giving up
+
+async def summarize(query: str, tts: bool, language: str | None, mode: str, progress: ProgressCallback | None = None,
+                    emit: EventCallback | None = None) -> dict:
+    """Summarize a YouTube video, serving repeat requests from the result cache."""
+    video_id = video_id_from_query(query)
+    known = None
+    if not video_id:
+        known = search_cache.lookup(query, count_misses=False)
+        video_id = extract_videoid(known[0]["link"]) if known else None
+    if video_id:
+        cached = await cached_summary(video_id, language, tts)
+        if cached:
+            return cached
+
+    if mode == "agent":
+        with span("agent"):
+            response, video_id, summary_language = await summarize_with_agent(query, tts, language)
+        result = response.model_dump()
+    else:
+        with span("pipeline"):
+            # A search cache hit is passed on, so the pipeline neither searches nor counts the hit again.
+            result, video_id, summary_language = await run_pipeline(query, tts, language, progress, emit, known[0] if known else None)
+    if video_id:
+        store_summary(video_id, language, result, summary_language)
+    return result
+
+async def summarize_job(payload: dict, report: ProgressCallback) -> dict:
+    """Job handler for /summarize/?background=true."""
+    with use_priority(PRIORITY_BACKGROUND):
+        return await summarize(payload["query"], payload["tts"], payload["language"], payload["mode"], report)
+
+job_queue.register("summarize", summarize_job)
+
+def queue_full(e: QueueFullError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+@router.get("/summarize/", response_model=VideoSummaryResponse | JobResponse)
+async def summarize_video(
+    query: str = Query(..., min_length=1, description="Video title or search prompt"),
+    tts: bool = Query(False),
+    language: str | None = Query(None, description="Summary language; detected from the transcript when omitted"),
+    mode: Literal["pipeline", "agent"] = Query("pipeline", description="'pipeline' runs search, transcript and summary directly; 'agent' lets the LLM drive the tools for ambiguous prompts"),
+    background: bool = Query(False, description="Return a job ID immediately and poll /jobs/{job_id} for the result")
+):
+    """Summarize a YouTube video, either inline or as a background job."""
+    if not background:
+        return VideoSummaryResponse(**await summarize(query, tts, language, mode))
+
+    payload = {"query": query, "tts": tts, "language": language, "mode": mode}
+    try:
+        job_id = job_queue.submit("summarize", payload)
+    except QueueFullError as e:
+        raise queue_full(e)
+    job = JobResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+    return JSONResponse(status_code=202, content=job.model_dump())
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def summary_events(query: str, tts: bool, language: str | None):
+    """Run the pipeline and yield its stage events, the final result and, when requested, audio readiness."""
+    events = asyncio.Queue()
+    emit = lambda event, data: events.put_nowait((event, data))
+    progress = lambda fraction, message: emit("status", {"progress": fraction, "message": message})
+    task = asyncio.create_task(summarize(query, tts, language, "pipeline", progress, emit))
+    try:
+        while not task.done() or not events.empty():
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({getter, task}, timeout=SSE_HEARTBEAT, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield sse_event(*getter.result())
+            else:
+                getter.cancel()
+                if not done:
+                    yield ": keep-alive\n\n"
+        try:
+            result = task.result()
+        except Exception as e:
+            logger.error(f"Streaming summary failed: {str(e)}")
+            yield sse_event("error", {"error": f"Failed to summarize: {str(e)}"})
+            return
+        yield sse_event("result", VideoSummaryResponse(**result).model_dump())
+
+        if result.get("audio"):
+            file_name = result["audio"].split("/")[-1]
+            announced_stream = False
+            waited = 0.0
+            while waited < SSE_AUDIO_TIMEOUT and not lifecycle.draining:
+                job = audio_job(file_name)
+                if job and job["status"] in ACTIVE_STATUSES:
+                    if job["status"] == "running" and not announced_stream:
+                        yield sse_event("audio", {"status": "streaming", "audio_url": f"/stream-audio/{file_name}"})
+                        announced_stream = True
+                elif os.path.exists(os.path.join(AUDIO_DIR, file_name)):
+                    yield sse_event("audio", {"status": "ready", "audio_url": result["audio"]})
+                    break
+                else:
+                    yield sse_event("audio", {"status": "failed", "error": job["error"] if job else "Audio not found."})
+                    break
+                await asyncio.sleep(0.5)
+                waited += 0.5
+            if lifecycle.draining:
+                # This worker is shutting down; the audio is still served once ready, so tell the client to poll.
+                yield sse_event("audio", {"status": "pending", "audio_url": result["audio"], "status_url": f"/audio-status/{file_name}"})
+        yield sse_event("done", {})
+    finally:
+        task.cancel()  # The client disconnected; coalesced upstream calls keep serving any other waiters
+
+@router.get("/summarize/stream")
+async def summarize_video_stream(
+    query: str = Query(..., min_length=1, description="Video title or search prompt"),
+    tts: bool = Query(False),
+    language: str | None = Query(None, description="Summary language; detected from the transcript when omitted")
+):
+    """Summarize a YouTube video as server-sent events, streaming each stage and the summary tokens as they arrive.
 
-@router.get("/summarize/", response_model=VideoSummaryResponse)
-async def summarize_video(query: str = Query(..., min_length=1, description="Video title or search prompt"), tts: bool = Query(False)):
-    """Summarize a YouTube video autonomously using AI-driven function calling."""
+    Events: status, video, transcript, token, summary, result, audio, error and finally done.
+    """
+    return StreamingResponse(
+        summary_events(query, tts, language),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def batch_job(payload: dict, report: ProgressCallback) -> dict:
+    """Job handler for /summarize/batch."""
+    return await run_batch(payload["batch_id"], progress=report)
+
+batch_queue.register("batch", batch_job)
+
+def start_batch(batch_id: str) -> None:
+    """Queue a batch run unless one is already queued or running, here or in another process."""
+    if not batch_store.claim(batch_id):
+        return
+    job = job_store.find_by_artifact(f"batch:{batch_id}")
+    if job and job["status"] in ACTIVE_STATUSES:
+        return
+    try:
+        batch_queue.submit("batch", {"batch_id": batch_id}, artifact=f"batch:{batch_id}")
+    except QueueFullError as e:
+        batch_store.release(batch_id)
+        raise queue_full(e)
+
+async def batch_lines(batch_id: str):
+    """NDJSON stream of a batch: a header line, one line per finished video, and a final status line."""
+    batch = batch_store.get(batch_id)
+    yield json.dumps({"batch_id": batch_id, "total": batch["total"], "status_url": f"/summarize/batch/{batch_id}"}) + "\n"
+    async for item in follow_batch(batch_id):
+        yield json.dumps(item) + "\n"
+
+def batch_response(batch_id: str) -> StreamingResponse:
+    return StreamingResponse(batch_lines(batch_id), media_type="application/x-ndjson")
+
+@router.post("/summarize/batch")
+async def summarize_batch(request: BatchRequest):
+    """Summarize many videos or a playlist as one background run, streaming each result as NDJSON when it finishes.
+
+    The run continues if the client disconnects; reconnect with GET /summarize/batch/{batch_id}.
+    """
+    try:
+        batch_id = await create_batch(request.videos, request.playlist, request.tts, request.language)
+    except BatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    start_batch(batch_id)
+    return batch_response(batch_id)
+
+@router.get("/summarize/batch/{batch_id}")
+async def follow_batch_route(batch_id: str):
+    """Stream a batch's finished results as NDJSON, then follow it until it completes."""
+    if batch_store.get(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return batch_response(batch_id)
+
+@router.post("/summarize/batch/{batch_id}/resume")
+async def resume_batch(batch_id: str, retry_failed: bool = Query(False, description="Also retry items that failed")):
+    """Continue an interrupted batch from its unfinished items, streaming results as NDJSON."""
+    batch = batch_store.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    if retry_failed and not batch["running"]:
+        batch_store.reset_failed(batch_id)
+    start_batch(batch_id)
+    return batch_response(batch_id)
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Report a job's state, progress, ETA and, once finished, its result."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return (batch_queue if batch_queue.handles(job["kind"]) else job_queue).describe(job)
+
+async def summarize_with_agent(query: str, tts: bool, language: str | None) -> tuple[VideoSummaryResponse, str | None, str]:
+    """Summarize a YouTube video autonomously using AI-driven function calling.
+
+    Returns the response together with the video ID to cache it under (None when the response came
+    from the cache or was written from the title alone) and the language the summary was written in.
+    When the conversation outgrows the context window, the deterministic pipeline summarizes instead.
+    """
     messages = [
         {"role": "system", "content": "You are an autonomous YouTube video summarizer. Use the provided tools to search for a video, extract its transcript, and generate a summary with themes. If the transcript is unavailable, use the video title to generate a summary. Optionally convert the summary to audio if requested. Return the final result as a JSON object with 'title', 'channel', 'link', 'summary', 'sentiment', 'key_themes', and 'audio' (if requested). Do not ask for manual input; proceed with available data."},
         {"role": "user", "content": f"Summarize the YouTube video titled '{query}'.{' Convert the summary to audio.' if tts else ''}"}
     ]
 
-    result = {"title": "N/A", "channel": None, "link": "", "summary": "", "sentiment": "N/A", "key_themes": "", "audio": None, "error": None}
     max_attempts = 3
+    budget = PromptBudget(tools)
+    try:
+        return await run_agent_loop(query, tts, language, messages, budget, max_attempts)
+    except BudgetExceededError as e:
+        logger.warning(f"Agent stopped: {str(e)} Falling back to the pipeline.")
+        result, video_id, summary_language = await run_pipeline(query, tts, language)
+        return VideoSummaryResponse(**result), video_id, summary_language
+    finally:
+        logger.info(f"Agent sent {budget.report()['prompt_tokens']} prompt tokens in {len(budget.sent)} requests")
+
+async def run_agent_loop(query: str, tts: bool, language: str | None, messages: list[dict], budget: PromptBudget,
+                         max_attempts: int) -> tuple[VideoSummaryResponse, str | None, str]:
+    """The tool-calling loop of summarize_with_agent, keeping every request within the token budget."""
+    result = {"title": "N/A", "channel": None, "link": "", "summary": "", "sentiment": "N/A", "key_themes": "", "audio": None, "error": None}
+    video_id = None
+    transcript, transcript_language = None, None
+    summary_language = language or "en"
 
     for attempt in range(max_attempts):
         try:
-            response = client.chat.completions.create(
+            messages[:] = budget.fit(messages)
+            budget.record(messages)
+            response = await groq_chat_completion(
                 model="llama3-70b-8192",
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
-                max_tokens=4096
+                max_tokens=budget.max_tokens(messages)
             )
             tool_calls = response.choices[0].message.tool_calls
 
@@ -133,12 +381,13 @@ async def summarize_video(query: str = Query(..., min_length=1, description="Vid
                         final_result = json.loads(response.choices[0].message.content)
                         result.update(final_result)
                         if result["summary"]:
-                            return VideoSummaryResponse(**result)
+                            cache_id = video_id if transcript and has_transcript(transcript) else None
+                            return VideoSummaryResponse(**result), cache_id, summary_language
                     except json.JSONDecodeError:
-                        messages.append({"role": "assistant", "content": f"Error parsing response: {response.choices[0].message.content}"})
+                        budget.add_retry_note(messages, "My previous reply was not valid JSON. I will call a tool or return only the JSON object.")
                         continue
                 else:
-                    messages.append({"role": "assistant", "content": "No tool call or content received."})
+                    budget.add_retry_note(messages, "No tool call or content received.")
                     continue
 
             for tool_call in tool_calls:
@@ -146,127 +395,396 @@ async def summarize_video(query: str = Query(..., min_length=1, description="Vid
                 args = json.loads(tool_call.function.arguments)
 
                 if func_name == "search_youtube_video":
-                    search_result = search_youtube_video(args.get("query", ""))
+                    search_query = args.get("query", "")
+                    search_result = await search_youtube_video(search_query)
                     if "error" in search_result:
                         result["error"] = search_result["error"]
-                        return VideoSummaryResponse(**result)
+                        return VideoSummaryResponse(**result), video_id, summary_language
                     result.update(search_result)
                     video_id = extract_videoid(search_result["link"])
-                    messages.append({"role": "assistant", "content": f"Found video: {json.dumps(search_result)}"})
+                    if video_id:
+                        if normalize_query(search_query) != normalize_query(query):
+                            # The agent rephrased the request; remember the user's wording too so a repeat skips the agent.
+                            search_cache.store(query, [search_result])
+                        cached = await cached_summary(video_id, language, tts)
+                        if cached:
+                            return VideoSummaryResponse(**cached), None, summary_language
+                    messages.append({"role": "assistant", "content": f"Found video: {json.dumps(search_result, separators=(',', ':'))}"})
                     messages.append({"role": "user", "content": f"Extract transcript for video ID: {video_id}"})
 
                 elif func_name == "get_video_transcript":
-                    transcript, language = get_video_transcript(args["video_id"])
-                    messages.append({"role": "assistant", "content": f"Transcript: {transcript[:6000]} (Language: {language})"})
-                    if "Transcript error" in transcript:
+                    transcript, transcript_language = await get_video_transcript(args["video_id"])
+                    # The agent only needs the gist to choose its next step; the summary is generated from the full text.
+                    excerpt = extract_key_sentences(transcript, min(AGENT_TRANSCRIPT_TOKENS, max(budget.available(messages) - 100, 0)))
+                    messages.append({"role": "assistant", "content": f"Transcript: {excerpt} (Language: {transcript_language})"})
+                    if not has_transcript(transcript):
                         messages.append({"role": "user", "content": f"Transcript is unavailable. Generate a summary using only the title: '{result['title']}'"})
                     else:
-                        messages.append({"role": "user", "content": f"Generate summary and themes from this video with title '{result['title']}' in language '{language}'"})
+                        messages.append({"role": "user", "content": f"Generate summary and themes from this video with title '{result['title']}' in language '{language or transcript_language}'"})
 
                 elif func_name == "generate_summary_and_themes":
-                    summary_data = generate_summary_and_themes(args.get("text", ""), args.get("title", ""), language=args.get("language", "en"))
+                    # The model only saw a preview of the transcript, so summarize the full text fetched above.
+                    text = transcript or args.get("text", "")
+                    summary_data = await generate_summary_and_themes(text, args.get("title") or result["title"], language=language or transcript_language or args.get("language", "en"))
+                    summary_language = summary_data["language"]
                     result["summary"] = summary_data["summary"]
                     result["sentiment"] = summary_data["sentiment"]
                     result["key_themes"] = summary_data["key_themes"]
+                    result["fallback"] = summary_data.get("fallback", False)
                     if tts:
-                        audio_path = text_to_speech(summary_data["summary"], language=summary_data["language"])
-                        logger.info(f"Assigned audio path: {audio_path}")
-                        result["audio"] = audio_path if audio_path else "/static/summary.mp3"
+                        attach_audio(result, summary_data["language"])
                     if result["summary"]:
-                        return VideoSummaryResponse(**result)
+                        cache_id = video_id if has_transcript(text) else None  # Title-only summaries are not cached
+                        return VideoSummaryResponse(**result), cache_id, summary_language
 
                 elif func_name == "text_to_speech":
-                    audio_path = text_to_speech(result["summary"], language="en")  # Fallback to English if not specified
-                    logger.info(f"Assigned audio path: {audio_path}")
-                    result["audio"] = audio_path if audio_path else "/static/summary.mp3"
+                    attach_audio(result, summary_language)
                     if result["summary"]:
-                        return VideoSummaryResponse(**result)
+                        return VideoSummaryResponse(**result), video_id, summary_language
 
                 elif func_name == "speech_to_text":
                     messages.append({"role": "assistant", "content": "Speech-to-text is processed client-side."})
 
-        except HTTPStatusError as e:
-            if e.response.status_code == 429:
-                retry_after = int(e.response.headers.get("Retry-After", 1))  # Default to 1s if header missing
-                logger.warning(f"429 Too Many Requests received. Waiting {retry_after} seconds before retry {attempt + 1}/{max_attempts}.")
-                if attempt == max_attempts - 1:
-                    result["error"] = f"Failed after {max_attempts} attempts: Rate limit exceeded."
-                    return VideoSummaryResponse(**result)
-                time.sleep(retry_after)
-                continue
-            else:
-                logger.error(f"HTTP error: {str(e)}")
-                result["error"] = f"HTTP error: {str(e)}"
-                return VideoSummaryResponse(**result)
+        except RateLimitError:
+            # groq_chat_completion already waited out every Retry-After it was given.
+            logger.error("Groq rate limit persisted through all retries.")
+            result["error"] = "Failed to summarize: Groq rate limit exceeded. Please try again later."
+            return VideoSummaryResponse(**result), video_id, summary_language
+        except CircuitOpenError as e:
+            result["error"] = f"Failed to summarize: {str(e)}"
+            return VideoSummaryResponse(**result), video_id, summary_language
+        except BudgetExceededError:
+            raise  # Retrying would send the same oversized prompt
         except Exception as e:
             logger.warning(f"API error: {str(e)}. Waiting before retry {attempt + 1}/{max_attempts}.")
             if attempt == max_attempts - 1:
                 result["error"] = f"Failed after {max_attempts} attempts: {str(e)}"
-                return VideoSummaryResponse(**result)
-            time.sleep(2 ** attempt)  # Fallback exponential backoff for non-429 errors
+                return VideoSummaryResponse(**result), video_id, summary_language
+            await asyncio.sleep(2 ** attempt)  # Fallback exponential backoff for non-429 errors
             continue
 
     if not result["summary"]:
         result["error"] = "Failed to generate summary after all attempts."
-    return VideoSummaryResponse(**result)
+    return VideoSummaryResponse(**result), video_id, summary_language
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Report result cache hit/miss counters."""
+    return result_cache.stats()
+
+@router.delete("/cache/")
+async def clear_cache():
+    """Invalidate every cached summary."""
+    return {"invalidated": result_cache.invalidate()}
+
+@router.get("/search/stats")
+async def search_stats():
+    """Report search cache hits (exact and fuzzy), misses and links that skipped search."""
+    return search_cache.stats()
+
+@router.delete("/search/cache")
+async def clear_search_cache():
+    """Forget every cached search result and known title."""
+    return {"invalidated": search_cache.invalidate()}
+
+@router.delete("/cache/{video_id}")
+async def invalidate_cached_video(video_id: str):
+    """Invalidate all cached summaries of a single video."""
+    return {"invalidated": result_cache.invalidate(video_id)}
+
+async def prewarm_job(payload: dict, report: ProgressCallback) -> dict:
+    """Job handler for /transcripts/prewarm."""
+    return await prewarm_transcripts(payload["video_ids"], progress=report)
+
+job_queue.register("prewarm_transcripts", prewarm_job)
+
+@router.post("/transcripts/prewarm", response_model=JobResponse, status_code=202)
+async def prewarm_transcripts_route(request: PrewarmRequest):
+    """Fetch and store transcripts for a list of videos in the background."""
+    video_ids = [video_id_from_query(video) or extract_videoid(video) or video for video in request.videos]
+    invalid = [video for video in video_ids if not re.fullmatch(r"[0-9A-Za-z_-]{11}", video)]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Not a video ID or link: {', '.join(invalid[:5])}")
+    try:
+        job_id = job_queue.submit("prewarm_transcripts", {"video_ids": video_ids})
+    except QueueFullError as e:
+        raise queue_full(e)
+    return JobResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+
+@router.get("/transcripts/stats")
+async def transcript_stats():
+    """Report transcript store hits, size and languages."""
+    return transcript_store.stats()
+
+@router.delete("/transcripts/{video_id}")
+async def invalidate_transcript(video_id: str):
+    """Drop a stored transcript so the next request fetches it again."""
+    return {"invalidated": transcript_store.invalidate(video_id)}
+
+def watched_video_id(video: str) -> str:
+    video_id = video_id_from_query(video) or extract_videoid(video) or video
+    if not re.fullmatch(r"[0-9A-Za-z_-]{11}", video_id):
+        raise HTTPException(status_code=422, detail=f"Not a video ID or link: {video}")
+    return video_id
+
+@router.post("/watch", status_code=201)
+async def watch_video(request: WatchRequest):
+    """Keep a video's summary up to date by summarizing its new captions every `interval` seconds."""
+    if request.interval < WATCH_MIN_INTERVAL:
+        raise HTTPException(status_code=422, detail=f"Interval must be at least {WATCH_MIN_INTERVAL} seconds.")
+    return watch_store.add(watched_video_id(request.video), request.language, request.interval)
+
+@router.get("/watch")
+async def list_watches():
+    """List watched videos with their schedule and last refresh outcome."""
+    return watch_store.all()
+
+@router.get("/watch/{video_id}")
+async def get_watch(video_id: str):
+    """Report a watched video's schedule, its rolling summary and how many segments that covers."""
+    watch = watch_store.get(video_id)
+    if watch is None:
+        raise HTTPException(status_code=404, detail="Watch not found.")
+    progress = transcript_store.get_progress(video_id, watch["language"] or watch["summary_language"] or "")
+    watch["summarized_segments"] = progress["segment_count"] if progress else 0
+    watch["summary"] = progress["summary"] if progress else None
+    return watch
+
+@router.delete("/watch/{video_id}")
+async def unwatch_video(video_id: str):
+    """Stop refreshing a video's summary; the last summary stays cached."""
+    return {"removed": watch_store.remove(video_id)}
+
+@router.post("/watch/{video_id}/refresh", response_model=JobResponse, status_code=202)
+async def refresh_watched_video(video_id: str, language: str | None = Query(None, description="Summary language; detected when omitted")):
+    """Summarize a video's new captions now, watched or not, as a background job."""
+    video_id = watched_video_id(video_id)
+    watch = watch_store.get(video_id)
+    try:
+        job_id = submit_refresh(video_id, language or (watch["language"] if watch else None))
+    except QueueFullError as e:
+        raise queue_full(e)
+    return JobResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+
+def audio_job(file_name: str) -> dict | None:
+    """Latest synthesis job for an audio file, with progress and ETA."""
+    job = job_store.find_by_artifact(file_name)
+    return job_queue.describe(job) if job else None
+
+@router.get("/rate-limit/stats")
+async def rate_limit_stats():
+    """Report the Groq quota the limiter sees, queued callers and how often Groq pushed back."""
+    return groq_limiter.snapshot()
+
+@router.get("/media/stats")
+async def media_stats():
+    """Report media worker pool occupancy, rejections, timeouts and worker restarts."""
+    return media_pool.snapshot()
+
+@router.get("/coalescing/stats")
+async def coalescing_stats_route():
+    """Report how many upstream calls request coalescing saved, per call site."""
+    return coalescing_stats()
+
+def service_metrics() -> list[Family]:
+    """The stats the services already keep, as Prometheus families: cache hit rates, queue depths, pools."""
+    cache = result_cache.stats()
+    searches = search_cache.stats()
+    transcripts = transcript_store.stats()
+    watches = watch_store.stats()
+    limiter = groq_limiter.snapshot()
+    media = media_pool.snapshot()
+    flights = coalescing_stats()
+    circuits = circuit_stats()
+    return [
+        ("summary_cache_lookups_total", "counter", "Summary cache lookups by result.",
+         [({"result": "memory_hit"}, cache["memory_hits"]), ({"result": "disk_hit"}, cache["disk_hits"]),
+          ({"result": "miss"}, cache["misses"])]),
+        ("summary_cache_stale_hits_total", "counter", "Cache hits served stale while revalidating.", [({}, cache["stale_hits"])]),
+        ("summary_cache_entries", "gauge", "Cached summaries by tier.",
+         [({"tier": "memory"}, cache["memory_entries"]), ({"tier": "disk"}, cache["disk_entries"])]),
+        ("search_cache_lookups_total", "counter", "Search cache lookups by result; links never reach the cache or SerpApi.",
+         [({"result": "hit"}, searches["hits"]), ({"result": "fuzzy_hit"}, searches["fuzzy_hits"]),
+          ({"result": "expired"}, searches["expired"]), ({"result": "miss"}, searches["misses"]), ({"result": "link"}, searches["links"])]),
+        ("transcript_store_lookups_total", "counter", "Transcript store lookups by result.",
+         [({"result": "hit"}, transcripts["hits"]), ({"result": "miss"}, transcripts["misses"])]),
+        ("transcript_store_entries", "gauge", "Stored transcripts.", [({}, transcripts["transcripts"])]),
+        ("watched_videos", "gauge", "Watched videos by state; paused watches stopped finding new captions.",
+         [({"state": "active"}, watches["active"]), ({"state": "paused"}, watches["paused"])]),
+        ("job_queue_depth", "gauge", "Jobs waiting for a job worker, by queue; batches have their own.",
+         [({"queue": "jobs"}, job_queue.depth()), ({"queue": "batches"}, batch_queue.depth())]),
+        ("groq_quota_waiting", "gauge", "Callers waiting for Groq quota.", [({}, limiter["waiting"])]),
+        ("groq_quota_available_tokens", "gauge", "Tokens the limiter can grant right now.", [({}, limiter["available_tokens"])]),
+        ("groq_rate_limited_total", "counter", "429 responses from Groq.", [({}, limiter["rate_limited"])]),
+        ("media_pool_in_flight", "gauge", "Media tasks running or queued.", [({}, media["in_flight"])]),
+        ("media_pool_rejected_total", "counter", "Media tasks refused because the pool queue was full.", [({}, media["rejected"])]),
+        ("media_pool_timeouts_total", "counter", "Media tasks that timed out.", [({}, media["timeouts"])]),
+        ("circuit_open", "gauge", "1 while an upstream's circuit is open (failing fast).",
+         [({"upstream": name}, stats["state"] == "open") for name, stats in circuits.items()]),
+        ("circuit_rejected_total", "counter", "Calls refused by an open circuit.",
+         [({"upstream": name}, stats["rejected"]) for name, stats in circuits.items()]),
+        ("coalesced_calls_total", "counter", "Calls served by an identical call already in flight.",
+         [({"flight": name}, stats["coalesced"]) for name, stats in flights.items()]),
+        ("coalescing_in_flight", "gauge", "Distinct upstream calls in flight.",
+         [({"flight": name}, stats["in_flight"]) for name, stats in flights.items()]),
+    ]
+
+registry.register_collector(service_metrics)
+
+@router.get("/healthz")
+async def liveness():
+    """Liveness: the worker's event loop is answering. Deliberately checks nothing else."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@router.get("/readyz")
+async def readiness_route(strict: bool = Query(False, description="Also fail when an upstream is unreachable or its circuit is open")):
+    """Readiness: started, not draining, job store usable and models warmed, with upstream reachability."""
+    ready, report = await readiness(strict)
+    return JSONResponse(status_code=200 if ready else 503, content=report)
+
+@router.get("/circuits/stats")
+async def circuits_stats():
+    """Report each upstream's circuit breaker state and how many calls it refused."""
+    return circuit_stats()
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics of this worker process: stage and upstream latency histograms, tokens, caches, queues."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Collapsed-stack profile of a request made with ?profile=1 (needs PROFILING_ENABLED)."""
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    if not PROFILING_ENABLED or not re.fullmatch(r"[A-Za-z0-9._-]{1,64}", profile_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="text/plain")
 
 # ✅ Audio Status
 @router.get("/audio-status/{file_name}")
 async def check_audio_status(file_name: str):
-    """Check if the audio file has been fully generated."""
+    """Report whether the audio file is queued, being synthesized, ready or failed."""
     file_path = f"static/{file_name}"
+    job = audio_job(file_name)
+    if job and job["status"] in ACTIVE_STATUSES:
+        return {"status": "processing", "job_status": job["status"], "progress": job["progress"], "eta_seconds": job["eta_seconds"]}
     if os.path.exists(file_path):
         return {"status": "ready", "audio_url": f"/static/{file_name}"}
-    return {"status": "processing"}
+    if job and job["status"] == "failed":
+        return {"status": "failed", "error": job["error"]}
+    return {"status": "not_found"}
 
 # ✅ Audio Download Handling
 @router.get("/download-audio/{file_name}")
 async def download_audio(file_name: str):
     """Check if the audio file is fully generated before allowing downloads."""
     file_path = f"static/{file_name}"
-    temp_status = f"{file_path}.status"
+    job = audio_job(file_name)
 
-    if os.path.exists(temp_status):
-        return {"error": "Audio is still being processed. Please check later."}
+    if job and job["status"] in ACTIVE_STATUSES:
+        return {"error": "Audio is still being processed. Please check later.", "progress": job["progress"], "eta_seconds": job["eta_seconds"]}
     
     if os.path.exists(file_path):
         return {"audio_url": f"/static/{file_name}"}
     
     return {"error": "Audio file not found."}
 
-@router.post("/speech-to-text/")
-async def speech_to_text(file: UploadFile = File(...)):
-    """Convert uploaded speech to text using Google's free Speech Recognition API."""
-    try:
-        os.makedirs("uploads", exist_ok=True)
-        input_audio_path = f"uploads/{file.filename}"
-        output_wav_path = f"uploads/{os.path.splitext(file.filename)[0]}.wav"
+@router.get("/stream-audio/{file_name}")
+async def stream_audio_file(file_name: str):
+    """Stream an audio file as MP3 chunks, starting while it is still being synthesized."""
+    if not re.fullmatch(r"tts-[0-9a-f]{24}\.mp3", file_name):
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+    file_path = os.path.join(AUDIO_DIR, file_name)
+    job = audio_job(file_name)
+    pending = job is not None and job["status"] in ACTIVE_STATUSES
+    if not pending and not os.path.exists(file_path) and not os.path.exists(f"{file_path}.part"):
+        raise HTTPException(status_code=404, detail="Audio file not found.")
+    return StreamingResponse(stream_audio(file_name), media_type="audio/mpeg")
+
+async def limited_body(request: Request, max_bytes: int):
+    """The request body as it arrives, raising UploadTooLargeError once more than `max_bytes` came in.
 
-        # Save uploaded audio
-        with open(input_audio_path, "wb") as audio_file:
-            audio_file.write(await file.read())
+    Content-Length cannot be relied on: chunked uploads do not send one.
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise UploadTooLargeError(f"Audio upload exceeds {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+        yield chunk
 
-        # Convert to WAV (mono, 16kHz) for better recognition
+async def upload_chunks(request: Request):
+    """The audio bytes of a request: the 'file' part of a multipart form, or the raw body."""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # Parsed from the size-limited body rather than request.form(), which would spool any amount to disk.
+        body = limited_body(request, STT_MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE)  # Room for the form's own fields
         try:
-            audio = AudioSegment.from_file(input_audio_path)
-            audio = audio.set_channels(1).set_frame_rate(16000)
-            audio.export(output_wav_path, format="wav")
-        except Exception as e:
-            return {"error": f"Audio conversion failed: {str(e)}"}
+            form = await MultiPartParser(request.headers, body).parse()  # File parts are spooled to disk beyond 1 MB
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        try:
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=422, detail="Expected an audio file in the 'file' field.")
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await form.close()
+    else:
+        async for chunk in request.stream():
+            yield chunk
+
+@router.post("/speech-to-text/")
+async def speech_to_text(
+    request: Request,
+    stream: bool = Query(False, description="Stream partial transcripts as NDJSON while long recordings are recognized")
+):
+    """Convert uploaded speech to text using Google's free Speech Recognition API.
 
-        # Recognize speech
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(output_wav_path) as source:
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            audio_data = recognizer.record(source, duration=60)  # Limit to first 60 seconds
+    Accepts a multipart form with a 'file' field or a raw audio body (WAV, or anything ffmpeg decodes).
+    The upload is written to a unique temporary file in chunks, decoded and resampled to 16 kHz mono
+    as a stream, and recognized in chunks; the file is removed afterwards.
+    """
+    import speech_recognition as sr  # Audio libraries are only imported when speech input is actually used
 
-        transcribed_text = recognizer.recognize_google(audio_data)
+    if int(request.headers.get("content-length") or 0) > STT_MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Audio upload exceeds {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+    try:
+        path = await save_upload(upload_chunks(request))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        return {"text": transcribed_text}
+    if stream:
+        async def partials():
+            texts = []
+            try:
+                async for partial in transcribe_stream(path):
+                    texts.append(partial["text"])
+                    yield json.dumps(partial) + "\n"
+                yield json.dumps({"text": " ".join(text for text in texts if text)}) + "\n"
+            except asyncio.TimeoutError:
+                yield json.dumps({"error": "Decoding the audio took too long."}) + "\n"
+            except sr.RequestError:
+                yield json.dumps({"error": "Could not request results from Google's API. Try again later."}) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": f"Failed to process speech: {str(e)}"}) + "\n"
+            finally:
+                os.remove(path)
+        return StreamingResponse(partials(), media_type="application/x-ndjson")
 
-    except sr.UnknownValueError:
-        return {"error": "Could not understand the audio."}
+    try:
+        texts = [partial["text"] async for partial in transcribe_stream(path)]
+        transcribed_text = " ".join(text for text in texts if text)
+        if not transcribed_text:
+            return {"error": "Could not understand the audio."}
+        return {"text": transcribed_text}
+    except MediaPoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        return {"error": "Decoding the audio took too long."}
     except sr.RequestError:
         return {"error": "Could not request results from Google's API. Try again later."}
     except Exception as e:
-        return {"error": f"Failed to process speech: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Failed to process speech: {str(e)}"}
+    finally:
+        os.remove(path)
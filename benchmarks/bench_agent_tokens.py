@@ -0,0 +1,61 @@
+"""Measure how many prompt tokens agent mode sends to Groq per request, against stubbed upstreams.
+
+Usage: python -m benchmarks.bench_agent_tokens [--requests 10] [--minutes 30]
+Each request summarizes a distinct video whose transcript is `minutes` long. Prompt tokens are
+counted by the fake Groq server from the messages and tool schemas of the tool-calling requests;
+the summary itself is generated outside the agent loop and not counted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import fakes
+from benchmarks.bench_long_transcripts import synthetic_transcript
+
+for name in ("CACHE_DB_PATH", "TRANSCRIPT_DB_PATH", "JOBS_DB_PATH", "BATCH_DB_PATH"):
+    os.environ[name] = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+
+async def run(requests: int, upstream) -> dict:
+    from api.routes import summarize_with_agent
+    from services.clients import close_clients
+
+    prompts_per_request, latencies = [], []
+    for i in range(requests):
+        sent = len(upstream.state.prompt_tokens)
+        start = time.perf_counter()
+        response, _, _ = await summarize_with_agent(f"agent token benchmark {i}", tts=False, language=None)
+        latencies.append(time.perf_counter() - start)
+        assert response.summary, response.error
+        prompts_per_request.append([tokens for uses_tools, tokens in upstream.state.prompt_tokens[sent:] if uses_tools])
+    await close_clients()
+    return {
+        "requests": requests,
+        "groq_calls_per_request": statistics.mean(len(prompts) for prompts in prompts_per_request),
+        "agent_prompt_tokens_per_request": round(statistics.mean(sum(prompts) for prompts in prompts_per_request)),
+        "largest_prompt_tokens": max(max(prompts) for prompts in prompts_per_request),
+        "mean_latency_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--groq-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(groq_latency=args.groq_latency, search_latency=0.01)
+    port = fakes.free_port()
+    fakes.serve_in_thread(upstream, port)
+    fakes.configure_env(port)
+    fakes.install_transcript_stub(0.01, synthetic_transcript(args.minutes))
+    print(json.dumps(asyncio.run(run(args.requests, upstream))))
+
+
+if __name__ == "__main__":
+    main()
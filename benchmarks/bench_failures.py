@@ -0,0 +1,119 @@
+"""Load test /summarize/ through a Groq outage, with and without circuit breakers.
+
+Usage: python -m benchmarks.bench_failures [--concurrency 10] [--phase 10] [--reset 3]
+Drives closed-loop load against one worker while the fake Groq is healthy, then answers 503 to
+everything, then recovers. Reports latency and failed summaries per phase, whether liveness kept
+answering from the same process, and what readiness said during the outage. With breakers, calls
+during the outage should fail in milliseconds instead of waiting out every retry.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fakes
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "summaries.db")
+os.environ.setdefault("GROQ_MAX_RETRIES", "3")
+
+
+def summarize_phase(name: str, latencies: list[float], failures: int, elapsed: float) -> dict:
+    latencies = sorted(latencies) or [0.0]
+    return {
+        "phase": name,
+        "requests": len(latencies),
+        "failed": failures,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+    }
+
+
+async def load_phase(client: httpx.AsyncClient, name: str, seconds: float, concurrency: int) -> dict:
+    """Closed-loop load with distinct queries (so the cache never answers) until the phase ends."""
+    deadline = time.perf_counter() + seconds
+    latencies, counter = [], iter(range(10 ** 9))
+    failures = 0
+
+    async def user(index: int):
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get("/summarize/", params={"query": f"{name} {index} {next(counter)} {time.time()}"})
+            latencies.append(time.perf_counter() - start)
+            body = response.json() if response.status_code == 200 else {}
+            if response.status_code != 200 or body.get("error") or body.get("summary", "").startswith("Summary unavailable"):
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return summarize_phase(name, latencies, failures, time.perf_counter() - start)
+
+
+async def run_mode(base_url: str, upstream, mode: str, threshold: int, reset: float, phase: float, concurrency: int) -> dict:
+    from services.circuit import breaker
+
+    for name in ("groq", "serpapi"):
+        breaker(name).threshold = threshold
+        breaker(name).reset_timeout = reset
+        breaker(name).record(None)  # Start closed
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        pid = (await client.get("/healthz")).json()["pid"]
+        phases = [await load_phase(client, "healthy", phase, concurrency)]
+
+        upstream.state.failing.add("groq")
+        outage = asyncio.create_task(load_phase(client, "outage", phase, concurrency))
+        await asyncio.sleep(phase / 2)
+        liveness_start = time.perf_counter()
+        live = await client.get("/healthz")
+        liveness_ms = round((time.perf_counter() - liveness_start) * 1000, 1)
+        ready = await client.get("/readyz", params={"strict": True})
+        phases.append(await outage)
+
+        upstream.state.failing.discard("groq")
+        await asyncio.sleep(reset)  # Time for the circuit's trial call
+        phases.append(await load_phase(client, "recovered", phase, concurrency))
+        same_process = (await client.get("/healthz")).json()["pid"] == pid == live.json()["pid"]
+
+    return {
+        "mode": mode,
+        "phases": phases,
+        "outage_liveness_ms": liveness_ms,
+        "outage_strict_readiness": ready.status_code,
+        "outage_degraded": ready.json().get("degraded"),
+        "same_process": same_process,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--phase", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--reset", type=float, default=3.0, help="Circuit reset timeout in seconds")
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(0.1, 0.05)
+    upstream_port = fakes.free_port()
+    fakes.serve_in_thread(upstream, upstream_port)
+    fakes.configure_env(upstream_port)
+    fakes.install_transcript_stub(0.05)
+    os.environ["HEALTH_CHECK_TTL"] = "0"
+
+    os.makedirs("static", exist_ok=True)
+    from main import app
+    app_port = fakes.free_port()
+    fakes.serve_in_thread(app, app_port)
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    for mode, threshold in [("retries_only", 0), ("circuit_breaker", 5)]:
+        print(json.dumps(asyncio.run(run_mode(base_url, upstream, mode, threshold, args.reset, args.phase, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
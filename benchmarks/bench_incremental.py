@@ -0,0 +1,96 @@
+"""Compare the Groq cost of keeping a growing transcript's summary current, from scratch versus incrementally.
+
+Usage: python -m benchmarks.bench_incremental [--initial 600] [--growth 150] [--refreshes 10]
+Simulates a live stream whose captions gain `growth` segments between refreshes. The full mode
+re-summarizes the whole transcript every time, as before; the incremental mode folds only the new
+segments into the rolling summary. Reports Groq calls, prompt tokens and latency per refresh.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import fakes
+
+_tmp = tempfile.mkdtemp()
+os.environ["CACHE_DB_PATH"] = os.path.join(_tmp, "summaries.db")
+os.environ["TRANSCRIPT_DB_PATH"] = os.path.join(_tmp, "transcripts.db")
+
+SENTENCE = "speaker {i} talks about the match, the score so far and what the teams should try next"
+
+
+def grow(segments: list[dict], count: int) -> None:
+    """Append caption segments, as a live stream's auto-captions do."""
+    for i in range(len(segments), len(segments) + count):
+        segments.append({"text": SENTENCE.format(i=i), "start": i * 3.0, "duration": 3.0})
+
+
+async def run_mode(mode: str, upstream, initial: int, growth: int, refreshes: int) -> dict:
+    from services.incremental import refresh_summary
+    from services.summarizer import generate_summary_and_themes
+    from services.transcript import refresh_video_transcript
+
+    segments = []
+    grow(segments, initial)
+    fakes.install_transcript_stub(0.0)
+    import services.transcript
+    services.transcript.transcript_api.segments = segments
+    video_id = f"live{mode[:7]:_<7}"
+
+    rows = []
+    for refresh in range(refreshes + 1):
+        calls, tokens = upstream.state.calls["groq"], len(upstream.state.prompt_tokens)
+        start = time.perf_counter()
+        if mode == "incremental":
+            outcome = await refresh_summary(video_id)
+            assert outcome["status"] == "updated", outcome
+        else:
+            record = await refresh_video_transcript(video_id)
+            summary = await generate_summary_and_themes(record["text"], "Live match", language="en")
+            assert not summary["summary"].startswith("Summary unavailable"), summary
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "segments": len(segments),
+            "groq_calls": upstream.state.calls["groq"] - calls,
+            "prompt_tokens": sum(count for _, count in upstream.state.prompt_tokens[tokens:]),
+            "ms": elapsed * 1000,
+        })
+        grow(segments, growth)
+
+    steady = rows[1:]  # The first refresh summarizes everything in both modes
+    return {
+        "mode": mode,
+        "first_refresh_prompt_tokens": rows[0]["prompt_tokens"],
+        "last_refresh_prompt_tokens": rows[-1]["prompt_tokens"],
+        "mean_prompt_tokens_per_refresh": round(statistics.mean(row["prompt_tokens"] for row in steady)),
+        "mean_groq_calls_per_refresh": round(statistics.mean(row["groq_calls"] for row in steady), 2),
+        "mean_ms_per_refresh": round(statistics.mean(row["ms"] for row in steady), 1),
+        "final_segments": rows[-1]["segments"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--initial", type=int, default=600, help="Caption segments at the first refresh")
+    parser.add_argument("--growth", type=int, default=150, help="Segments added between refreshes")
+    parser.add_argument("--refreshes", type=int, default=10)
+    parser.add_argument("--groq-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(args.groq_latency, 0.0)
+    port = fakes.free_port()
+    fakes.serve_in_thread(upstream, port)
+    fakes.configure_env(port)
+
+    async def run_all():
+        for mode in ("full", "incremental"):
+            print(json.dumps(await run_mode(mode, upstream, args.initial, args.growth, args.refreshes)))
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark the local BART summarizer on CPU as batch size varies.
+
+Usage: python -m benchmarks.bench_local_inference [--batch-sizes 1 2 4 8 16] [--texts 32] [--threads 4] [--quantize]
+Needs torch and transformers. Reports input tokens/s and per-text latency for direct batches, then the
+throughput the micro-batcher reaches when the same texts arrive as concurrent requests.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.bench_long_transcripts import synthetic_transcript
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--texts", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--quantize", action="store_true")
+    args = parser.parse_args()
+
+    # Configuration is read when the services are imported.
+    os.environ["LOCAL_CPU_THREADS"] = str(args.threads)
+    os.environ["LOCAL_QUANTIZE"] = "1" if args.quantize else ""
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    from services import local_inference
+    from services.tools import get_pipeline
+
+    tokenizer = get_pipeline("summarizer").tokenizer
+    texts = [synthetic_transcript(4, seed=i) for i in range(args.texts)]  # ~600 words, close to BART's input limit
+    input_tokens = sum(len(tokenizer(text, truncation=True)["input_ids"]) for text in texts)
+    local_inference.run_summaries(texts[:1])  # Warm-up
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            local_inference.run_summaries(texts[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(json.dumps({
+            "mode": "direct",
+            "batch_size": batch_size,
+            "quantized": args.quantize,
+            "threads": args.threads or "default",
+            "input_tokens_per_s": round(input_tokens / elapsed, 1),
+            "latency_per_batch_s": round(elapsed / -(-len(texts) // batch_size), 3),
+        }))
+
+    async def concurrent():
+        start = time.perf_counter()
+        await asyncio.gather(*(local_inference.summary_batcher.submit(text) for text in texts))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(concurrent())
+    print(json.dumps({
+        "mode": "micro_batched",
+        "max_batch": local_inference.summary_batcher.max_batch,
+        "batches": local_inference.summary_batcher.stats["batches"],
+        "input_tokens_per_s": round(input_tokens / elapsed, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark map-reduce summarization as transcript length grows.
+
+Usage: python -m benchmarks.bench_long_transcripts [--minutes 10 30 60 120 240] [--concurrency 1 4 8]
+Spoken English runs at roughly 150 words per minute, which is what the synthetic transcripts assume.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import fakes
+
+WORDS = "the speaker explains how models learn from data and why evaluation matters for every result we report".split()
+
+
+def synthetic_transcript(minutes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(minutes * 150 // 12):
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+    return " ".join(sentences)
+
+
+async def run(minutes_list: list[int], concurrency_list: list[int], chunk_tokens: int, upstream) -> None:
+    from services.summarizer import generate_summary_and_themes
+    from services.tokens import count_tokens
+
+    for minutes in minutes_list:
+        text = synthetic_transcript(minutes)
+        tokens = count_tokens(text)
+        for concurrency in concurrency_list:
+            calls = upstream.state.calls["groq"]
+            start = time.perf_counter()
+            result = await generate_summary_and_themes(text, "Benchmark", "en", chunk_tokens=chunk_tokens, max_concurrency=concurrency)
+            elapsed = time.perf_counter() - start
+            assert not result["summary"].startswith("Summary unavailable"), result
+            print({
+                "minutes": minutes,
+                "transcript_tokens": tokens,
+                "concurrency": concurrency,
+                "groq_calls": upstream.state.calls["groq"] - calls,
+                "wall_clock_s": round(elapsed, 2),
+                "tokens_per_s": round(tokens / elapsed),
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 30, 60, 120, 240])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    parser.add_argument("--groq-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(groq_latency=args.groq_latency)
+    port = fakes.free_port()
+    fakes.serve_in_thread(upstream, port)
+    fakes.configure_env(port)
+    asyncio.run(run(args.minutes, args.concurrency, args.chunk_tokens, upstream))
+
+
+if __name__ == "__main__":
+    main()
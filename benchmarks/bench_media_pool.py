@@ -0,0 +1,117 @@
+"""Measure latency of other endpoints while speech-to-text jobs keep the CPUs busy decoding audio.
+
+Usage: python -m benchmarks.bench_media_pool [--jobs 4] [--minutes 5] [--probes 60]
+Runs the app against fake upstreams, posts long synthetic recordings to /speech-to-text/ (recognition
+stubbed, so decoding and resampling are the work) and meanwhile probes /rate-limit/stats and cached
+/summarize/ requests. Media work runs first on threads in the server process (MEDIA_WORKERS=0) and
+then in the process pool; probe latency should stay near idle with the pool.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fakes
+from benchmarks.bench_speech_to_text import write_wav
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "summaries.db")
+
+
+def percentiles(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+async def probe(client: httpx.AsyncClient, count: int, stop: asyncio.Event | None = None) -> dict:
+    """Alternate cheap and cached requests every 50 ms until `count` are done or `stop` is set."""
+    latencies = []
+    for i in range(count):
+        if stop is not None and stop.is_set():
+            break
+        start = time.perf_counter()
+        if i % 2:
+            await client.get("/summarize/", params={"query": "media pool probe"})
+        else:
+            await client.get("/rate-limit/stats")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return percentiles(latencies)
+
+
+async def run_mode(base_url: str, mode: str, workers: int, audio: bytes, jobs: int, probes: int) -> dict:
+    from services.media_pool import media_pool
+
+    media_pool.workers = workers
+    media_pool.stats = dict.fromkeys(media_pool.stats, 0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        await client.get("/summarize/", params={"query": "media pool probe"})  # Fills the result cache
+        idle = await probe(client, probes // 2)
+
+        async def upload() -> float:
+            start = time.perf_counter()
+            response = await client.post("/speech-to-text/", content=audio, headers={"content-type": "audio/wav"})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        uploads = asyncio.gather(*(upload() for _ in range(jobs)))
+        stop = asyncio.Event()
+        uploads.add_done_callback(lambda _: stop.set())
+        await asyncio.sleep(0.5)  # Let decoding get going
+        busy = await probe(client, probes, stop)
+        durations = await uploads
+    return {
+        "mode": mode,
+        "jobs": jobs,
+        "stt_wall_s": round(time.perf_counter() - start, 2),
+        "stt_max_s": round(max(durations), 2),
+        "idle": idle,
+        "busy": busy,
+        "pool": media_pool.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=max(2, os.cpu_count() or 1) * 2, help="Concurrent uploads")
+    parser.add_argument("--minutes", type=float, default=5, help="Length of each recording")
+    parser.add_argument("--probes", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=max(1, os.cpu_count() or 1), help="Media processes")
+    args = parser.parse_args()
+
+    upstream_port = fakes.free_port()
+    fakes.serve_in_thread(fakes.create_upstream_app(0.05, 0.05), upstream_port)
+    fakes.configure_env(upstream_port)
+    fakes.install_transcript_stub(0.05)
+    os.environ["STT_MAX_UPLOAD_MB"] = "1000"
+
+    from services import speech_to_text
+    speech_to_text.recognize_chunk = lambda samples: "words"
+
+    os.makedirs("static", exist_ok=True)
+    from main import app
+    app_port = fakes.free_port()
+    fakes.serve_in_thread(app, app_port)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "speech.wav")
+        write_wav(path, args.minutes)
+        with open(path, "rb") as audio_file:
+            audio = audio_file.read()
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    for mode, workers in [("threads", 0), ("process_pool", args.workers)]:
+        print(json.dumps(asyncio.run(run_mode(base_url, mode, workers, audio, args.jobs, args.probes))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare /summarize/ latency in pipeline and agent mode against stubbed upstreams.
+
+Usage: python -m benchmarks.bench_pipeline_modes [--requests 20] [--groq-latency 0.3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import fakes
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "summaries.db")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_mode(mode: str, requests: int, upstream) -> dict:
+    from api.routes import summarize_video
+    from services.cache import result_cache
+
+    await summarize_video(query="warm-up", tts=False, language=None, mode=mode, background=False)
+    latencies = []
+    groq_calls = upstream.state.calls["groq"]
+    for i in range(requests):
+        result_cache.invalidate()
+        start = time.perf_counter()
+        response = await summarize_video(query=f"benchmark video {i}", tts=False, language=None, mode=mode, background=False)
+        latencies.append(time.perf_counter() - start)
+        assert response.summary, response.error
+    return {
+        "mode": mode,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "groq_calls_per_request": (upstream.state.calls["groq"] - groq_calls) / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(args.groq_latency, args.search_latency)
+    port = fakes.free_port()
+    fakes.serve_in_thread(upstream, port)
+    fakes.configure_env(port)
+    fakes.install_transcript_stub(args.transcript_latency)
+
+    async def run_all():
+        for mode in ("pipeline", "agent"):
+            print(await run_mode(mode, args.requests, upstream))
+
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Drive the Groq limiter against a fake Groq that answers 429 once a request quota is exceeded.
+
+Usage: python -m benchmarks.bench_rate_limit [--calls 40] [--quota 10] [--window 5]
+Runs the same burst of completions with the client-side limiter sized to the quota and with it
+effectively disabled (so only 429 retries hold callers back), then checks that interactive calls
+overtake a queued batch. Every call must succeed in both modes; the limiter should avoid most 429s.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks import fakes
+
+
+async def burst(calls: int, priority: int | None = None) -> list[float]:
+    from services.summarizer import complete
+    from services.rate_limit import use_priority, groq_priority
+
+    async def one() -> float:
+        start = time.perf_counter()
+        await complete("Summarize this benchmark prompt.", max_tokens=200)
+        return time.perf_counter() - start
+
+    with use_priority(groq_priority.get() if priority is None else priority):
+        return await asyncio.gather(*(one() for _ in range(calls)))
+
+
+async def run_mode(name: str, quota: float, window: float, calls: int, upstream) -> dict:
+    from services import rate_limit
+
+    rate_limit.groq_limiter = rate_limit.RateLimiter(rpm=quota, tpm=1e9, period=window)
+    before = dict(upstream.state.calls)
+    start = time.perf_counter()
+    latencies = await burst(calls)
+    return {
+        "mode": name,
+        "calls": calls,
+        "wall_s": round(time.perf_counter() - start, 2),
+        "max_latency_s": round(max(latencies), 2),
+        "groq_requests": upstream.state.calls["groq"] - before["groq"],
+        "groq_429s": upstream.state.calls["groq_429"] - before["groq_429"],
+        "limiter": rate_limit.groq_limiter.snapshot(),
+    }
+
+
+async def run_priorities(quota: float, window: float, calls: int) -> dict:
+    from services import rate_limit
+
+    rate_limit.groq_limiter = rate_limit.RateLimiter(rpm=quota, tpm=1e9, period=window)
+    batch = asyncio.create_task(burst(calls, rate_limit.PRIORITY_BATCH))
+    await asyncio.sleep(0.05)  # The batch is queued first
+    interactive = await burst(3, rate_limit.PRIORITY_INTERACTIVE)
+    batch_latencies = await batch
+    return {
+        "mode": "priorities",
+        "interactive_max_s": round(max(interactive), 2),
+        "batch_max_s": round(max(batch_latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--quota", type=int, default=10, help="Requests the fake Groq accepts per window")
+    parser.add_argument("--window", type=float, default=5.0, help="Quota window in seconds")
+    args = parser.parse_args()
+
+    upstream = fakes.create_upstream_app(groq_latency=0.05, groq_rate_limit=args.quota, groq_rate_window=args.window)
+    port = fakes.free_port()
+    fakes.serve_in_thread(upstream, port)
+    fakes.configure_env(port)
+    os.environ["GROQ_MAX_RETRIES"] = "20"  # The unlimited run relies on retries alone
+
+    async def run():
+        results = [
+            await run_mode("limiter", args.quota, args.window, args.calls, upstream),
+            await run_mode("retries_only", 1e9, args.window, args.calls, upstream),
+            await run_priorities(args.quota, args.window, args.calls // 2),
+        ]
+        from services.clients import close_clients
+        await close_clients()
+        return results
+
+    for result in asyncio.run(run()):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure latency and peak memory of speech-to-text decoding for 1, 10 and 60 minute recordings.
+
+Usage: python -m benchmarks.bench_speech_to_text [--minutes 1 10 60] [--pydub]
+Writes a synthetic 44.1 kHz stereo WAV per length and transcribes it in a fresh subprocess, so each
+peak RSS is measured on its own. Recognition is replaced by a stub that returns immediately, which
+leaves the upload decode, resampling and chunking as the measured work. --pydub also runs the old
+path (whole-file decode and re-export with pydub) for comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+SOURCE_RATE = 44100
+WRITE_SECONDS = 60  # Synthetic audio is generated a minute at a time
+
+
+def write_wav(path: str, minutes: float) -> None:
+    """A stereo tone with a pause every few seconds, so chunk splitting has silences to find."""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(SOURCE_RATE)
+        for start in range(0, int(minutes * 60), WRITE_SECONDS):
+            t = np.arange(start * SOURCE_RATE, (start + WRITE_SECONDS) * SOURCE_RATE) / SOURCE_RATE
+            tone = 8000 * np.sin(2 * np.pi * 220 * t) * (t % 4 < 3.5)
+            wav.writeframes(np.repeat(tone.astype("<i2"), 2).tobytes())
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # kilobytes on Linux
+
+
+async def streaming(path: str) -> dict:
+    from services import speech_to_text
+
+    speech_to_text.recognize_chunk = lambda samples: "words"
+    chunks = 0
+    start = time.perf_counter()
+    first = None
+    async for _ in speech_to_text.transcribe_stream(path):
+        chunks += 1
+        first = first or time.perf_counter() - start
+    return {"chunks": chunks, "first_partial_s": round(first, 3), "total_s": round(time.perf_counter() - start, 3)}
+
+
+def pydub(path: str) -> dict:
+    from pydub import AudioSegment
+
+    start = time.perf_counter()
+    audio = AudioSegment.from_file(path).set_frame_rate(16000).set_channels(1)
+    audio.export(path + ".converted.wav", format="wav")
+    os.remove(path + ".converted.wav")
+    return {"total_s": round(time.perf_counter() - start, 3)}
+
+
+def measure(mode: str, path: str) -> None:
+    """Child process entry point: run one mode on one file and print its result."""
+    baseline = peak_rss_mb()
+    result = asyncio.run(streaming(path)) if mode == "streaming" else pydub(path)
+    print(json.dumps(dict(result, peak_rss_mb=round(peak_rss_mb(), 1), baseline_rss_mb=round(baseline, 1))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--pydub", action="store_true", help="Also measure the old whole-file pydub conversion")
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        return measure(*args.measure)
+
+    modes = ["streaming"] + (["pydub"] if args.pydub else [])
+    with tempfile.TemporaryDirectory() as directory:
+        for minutes in args.minutes:
+            path = os.path.join(directory, f"speech-{minutes:g}m.wav")
+            write_wav(path, minutes)
+            for mode in modes:
+                child = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_speech_to_text", "--measure", mode, path],
+                    capture_output=True, text=True
+                )
+                if child.returncode != 0:
+                    print(json.dumps({"minutes": minutes, "mode": mode, "error": child.stderr.strip().splitlines()[-1]}))
+                    continue
+                result = json.loads(child.stdout.strip().splitlines()[-1])
+                print(json.dumps(dict(minutes=minutes, mode=mode, file_mb=round(os.path.getsize(path) / 1e6, 1), **result)))
+
+
+if __name__ == "__main__":
+    main()
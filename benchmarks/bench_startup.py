@@ -0,0 +1,66 @@
+"""Measure worker cold start: time to import the app, RSS afterwards, and which heavy modules got loaded.
+
+Usage: python -m benchmarks.bench_startup [--runs 5] [--max-seconds 3] [--max-rss-mb 250]
+Exits non-zero when a threshold is exceeded or a lazily loaded module is imported at start-up,
+so it can guard against import-time regressions in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must only be imported on first use.
+LAZY_MODULES = ("torch", "transformers", "gtts", "pydub", "speech_recognition", "langdetect")
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_s": elapsed, "rss_mb": rss_kb / 1024, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure(runs: int) -> dict:
+    env = dict(os.environ, GROQ_API_KEY=os.environ.get("GROQ_API_KEY", "benchmark"))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, env=env, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "import_s_median": round(statistics.median(s["import_s"] for s in samples), 3),
+        "import_s_max": round(max(s["import_s"] for s in samples), 3),
+        "rss_mb_max": round(max(s["rss_mb"] for s in samples), 1),
+        "lazy_modules_loaded": sorted({m for s in samples for m in s["loaded"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Fail if RSS after import exceeds this")
+    args = parser.parse_args()
+
+    os.makedirs("static", exist_ok=True)
+    result = measure(args.runs)
+    print(json.dumps(result))
+
+    failures = []
+    if result["lazy_modules_loaded"]:
+        failures.append(f"lazily loaded modules imported at start-up: {result['lazy_modules_loaded']}")
+    if args.max_seconds is not None and result["import_s_median"] > args.max_seconds:
+        failures.append(f"median import time {result['import_s_median']}s > {args.max_seconds}s")
+    if args.max_rss_mb is not None and result["rss_mb_max"] > args.max_rss_mb:
+        failures.append(f"RSS {result['rss_mb_max']} MB > {args.max_rss_mb} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Local stand-ins for Groq, SerpApi, the YouTube transcript API and gTTS with configurable latency and errors.
+
+Groq and SerpApi are served over real HTTP by a local FastAPI app, so requests go through the same
+pooled clients as in production. Point the services at it by calling `configure_env` before the
+application modules are imported. The transcript API and gTTS are replaced in-process.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, JSONResponse
+import threading
+import asyncio
+import hashlib
+import random
+import socket
+import json
+import time
+import os
+
+import uvicorn
+
+FAKE_SUMMARY = """**Detailed Summary:**
+A stubbed summary of the video used for benchmarking.
+**Sentiment:** Positive
+**Key Themes:** benchmarking, latency, stubs"""
+
+FAKE_TRANSCRIPT = [{"text": "this is a stubbed transcript line", "start": i * 2.0, "duration": 2.0} for i in range(500)]
+
+
+def _completion(content=None, tool_call=None) -> dict:
+    message = {"role": "assistant", "content": content}
+    if tool_call:
+        name, arguments = tool_call
+        message["tool_calls"] = [{"id": "call_0", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}]
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "llama3-70b-8192",
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+    }
+
+
+def _completion_stream(content: str, token_latency: float):
+    """Server-sent chat.completion.chunk events, one word per chunk, as Groq sends them with stream=True."""
+    for i, word in enumerate(content.split(" ")):
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "llama3-70b-8192",
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        time.sleep(token_latency)
+    final = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "llama3-70b-8192",
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        "x_groq": {"id": "req-fake", "usage": {"prompt_tokens": 100, "completion_tokens": len(content.split(" ")), "total_tokens": 100 + len(content.split(" "))}},
+    }
+    yield f"data: {json.dumps(final)}\n\n"  # Groq reports a stream's usage in its last chunk
+    yield "data: [DONE]\n\n"
+
+
+def fake_summary(body: dict) -> str:
+    """FAKE_SUMMARY tagged with a digest of the prompt, so different videos get different summaries (and audio)."""
+    digest = hashlib.sha256(json.dumps(body["messages"]).encode("utf-8")).hexdigest()[:8]
+    return FAKE_SUMMARY.replace("for benchmarking.", f"for benchmarking ({digest}).")
+
+
+def _next_step(body: dict) -> dict:
+    """Play the tool-calling sequence the real model uses."""
+    if not body.get("tools"):
+        return _completion(content=fake_summary(body))
+
+    last = [m["content"] for m in body["messages"] if m["role"] == "user"][-1]
+    if last.startswith("Summarize the YouTube video titled"):
+        return _completion(tool_call=("search_youtube_video", {"query": last.split("'")[1]}))
+    if last.startswith("Extract transcript for video ID:"):
+        return _completion(tool_call=("get_video_transcript", {"video_id": last.rsplit(" ", 1)[-1]}))
+    transcript = [m["content"] for m in body["messages"] if (m.get("content") or "").startswith("Transcript:")][-1]
+    return _completion(tool_call=("generate_summary_and_themes", {"text": transcript}))
+
+
+def fake_video_id(query: str) -> str:
+    """Deterministic 11-character video ID per query, so distinct queries never share a cache entry."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:11]
+
+
+def create_upstream_app(groq_latency: float = 0.3, search_latency: float = 0.3,
+                        groq_rate_limit: int | None = None, groq_rate_window: float = 60.0,
+                        error_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    """Fake Groq chat completions and SerpApi search endpoints that count calls.
+
+    With `groq_rate_limit`, Groq keeps a token bucket of that many requests refilled over
+    `groq_rate_window` seconds and answers 429 with Retry-After when it is empty, as the real API
+    does when a quota is exhausted. Adding "groq" or "serpapi" to `app.state.failing` makes that
+    service answer 503 until it is removed, to inject outages; `error_rate` (per service in
+    `app.state.error_rates`) makes that fraction of requests fail with 503 at random.
+    """
+    app = FastAPI()
+    app.state.calls = {"groq": 0, "groq_429": 0, "groq_503": 0, "serpapi": 0, "serpapi_503": 0}
+    app.state.failing = set()
+    app.state.error_rates = {"groq": error_rate, "serpapi": error_rate}
+    rng = random.Random(seed)
+
+    def failing(service: str) -> bool:
+        return service in app.state.failing or rng.random() < app.state.error_rates.get(service, 0.0)
+    app.state.prompt_tokens = []  # (uses tools, approximate prompt tokens) for every accepted Groq request
+    bucket = {"level": float(groq_rate_limit or 0), "updated": time.monotonic()}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.calls["groq"] += 1
+        if failing("groq"):
+            app.state.calls["groq_503"] += 1
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable", "type": "internal_server_error"}})
+        if groq_rate_limit is not None:
+            now = time.monotonic()
+            refill_rate = groq_rate_limit / groq_rate_window
+            bucket["level"] = min(bucket["level"] + (now - bucket["updated"]) * refill_rate, groq_rate_limit)
+            bucket["updated"] = now
+            if bucket["level"] < 1:
+                app.state.calls["groq_429"] += 1
+                retry_after = (1 - bucket["level"]) / refill_rate
+                return JSONResponse(
+                    status_code=429,
+                    headers={"retry-after": f"{retry_after:.2f}", "x-ratelimit-reset-requests": f"{retry_after:.2f}s"},
+                    content={"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}},
+                )
+            bucket["level"] -= 1
+        body = await request.json()
+        prompt_chars = sum(len(message.get("content") or "") for message in body["messages"])
+        app.state.prompt_tokens.append((bool(body.get("tools")), (prompt_chars + len(json.dumps(body.get("tools") or ""))) // 4))
+        if body.get("stream"):
+            # The latency is spread over the tokens, so time to first token is what streaming improves.
+            content = fake_summary(body)
+            return StreamingResponse(_completion_stream(content, groq_latency / len(content.split(" "))), media_type="text/event-stream")
+        await asyncio.sleep(groq_latency)
+        return _next_step(body)
+
+    @app.get("/search.json")
+    async def search(search_query: str):
+        app.state.calls["serpapi"] += 1
+        if failing("serpapi"):
+            app.state.calls["serpapi_503"] += 1
+            return JSONResponse(status_code=503, content={"error": "Service unavailable"})
+        await asyncio.sleep(search_latency)
+        query = search_query.split('"')[1] if '"' in search_query else search_query
+        return {"video_results": [{
+            "title": f"Stubbed video for {query}",
+            "link": f"https://www.youtube.com/watch?v={fake_video_id(query)}",
+            "channel": {"name": "Stub Channel"}
+        }]}
+
+    # Readiness probes
+    @app.get("/openai/v1/models")
+    async def models():
+        return JSONResponse(status_code=503 if "groq" in app.state.failing else 200, content={"data": []})
+
+    @app.get("/account.json")
+    async def account():
+        return JSONResponse(status_code=503 if "serpapi" in app.state.failing else 200, content={})
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    """Run an ASGI app on a background thread with its own event loop; returns once it is accepting."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def configure_env(port: int) -> None:
+    """Route Groq and SerpApi traffic to the fake upstream server."""
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["SERPAPI_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("SERPAPI_API_KEY", "benchmark")
+    # The fake enforces no quota unless asked to, so the client-side limiter should not throttle either.
+    os.environ.setdefault("GROQ_RPM", "100000")
+    os.environ.setdefault("GROQ_TPM", "100000000")
+
+
+class FakeFetchedTranscript:
+    def __init__(self, segments: list[dict]):
+        self.segments = segments
+        self.language_code = "en"
+        self.is_generated = True
+
+    def to_raw_data(self):
+        return self.segments
+
+
+class FakeTranscriptApi:
+    """Replaces the pooled YouTubeTranscriptApi instance; fetches run in worker threads like the real one.
+
+    Each video's transcript starts with a line naming it, so summaries differ between videos.
+    `error_rate` makes that fraction of fetches fail as if YouTube blocked the request, and
+    `unavailable_rate` as if the video had captions disabled.
+    """
+
+    def __init__(self, latency: float, segments: list[dict] | None = None, error_rate: float = 0.0,
+                 unavailable_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.segments = segments or FAKE_TRANSCRIPT
+        self.error_rate = error_rate
+        self.unavailable_rate = unavailable_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def fetch(self, video_id, languages=("en",), preserve_formatting=False):
+        from youtube_transcript_api import RequestBlocked, TranscriptsDisabled
+
+        time.sleep(self.latency)
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            raise RequestBlocked(video_id)
+        if roll < self.error_rate + self.unavailable_rate:
+            raise TranscriptsDisabled(video_id)
+        return FakeFetchedTranscript([{"text": f"this is video {video_id}", "start": 0.0, "duration": 0.0}] + self.segments)
+
+
+def install_transcript_stub(latency: float = 0.2, text: str | None = None, segments: list[dict] | None = None,
+                            error_rate: float = 0.0, unavailable_rate: float = 0.0) -> None:
+    """Serve every transcript from the stub; `text` replaces the default transcript, one segment per sentence."""
+    import services.transcript
+    if text is not None:
+        segments = [{"text": sentence, "start": i * 4.0, "duration": 4.0} for i, sentence in enumerate(text.split(". "))]
+    services.transcript.transcript_api = FakeTranscriptApi(latency, segments, error_rate, unavailable_rate)
+
+
+class FakeGTTS:
+    """Stands in for gtts.gTTS: streams MP3-sized chunks at a fixed latency instead of calling Google."""
+
+    latency = 0.5  # Seconds per synthesis, spread over the chunks
+    error_rate = 0.0
+    chunk_bytes = 16 * 1024
+    _rng = random.Random(0)
+
+    def __init__(self, text: str, lang: str = "en", tld: str = "com", slow: bool = False, **kwargs):
+        self.text = text
+
+    def stream(self):
+        from gtts import gTTSError
+
+        if self._rng.random() < self.error_rate:
+            raise gTTSError("503 (Service Unavailable) from TTS API. Probable cause: injected error")
+        chunks = max(len(self.text) // 100, 1)  # Roughly 1 KB of MP3 per word, as gTTS produces at 32 kbit/s
+        for _ in range(chunks):
+            time.sleep(self.latency / chunks)
+            yield b"\xff\xf3" + bytes(self.chunk_bytes - 2)
+
+
+def install_tts_stub(latency: float = 0.5, error_rate: float = 0.0) -> None:
+    """Synthesize speech with FakeGTTS; text_to_speech imports gTTS at call time, so patching the module is enough."""
+    import gtts
+    FakeGTTS.latency = latency
+    FakeGTTS.error_rate = error_rate
+    gtts.gTTS = FakeGTTS
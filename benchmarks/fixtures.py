@@ -0,0 +1,94 @@
+"""Transcript fixtures of several lengths for benchmarks: recorded from YouTube, or synthetic when none were recorded.
+
+Usage:
+  python -m benchmarks.fixtures record --name medium VIDEO_ID   # Save a real transcript as the 'medium' fixture
+  python -m benchmarks.fixtures list
+
+Recorded fixtures are JSON files under benchmarks/recorded/ and take precedence over the synthetic
+transcript of the same name, so a team can pin real captions while the defaults stay reproducible.
+"""
+import argparse
+import json
+import os
+import random
+
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded")
+SYNTHETIC_MINUTES = {"short": 5, "medium": 30, "long": 120}  # Typical clip, talk and stream lengths
+WORDS_PER_MINUTE = 150
+SEGMENT_SECONDS = 3.0
+
+SUBJECTS = "the speaker|our guest|the team|this model|the audience|the author|the coach|the city".split("|")
+VERBS = "explains|questions|describes|compares|remembers|predicts|argues about|shows".split("|")
+OBJECTS = ("how the project started|why the results surprised everyone|the next season|what went wrong in testing|"
+           "the budget for next year|a simple way to measure progress|the history of the idea|the final match").split("|")
+FILLERS = "so|and then|honestly|you know|at this point|meanwhile|in the end|first of all".split("|")
+
+
+def synthetic_segments(minutes: int, seed: int = 0) -> list[dict]:
+    """Caption-like segments of plain English at speaking pace, deterministic for a given seed."""
+    rng = random.Random(seed)
+    words_per_segment = round(WORDS_PER_MINUTE * SEGMENT_SECONDS / 60)
+    words = []
+    while len(words) < minutes * WORDS_PER_MINUTE:
+        sentence = f"{rng.choice(FILLERS)} {rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+        words.extend(sentence.split())
+    return [
+        {"text": " ".join(words[i:i + words_per_segment]), "start": index * SEGMENT_SECONDS, "duration": SEGMENT_SECONDS}
+        for index, i in enumerate(range(0, len(words), words_per_segment))
+    ]
+
+
+def fixture_names() -> list[str]:
+    recorded = [name[:-5] for name in sorted(os.listdir(RECORDED_DIR)) if name.endswith(".json")] if os.path.isdir(RECORDED_DIR) else []
+    return list(dict.fromkeys(list(SYNTHETIC_MINUTES) + recorded))
+
+
+def load_fixture(name: str) -> list[dict]:
+    """Segments of a fixture: the recorded file when there is one, else the synthetic transcript."""
+    path = os.path.join(RECORDED_DIR, f"{name}.json")
+    if os.path.exists(path):
+        with open(path) as fixture_file:
+            return json.load(fixture_file)["segments"]
+    if name not in SYNTHETIC_MINUTES:
+        raise ValueError(f"Unknown fixture '{name}'; available: {', '.join(fixture_names())}")
+    return synthetic_segments(SYNTHETIC_MINUTES[name])
+
+
+def fixture_text(name: str) -> str:
+    return " ".join(segment["text"] for segment in load_fixture(name))
+
+
+def record(video_id: str, name: str) -> str:
+    """Fetch a video's transcript from YouTube and save it as a fixture."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    fetched = YouTubeTranscriptApi().fetch(video_id)
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+    path = os.path.join(RECORDED_DIR, f"{name}.json")
+    with open(path, "w") as fixture_file:
+        json.dump({"video_id": video_id, "language": fetched.language_code, "segments": fetched.to_raw_data()},
+                  fixture_file, ensure_ascii=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Save a real transcript as a fixture")
+    record_parser.add_argument("video_id")
+    record_parser.add_argument("--name", required=True)
+    commands.add_parser("list", help="Show the available fixtures and their sizes")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        print(record(args.video_id, args.name))
+        return
+    for name in fixture_names():
+        segments = load_fixture(name)
+        source = "recorded" if os.path.exists(os.path.join(RECORDED_DIR, f"{name}.json")) else "synthetic"
+        words = sum(len(segment["text"].split()) for segment in segments)
+        print(json.dumps({"name": name, "source": source, "segments": len(segments), "words": words}))
+
+
+if __name__ == "__main__":
+    main()
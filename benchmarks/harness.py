@@ -0,0 +1,344 @@
+"""Reproducible benchmark suite: micro-benchmarks and end-to-end load tests, saved as JSON for comparison.
+
+Usage:
+  python -m benchmarks.harness micro [--fixtures short medium long]
+  python -m benchmarks.harness load [--scenarios summarize cached audio] [--concurrency 1 10 50] [--requests 100]
+  python -m benchmarks.harness all                       # Both, into one results file
+  python -m benchmarks.harness compare BASE.json NEW.json [--threshold 10]
+
+Results go to benchmarks/results/<time>-<commit>.json (or --output). Load tests start a fresh stubbed
+application worker per scenario (benchmarks.stub_server) against local fake upstreams with the
+given latencies and error rates, and report throughput, p50/p95/p99 latency, failures, upstream
+calls per request and the worker's peak RSS. `compare` exits with status 1 when any metric got
+worse by more than the threshold, so it can gate a change.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fakes
+from benchmarks.fixtures import SYNTHETIC_MINUTES, load_fixture
+
+_tmp = tempfile.mkdtemp(prefix="bench-")
+for variable, file_name in [("CACHE_DB_PATH", "summaries.db"), ("TRANSCRIPT_DB_PATH", "transcripts.db"), ("JOBS_DB_PATH", "jobs.db")]:
+    os.environ[variable] = os.path.join(_tmp, file_name)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+MICRO_SAMPLE_SECONDS = 0.05  # Each timing sample runs the operation at least this long
+HIGHER_IS_BETTER = ("throughput_rps",)
+IGNORED_IN_COMPARE = ("requests", "concurrency", "segments", "words", "loops")
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb(pid: int) -> float | None:
+    """High-water mark of a process's resident memory, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def time_operation(name: str, operation, repeat: int, **labels) -> dict:
+    """Time `operation()` like timeit: calibrate a loop count, then keep the per-call time of each sample."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        if time.perf_counter() - start >= MICRO_SAMPLE_SECONDS:
+            break
+        loops *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        samples.append((time.perf_counter() - start) / loops)
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        **labels,
+        "loops": loops,
+        "median_us": round(median * 1e6, 2),
+        "min_us": round(min(samples) * 1e6, 2),
+        "ops_per_sec": round(1 / median, 1),
+    }
+
+
+def run_micro(fixtures: list[str], repeat: int) -> list[dict]:
+    """CPU-bound steps of a summary request, per transcript fixture where the input size matters."""
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    from services.summarizer import parse_summary
+    from services.transcript import detect_language
+    from services.transcript_store import pack_segments, unpack_segments
+    from services.tokens import count_tokens, chunk_text, extract_key_sentences
+    from services.search_cache import normalize_query
+
+    response = fakes.FAKE_SUMMARY.replace("A stubbed summary of the video used for benchmarking.", " ".join(["word"] * 650))
+    results = [
+        time_operation("parse_summary", lambda: parse_summary(response, "en"), repeat),
+        time_operation("normalize_query", lambda: normalize_query("  The MATRIX (1999) — Official Trailer #1!! "), repeat),
+    ]
+    for fixture in fixtures:
+        segments = load_fixture(fixture)
+        text = " ".join(segment["text"] for segment in segments)
+        blob = pack_segments(segments)
+        labels = {"fixture": fixture, "segments": len(segments), "words": len(text.split())}
+        results.extend([
+            time_operation("join_transcript", lambda: " ".join([entry["text"] for entry in segments]), repeat, **labels),
+            time_operation("unpack_segments", lambda: unpack_segments(blob), repeat, **labels),
+            time_operation("detect_language", lambda: detect_language(text), repeat, **labels),
+            time_operation("pack_segments", lambda: pack_segments(segments), repeat, **labels),
+            time_operation("chunk_text", lambda: chunk_text(text, 3000), repeat, **labels),
+            # Half the transcript's tokens, so every fixture is actually packed
+            time_operation("extract_key_sentences", lambda: extract_key_sentences(text, count_tokens(text) // 2), repeat, **labels),
+        ])
+    for result in results:
+        print(json.dumps(result))
+    return results
+
+
+def start_app(port: int, upstream_port: int, args, workdir: str) -> subprocess.Popen:
+    """Start a stubbed application worker in its own process and wait until it answers."""
+    command = [
+        sys.executable, "-m", "benchmarks.stub_server", "--port", str(port), "--upstream-port", str(upstream_port),
+        "--fixture", args.fixture, "--transcript-latency", str(args.transcript_latency),
+        "--transcript-error-rate", str(args.error_rate), "--tts-latency", str(args.tts_latency), "--tts-error-rate", str(args.error_rate),
+    ]
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               CACHE_DB_PATH=os.path.join(workdir, "summaries.db"), TRANSCRIPT_DB_PATH=os.path.join(workdir, "transcripts.db"),
+               JOBS_DB_PATH=os.path.join(workdir, "jobs.db"), WEB_CONCURRENCY="1", LOG_LEVEL="WARNING")
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Stub server exited with {process.returncode}; see {log.name}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Stub server did not start within 60s; see {log.name}")
+
+
+async def request_summary(client: httpx.AsyncClient, scenario: str, query: str) -> bool:
+    """One user action of a scenario; returns whether it succeeded."""
+    params = {"query": query, "tts": scenario == "audio"}
+    response = await client.get("/summarize/", params=params)
+    if response.status_code != 200:
+        return False
+    body = response.json()
+    if body.get("error") or body.get("summary", "").startswith("Summary unavailable"):
+        return False
+    if scenario != "audio":
+        return True
+    if not body.get("audio"):
+        return False
+    # Audio is only delivered once the whole file has streamed, so this times synthesis too.
+    async with client.stream("GET", f"/stream-audio/{os.path.basename(body['audio'])}") as audio:
+        received = 0
+        async for chunk in audio.aiter_bytes():
+            received += len(chunk)
+    return audio.status_code == 200 and received > 0
+
+
+async def prime_cache(base_url: str) -> None:
+    """Summarize the queries of the cached scenario once, outside the measurement."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        await asyncio.gather(*(request_summary(client, "cached", f"cached query {i}") for i in range(20)))
+
+
+async def drive(base_url: str, scenario: str, concurrency: int, requests: int) -> tuple[list[float], int, float]:
+    """Closed-loop load: `concurrency` users issue `requests` actions in total."""
+    queries = iter(range(requests))
+    latencies, failures = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=httpx.Limits(max_connections=concurrency * 2)) as client:
+        async def user():
+            nonlocal failures
+            for i in queries:
+                query = f"cached query {i % 20}" if scenario == "cached" else f"{scenario} query {concurrency}-{i}"
+                start = time.perf_counter()
+                try:
+                    ok = await request_summary(client, scenario, query)
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                failures += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return latencies, failures, time.perf_counter() - start
+
+
+def run_load(args) -> list[dict]:
+    upstream = fakes.create_upstream_app(args.groq_latency, args.search_latency, error_rate=args.error_rate)
+    upstream_port = fakes.free_port()
+    fakes.serve_in_thread(upstream, upstream_port)
+
+    results = []
+    for scenario in args.scenarios:
+        workdir = tempfile.mkdtemp(prefix=f"bench-{scenario}-", dir=_tmp)
+        port = fakes.free_port()
+        process = start_app(port, upstream_port, args, workdir)
+        try:
+            if scenario == "cached":
+                asyncio.run(prime_cache(f"http://127.0.0.1:{port}"))
+            for concurrency in args.concurrency:
+                calls = dict(upstream.state.calls)
+                latencies, failures, elapsed = asyncio.run(drive(f"http://127.0.0.1:{port}", scenario, concurrency, args.requests))
+                result = {
+                    "scenario": scenario,
+                    "concurrency": concurrency,
+                    "requests": len(latencies),
+                    "failures": failures,
+                    "throughput_rps": round(len(latencies) / elapsed, 2),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+                    "groq_calls_per_request": round((upstream.state.calls["groq"] - calls["groq"]) / len(latencies), 2),
+                    "serpapi_calls_per_request": round((upstream.state.calls["serpapi"] - calls["serpapi"]) / len(latencies), 2),
+                    "peak_rss_mb": peak_rss_mb(process.pid),  # Of the worker since it started for this scenario
+                }
+                print(json.dumps(result))
+                results.append(result)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+
+def save(results: dict, output: str | None) -> str:
+    if output is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['meta']['commit']}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    return output
+
+
+def flatten(results: dict) -> dict[str, float]:
+    """Comparable metrics keyed by benchmark, e.g. 'load/summarize/c10/p95_ms' or 'micro/chunk_text/long/median_us'."""
+    metrics = {}
+    for entry in results.get("micro", []):
+        prefix = "/".join(["micro", entry["name"]] + ([entry["fixture"]] if "fixture" in entry else []))
+        metrics[f"{prefix}/median_us"] = entry["median_us"]
+    for entry in results.get("load", []):
+        prefix = f"load/{entry['scenario']}/c{entry['concurrency']}"
+        for field, value in entry.items():
+            if isinstance(value, (int, float)) and field not in IGNORED_IN_COMPARE:
+                metrics[f"{prefix}/{field}"] = value
+    return metrics
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Print each shared metric's change and return how many regressed by more than `threshold` percent."""
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"base {base['meta']['commit']} ({base['meta']['created_at']})  new {new['meta']['commit']} ({new['meta']['created_at']})")
+    base_metrics, new_metrics = flatten(base), flatten(new)
+    regressions = 0
+    for key in sorted(base_metrics.keys() & new_metrics.keys()):
+        before, after = base_metrics[key], new_metrics[key]
+        if before == after:
+            change = 0.0
+        elif before:
+            change = (after - before) / abs(before) * 100
+        else:
+            change = float("inf")
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif worse < -threshold:
+            flag = "  improved"
+        print(f"{key:60} {before:>12g} -> {after:<12g} {change:+7.1f}%{flag}")
+    missing = sorted(base_metrics.keys() ^ new_metrics.keys())
+    if missing:
+        print(f"{len(missing)} metrics are only in one of the files, e.g. {missing[0]}")
+    print(f"{regressions} regressions above {threshold:g}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("micro", "load", "all"):
+        command = commands.add_parser(name)
+        command.add_argument("--output", help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+        if name in ("micro", "all"):
+            command.add_argument("--fixtures", nargs="+", default=list(SYNTHETIC_MINUTES))
+            command.add_argument("--repeat", type=int, default=7, help="Timing samples per micro-benchmark")
+        if name in ("load", "all"):
+            command.add_argument("--scenarios", nargs="+", choices=["summarize", "cached", "audio"], default=["summarize", "cached", "audio"])
+            command.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+            command.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+            command.add_argument("--fixture", default="medium", help="Transcript served for every video")
+            command.add_argument("--groq-latency", type=float, default=0.3)
+            command.add_argument("--search-latency", type=float, default=0.3)
+            command.add_argument("--transcript-latency", type=float, default=0.2)
+            command.add_argument("--tts-latency", type=float, default=0.5)
+            command.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream calls that fail, for every upstream")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(1 if compare(args.base, args.new, args.threshold) else 0)
+
+    options = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+    results = {"meta": {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": options,
+    }}
+    if args.command in ("micro", "all"):
+        results["micro"] = run_micro(args.fixtures, args.repeat)
+    if args.command in ("load", "all"):
+        results["load"] = run_load(args)
+    print(f"Results saved to {save(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Load test /summarize/ on a single uvicorn worker against local fake upstream servers.
+
+Run from the repository root: python -m benchmarks.load_async [--concurrency 1 10 50] [--requests 100]
+Every request uses a distinct query so the result cache never short-circuits the upstream calls.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fakes
+
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "summaries.db")
+
+
+async def drive(base_url: str, concurrency: int, requests: int, mode: str, run: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i: int):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/summarize/", params={"query": f"load test {run}-{i}", "mode": mode})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or response.json().get("error"):
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "failures": failures,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--mode", choices=["pipeline", "agent"], default="pipeline")
+    parser.add_argument("--groq-latency", type=float, default=0.3)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    upstream_port = fakes.free_port()
+    fakes.serve_in_thread(fakes.create_upstream_app(args.groq_latency, args.search_latency), upstream_port)
+    fakes.configure_env(upstream_port)
+    fakes.install_transcript_stub(args.transcript_latency)
+
+    os.makedirs("static", exist_ok=True)
+    from main import app
+    app_port = fakes.free_port()
+    fakes.serve_in_thread(app, app_port)
+
+    for run, concurrency in enumerate(args.concurrency):
+        print(asyncio.run(drive(f"http://127.0.0.1:{app_port}", concurrency, args.requests, args.mode, run)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Run the application as one uvicorn worker with its upstreams stubbed, for load tests in a separate process.
+
+Usage: python -m benchmarks.stub_server --port 8100 --upstream-port 8101 [--fixture medium]
+Groq and SerpApi traffic goes to the fake upstream server on --upstream-port; transcripts come from
+a fixture and speech from FakeGTTS, both in this process. The harness starts one of these per
+scenario, so the worker's peak RSS is its own and not the load generator's.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from benchmarks import fakes
+from benchmarks.fixtures import load_fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--upstream-port", type=int, required=True)
+    parser.add_argument("--fixture", default="medium")
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    parser.add_argument("--transcript-error-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.5)
+    parser.add_argument("--tts-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fakes.configure_env(args.upstream_port)
+    fakes.install_transcript_stub(args.transcript_latency, segments=load_fixture(args.fixture), error_rate=args.transcript_error_rate)
+    fakes.install_tts_stub(args.tts_latency, args.tts_error_rate)
+
+    os.makedirs("static", exist_ok=True)
+    from main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
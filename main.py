@@ -6,13 +6,54 @@ from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from services.clients import close_clients
+from services.jobs import job_queue, batch_queue
+from services.media_pool import media_pool
+from services.incremental import watch_scheduler
+from services.metrics import configure_logging, new_request_id, request_id, request_spans, http_request_seconds, server_timing
+from services.profiler import SamplingProfiler, profile_requested
+from services.health import lifecycle
+import logging
+import time
+from services import tools
+import asyncio
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+# Worker processes. The in-memory result cache and the /metrics registry are per process, so more
+# than one worker serves invalidated cache entries and scrapes a random worker's counters.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+RELOAD = os.getenv("RELOAD", "").lower() in ("1", "true", "yes")  # Development: one auto-reloading worker
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # Seconds in-flight requests get to finish on shutdown
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the job workers and watch scheduler, sharing pooled upstream clients and media processes for the worker's lifetime."""
+    lifecycle.install_signal_handlers()
+    if tools.WARMUP_MODELS:
+        await asyncio.to_thread(tools.warm_up)
+    job_queue.start()
+    batch_queue.start()
+    watch_scheduler.start()
+    lifecycle.start()
+    yield
+    lifecycle.drain()
+    await watch_scheduler.stop()
+    await job_queue.stop()
+    await batch_queue.stop()
+    await media_pool.shutdown()
+    await close_clients()
 
 app = FastAPI(
     title="YouTube Video Summarizer",
     description="An API to summarize YouTube videos without watching them.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -32,16 +73,56 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.middleware("http")
-async def restart_after_request(request, call_next):
-    """Ensures the server remains active by handling connection resets."""
-    response = await call_next(request)
-    
-    # Restart FastAPI if it becomes unresponsive
-    if response.status_code in [500, 503]:  # Restart on Internal Server Error or Service Unavailable
-        os.system("kill -9 $(lsof -t -i:8000)")  # Kills existing process on port 8000
-        os.system("uvicorn main:app --reload &")  # Restart server in the background
-    
+async def observe_requests(request: Request, call_next):
+    """Give each request an ID for its logs, time it by route and stage, and profile it when asked to."""
+    rid = new_request_id(request.headers.get("x-request-id"))
+    request_id.set(rid)  # Copied into the endpoint's task, the jobs it submits and its threads
+    spans = []
+    request_spans.set(spans)
+    profiler = SamplingProfiler().start() if profile_requested(request.query_params, request.headers) else None
+    start = time.perf_counter()
+
+    def finish(status: int, route: str) -> None:
+        elapsed = time.perf_counter() - start
+        http_request_seconds.observe(elapsed, method=request.method, route=route, status=status)
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(rid)
+        logger.info(f"{request.method} {request.url.path} {status} {elapsed * 1000:.0f}ms {server_timing(spans)}")
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish(500, getattr(request.scope.get("route"), "path", "unmatched"))
+        raise
+    route = getattr(request.scope.get("route"), "path", "unmatched")  # Templated, e.g. /jobs/{job_id}
+    response.headers["X-Request-ID"] = rid
+    if spans:
+        response.headers["Server-Timing"] = server_timing(spans)  # Stages finished before the body starts
+    if profiler is not None:
+        response.headers["X-Profile"] = f"/debug/profiles/{rid}"
+
+    body = response.body_iterator
+
+    async def timed_body():
+        # Streaming responses (SSE, NDJSON, audio) are only done once their body is.
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish(response.status_code, route)
+
+    response.body_iterator = timed_body()
     return response
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    # Uvicorn supervises the workers, replacing any that die, and drains each on SIGTERM.
+    os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)  # Workers size their media pools to their share of the cores
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=1 if RELOAD else WEB_CONCURRENCY,
+        reload=RELOAD,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT
+    )
@@ -0,0 +1,157 @@
+from typing import Iterator
+import numpy as np
+import subprocess
+import shutil
+import wave
+import os
+
+SAMPLE_RATE = 16000  # What Google's recognizer expects; speech needs nothing more
+BLOCK_SECONDS = 1.0  # Audio decoded per step, which bounds decoder memory whatever the file length
+SILENCE_SEARCH_SECONDS = 2.0  # Chunks are cut at the quietest point within this much of their end
+SILENCE_FRAME_SECONDS = 0.1
+
+
+class StreamingResampler:
+    """Downmix interleaved int16 PCM to mono and resample it block by block, carrying state between blocks.
+
+    A boxcar low-pass over one output period limits aliasing before linear interpolation; both are
+    vectorised, so each block costs a few NumPy passes.
+    """
+
+    def __init__(self, source_rate: int, channels: int, target_rate: int = SAMPLE_RATE):
+        self.channels = channels
+        self.step = source_rate / target_rate
+        self.taps = max(1, int(round(self.step)))
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)  # Filter input carried into the next block
+        self._last = np.zeros(0, dtype=np.float32)  # Last filtered sample, for interpolating across blocks
+        self._position = 0.0  # Position of the next output sample, relative to the start of _last
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        samples = block.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        if self.step == 1:
+            return samples.astype(np.int16)
+        if self.taps > 1:
+            padded = np.concatenate([self._history, samples])
+            self._history = padded[-(self.taps - 1):]
+            samples = np.convolve(padded, np.full(self.taps, 1 / self.taps, dtype=np.float32), mode="valid")
+
+        source = np.concatenate([self._last, samples])
+        if len(source) == 0:
+            return np.zeros(0, dtype=np.int16)
+        count = int(np.floor((len(source) - 1 - self._position) / self.step)) + 1
+        if count <= 0:
+            return np.zeros(0, dtype=np.int16)
+        positions = self._position + self.step * np.arange(count)
+        output = np.interp(positions, np.arange(len(source)), source)
+        self._position = positions[-1] + self.step - (len(source) - 1)
+        self._last = source[-1:]
+        return np.clip(np.round(output), -32768, 32767).astype(np.int16)
+
+
+def wav_blocks(path: str) -> Iterator[np.ndarray]:
+    """Decode a WAV file into 16 kHz mono int16 blocks without loading it whole."""
+    with wave.open(path, "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        resampler = StreamingResampler(rate, channels)
+        frames_per_block = int(rate * BLOCK_SECONDS)
+        while True:
+            raw = wav.readframes(frames_per_block)
+            if not raw:
+                return
+            if width == 2:
+                block = np.frombuffer(raw, dtype="<i2")
+            elif width == 1:
+                block = ((np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8)
+            elif width == 4:
+                block = (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.int16)
+            else:
+                raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+            yield resampler.process(block)
+
+def ffmpeg_blocks(path: str) -> Iterator[np.ndarray]:
+    """Decode any format ffmpeg understands (WebM/Opus from browsers, MP3, M4A...) as a 16 kHz mono stream."""
+    if shutil.which("ffmpeg") is None:
+        raise ValueError("Only WAV audio can be decoded without ffmpeg installed.")
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    block_bytes = int(SAMPLE_RATE * BLOCK_SECONDS) * 2
+    try:
+        while True:
+            raw = process.stdout.read(block_bytes)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype="<i2")
+        if process.wait() != 0:
+            raise ValueError(f"Audio decoding failed: {process.stderr.read().decode(errors='replace').strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+def pcm_blocks(path: str) -> Iterator[np.ndarray]:
+    """16 kHz mono int16 blocks of an audio file, whatever its format."""
+    with open(path, "rb") as audio_file:
+        header = audio_file.read(12)
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return wav_blocks(path)
+    return ffmpeg_blocks(path)
+
+def quietest_split(samples: np.ndarray, search: int) -> int:
+    """Index within the last `search` samples where short-term energy is lowest, to avoid cutting words."""
+    frame = int(SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    start = max(len(samples) - search, 0)
+    window = samples[start:].astype(np.float32)
+    frames = len(window) // frame
+    if frames < 2:
+        return len(samples)
+    energy = np.square(window[:frames * frame].reshape(frames, frame)).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+def decode_chunks(path: str, chunk_seconds: float) -> Iterator[np.ndarray]:
+    """Decode a whole file in one pass, yielding chunks of about chunk_seconds each cut at a pause.
+
+    Audio after a cut is carried into the next chunk, so at most one chunk and a block are held in memory.
+    """
+    chunk_samples = int(SAMPLE_RATE * chunk_seconds)
+    search = int(SAMPLE_RATE * SILENCE_SEARCH_SECONDS)
+    pending, pending_samples = [], 0
+    for block in pcm_blocks(path):
+        pending.append(block)
+        pending_samples += len(block)
+        if pending_samples > chunk_samples:
+            buffer = np.concatenate(pending)
+            split = quietest_split(buffer[:chunk_samples], search)
+            yield buffer[:split]
+            pending, pending_samples = [buffer[split:]], len(buffer) - split
+    if pending_samples:
+        yield np.concatenate(pending)
+
+def chunk_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"{index:06d}.pcm")
+
+def store_chunks(path: str, chunk_seconds: float, directory: str) -> int:
+    """Decode a file into numbered raw int16 chunk files in `directory` as it goes, returning how many there are.
+
+    Runs as one task in a worker process. Each chunk appears atomically, so a reader can pick chunks up
+    while later ones are still being decoded; removing the directory stops the decode at the next chunk.
+    """
+    count = 0
+    for samples in decode_chunks(path, chunk_seconds):
+        partial = chunk_path(directory, count) + ".part"
+        samples.astype("<i2").tofile(partial)
+        os.replace(partial, chunk_path(directory, count))
+        count += 1
+    return count
+
+def load_chunk(directory: str, index: int) -> np.ndarray | None:
+    """Read and remove a stored chunk, or None when it has not been written (yet)."""
+    file_path = chunk_path(directory, index)
+    if not os.path.exists(file_path):
+        return None
+    samples = np.fromfile(file_path, dtype="<i2")
+    os.remove(file_path)
+    return samples
@@ -0,0 +1,316 @@
+from typing import AsyncIterator, Callable
+from services.video_search import get_video_details, get_playlist_video_ids, playlist_id_from_query, video_id_from_query
+from services.transcript import get_video_transcript, has_transcript
+from services.summarizer import generate_summary_and_themes
+from services.text_to_speech import text_to_speech
+from services.pipeline import RESULT_FIELDS, new_result, store_summary, is_cacheable, summary_cache_key
+from services.cache import result_cache
+from services.jobs import ProgressCallback, pid_alive
+from services.rate_limit import use_priority, PRIORITY_BATCH
+from dotenv import load_dotenv
+import threading
+import logging
+import asyncio
+import sqlite3
+import json
+import time
+import uuid
+import re
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+BATCH_DB_PATH = os.getenv("BATCH_DB_PATH", "cache/batches.db")
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+# Items in flight per stage. Transcript fetches are cheap I/O; summaries are bounded by Groq's rate limits.
+BATCH_TRANSCRIPT_CONCURRENCY = int(os.getenv("BATCH_TRANSCRIPT_CONCURRENCY", "8"))
+BATCH_SUMMARY_CONCURRENCY = int(os.getenv("BATCH_SUMMARY_CONCURRENCY", "2"))
+BATCH_TTS_CONCURRENCY = int(os.getenv("BATCH_TTS_CONCURRENCY", "2"))
+BATCH_POLL_INTERVAL = 0.5  # Seconds between checks for newly finished items when following a batch
+
+ItemCallback = Callable[[dict], None]
+
+
+class BatchError(Exception):
+    """Raised for batch input that cannot be resolved to videos."""
+
+
+class BatchStore:
+    """SQLite record of batches and the outcome of every item, so interrupted batches can be resumed.
+
+    A batch is run by one process at a time: the server and summarize_batch.py claim it by recording
+    their PID, and a claim held by a process that has died lapses.
+    """
+
+    def __init__(self, path: str = BATCH_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS batches (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, options TEXT NOT NULL, total INTEGER NOT NULL,
+                created_at REAL NOT NULL, finished_at REAL, owner_pid INTEGER
+            )"""
+        )
+        try:
+            self._db.execute("ALTER TABLE batches ADD COLUMN owner_pid INTEGER")  # Stores created before batches were claimed
+        except sqlite3.OperationalError:
+            pass
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS batch_items (
+                batch_id TEXT NOT NULL, position INTEGER NOT NULL, video_id TEXT NOT NULL, status TEXT NOT NULL,
+                result TEXT, error TEXT, finished_at REAL, PRIMARY KEY (batch_id, position)
+            )"""
+        )
+        self._db.commit()
+
+    def create(self, video_ids: list[str], options: dict) -> str:
+        batch_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO batches (id, status, options, total, created_at) VALUES (?, 'pending', ?, ?, ?)",
+                (batch_id, json.dumps(options), len(video_ids), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO batch_items (batch_id, position, video_id, status) VALUES (?, ?, ?, 'pending')",
+                [(batch_id, position, video_id) for position, video_id in enumerate(video_ids)]
+            )
+            self._db.commit()
+        return batch_id
+
+    def get(self, batch_id: str) -> dict | None:
+        """Batch record with its options and per-status item counts."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM batch_items WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ).fetchall())
+        batch = dict(row)
+        batch["options"] = json.loads(batch["options"])
+        batch["running"] = pid_alive(batch["owner_pid"])
+        batch.update({status: counts.get(status, 0) for status in ("pending", "done", "failed")})
+        return batch
+
+    def set_status(self, batch_id: str, status: str) -> None:
+        finished_at = time.time() if status == "finished" else None
+        with self._lock:
+            self._db.execute("UPDATE batches SET status = ?, finished_at = ? WHERE id = ?", (status, finished_at, batch_id))
+            self._db.commit()
+
+    def claim(self, batch_id: str) -> bool:
+        """Make this process the batch's runner unless another live process already is; safe across processes."""
+        with self._lock:
+            row = self._db.execute("SELECT owner_pid FROM batches WHERE id = ?", (batch_id,)).fetchone()
+            if row is None:
+                return False
+            owner = row[0]
+            if owner is not None and owner != os.getpid() and pid_alive(owner):
+                return False
+            # Only succeeds if no other process claimed the batch since the owner was read.
+            claimed = self._db.execute(
+                "UPDATE batches SET owner_pid = ? WHERE id = ? AND owner_pid IS ?", (os.getpid(), batch_id, owner)
+            ).rowcount
+            self._db.commit()
+        return bool(claimed)
+
+    def release(self, batch_id: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE batches SET owner_pid = NULL WHERE id = ? AND owner_pid = ?", (batch_id, os.getpid()))
+            self._db.commit()
+
+    def pending_items(self, batch_id: str) -> list[tuple[int, str]]:
+        with self._lock:
+            return [tuple(row) for row in self._db.execute(
+                "SELECT position, video_id FROM batch_items WHERE batch_id = ? AND status = 'pending' ORDER BY position",
+                (batch_id,)
+            )]
+
+    def finish_item(self, batch_id: str, position: int, status: str, result: dict | None = None, error: str | None = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE batch_items SET status = ?, result = ?, error = ?, finished_at = ? WHERE batch_id = ? AND position = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), batch_id, position)
+            )
+            self._db.commit()
+
+    def finished_items(self, batch_id: str, offset: int = 0) -> list[dict]:
+        """Finished items in completion order, skipping the first `offset`."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM batch_items WHERE batch_id = ? AND status != 'pending' "
+                "ORDER BY finished_at, position LIMIT -1 OFFSET ?", (batch_id, offset)
+            ).fetchall()
+        return [self._item(row) for row in rows]
+
+    def reset_failed(self, batch_id: str) -> int:
+        """Queue failed items again, for resuming with retries."""
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE batch_items SET status = 'pending', error = NULL, finished_at = NULL WHERE batch_id = ? AND status = 'failed'",
+                (batch_id,)
+            ).rowcount
+            self._db.commit()
+        return count
+
+    @staticmethod
+    def _item(row) -> dict:
+        item = dict(row)
+        item["result"] = json.loads(item["result"]) if item["result"] else None
+        return item
+
+
+def resolve_video_ids(videos: list[str]) -> list[str]:
+    """Turn video IDs and links into video IDs, keeping order and dropping duplicates."""
+    video_ids, invalid = [], []
+    for video in videos:
+        video = video.strip()
+        video_id = video_id_from_query(video) or (video if re.fullmatch(r"[0-9A-Za-z_-]{11}", video) else None)
+        if video_id:
+            video_ids.append(video_id)
+        elif video:
+            invalid.append(video)
+    if invalid:
+        raise BatchError(f"Not a video ID or link: {', '.join(invalid[:5])}")
+    return list(dict.fromkeys(video_ids))
+
+async def create_batch(videos: list[str], playlist: str | None = None, tts: bool = False, language: str | None = None) -> str:
+    """Resolve videos and playlist entries and record them as a new batch."""
+    video_ids = resolve_video_ids(videos)
+    if playlist:
+        playlist_id = playlist_id_from_query(playlist)
+        if not playlist_id:
+            raise BatchError(f"Not a playlist ID or link: {playlist}")
+        try:
+            video_ids = list(dict.fromkeys(video_ids + await get_playlist_video_ids(playlist_id)))
+        except Exception as e:
+            raise BatchError(f"Failed to list playlist {playlist_id}: {str(e)}")
+    if not video_ids:
+        raise BatchError("No videos to summarize.")
+    if len(video_ids) > BATCH_MAX_ITEMS:
+        raise BatchError(f"Batch has {len(video_ids)} videos; the limit is {BATCH_MAX_ITEMS}.")
+    return batch_store.create(video_ids, {"tts": tts, "language": language})
+
+class StageLimits:
+    """Per-stage concurrency limits shared by every item of a batch run."""
+
+    def __init__(self, transcripts: int = BATCH_TRANSCRIPT_CONCURRENCY, summaries: int = BATCH_SUMMARY_CONCURRENCY,
+                 tts: int = BATCH_TTS_CONCURRENCY):
+        self.transcripts = asyncio.Semaphore(transcripts)
+        self.summaries = asyncio.Semaphore(summaries)
+        self.tts = asyncio.Semaphore(tts)
+        # Enough items in flight to keep every stage busy without fetching the whole batch up front.
+        self.window = asyncio.Semaphore(transcripts + summaries + tts)
+
+async def summarize_batch_item(video_id: str, tts: bool, language: str | None, limits: StageLimits) -> dict:
+    """Summarize one video through the transcript, summary and TTS stages. Raises when no summary is produced."""
+    result = new_result()
+    cached = result_cache.get(summary_cache_key(video_id, language))
+    if cached is not None and not cached[1]:  # Stale entries are summarized again, since a backfill should be current
+        payload = cached[0]
+        result.update({field: payload[field] for field in RESULT_FIELDS if field in payload})
+        summary_language = payload.get("language", language or "en")
+    else:
+        async with limits.transcripts:
+            details, (transcript, detected_language) = await asyncio.gather(
+                get_video_details(video_id), get_video_transcript(video_id)
+            )
+        result.update(details)
+        async with limits.summaries:
+            summary_data = await generate_summary_and_themes(transcript, result["title"], language=language or detected_language)
+        summary_language = summary_data["language"]
+        result["summary"] = summary_data["summary"]
+        result["sentiment"] = summary_data["sentiment"]
+        result["key_themes"] = summary_data["key_themes"]
+        result["fallback"] = summary_data.get("fallback", False)
+        if not is_cacheable(result) and not result["fallback"]:
+            raise RuntimeError(result["summary"])
+        if has_transcript(transcript):  # Title-only summaries are returned but not cached
+            store_summary(video_id, language, result, summary_language)
+
+    if tts:
+        async with limits.tts:
+            result["audio"] = await text_to_speech(result["summary"], language=summary_language)
+    return result
+
+async def run_batch(batch_id: str, on_item: ItemCallback | None = None, progress: ProgressCallback | None = None,
+                    limits: StageLimits | None = None) -> dict:
+    """Summarize every pending item of a batch, recording each outcome as soon as it is known.
+
+    Items are pipelined: while some summaries run, later transcripts are already being fetched.
+    A failing item is recorded and the batch carries on. Finished items are skipped, so running
+    an interrupted batch again resumes it. Raises BatchError when another process is running the batch.
+    """
+    batch = batch_store.get(batch_id)
+    if batch is None:
+        raise BatchError(f"Batch {batch_id} not found.")
+    if not batch_store.claim(batch_id):
+        raise BatchError(f"Batch {batch_id} is already being run by process {batch_store.get(batch_id)['owner_pid']}.")
+    try:
+        return await run_claimed_batch(batch, on_item, progress, limits)
+    finally:
+        batch_store.release(batch_id)
+
+async def run_claimed_batch(batch: dict, on_item: ItemCallback | None, progress: ProgressCallback | None,
+                            limits: StageLimits | None) -> dict:
+    batch_id = batch["id"]
+    tts, language = batch["options"]["tts"], batch["options"]["language"]
+    report = progress or (lambda fraction, message: None)
+    limits = limits or StageLimits()
+    pending = batch_store.pending_items(batch_id)
+    finished = batch["total"] - len(pending)
+    batch_store.set_status(batch_id, "running")
+
+    async def process(position: int, video_id: str):
+        nonlocal finished
+        async with limits.window:
+            try:
+                result = await summarize_batch_item(video_id, tts, language, limits)
+                batch_store.finish_item(batch_id, position, "done", result=result)
+                item = {"position": position, "video_id": video_id, "status": "done", "result": result, "error": None}
+            except Exception as e:
+                logger.warning(f"Batch {batch_id} item {video_id} failed: {str(e)}")
+                batch_store.finish_item(batch_id, position, "failed", error=str(e))
+                item = {"position": position, "video_id": video_id, "status": "failed", "result": None, "error": str(e)}
+        finished += 1
+        report(finished / batch["total"], f"Summarized {finished} of {batch['total']} videos")
+        if on_item:
+            on_item(item)
+
+    with use_priority(PRIORITY_BATCH):  # Interactive requests go first when the batch is waiting for Groq quota
+        await asyncio.gather(*(process(position, video_id) for position, video_id in pending))
+    batch_store.set_status(batch_id, "finished")
+    summary = batch_store.get(batch_id)
+    return {"batch_id": batch_id, "total": summary["total"], "done": summary["done"], "failed": summary["failed"]}
+
+async def follow_batch(batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL) -> AsyncIterator[dict]:
+    """Yield a batch's finished items in completion order, then a final status record.
+
+    Follows a batch being run by this or another process (such as summarize_batch.py); stops with
+    status "interrupted" once no live process holds the batch, in which case it can be resumed.
+    """
+    sent = 0
+    while True:
+        items = batch_store.finished_items(batch_id, offset=sent)
+        for item in items:
+            yield item
+        sent += len(items)
+        if items:
+            continue
+
+        batch = batch_store.get(batch_id)
+        if batch["status"] == "finished" or not batch["running"]:
+            if batch_store.finished_items(batch_id, offset=sent):
+                continue  # Items finished between the two queries
+            status = "finished" if batch["status"] == "finished" else "interrupted"
+            yield {"batch_id": batch_id, "status": status, "total": batch["total"], "done": batch["done"], "failed": batch["failed"]}
+            return
+        await asyncio.sleep(poll_interval)
+
+
+batch_store = BatchStore()
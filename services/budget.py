@@ -0,0 +1,76 @@
+from services.tokens import count_tokens, message_tokens
+from services.summarizer import CONTEXT_WINDOW
+from dotenv import load_dotenv
+import json
+import os
+
+load_dotenv()
+
+AGENT_REPLY_TOKENS = int(os.getenv("AGENT_REPLY_TOKENS", "1536"))  # Enough for the final JSON answer
+AGENT_TRANSCRIPT_TOKENS = int(os.getenv("AGENT_TRANSCRIPT_TOKENS", "800"))  # Transcript excerpt shown to the agent
+MIN_REPLY_TOKENS = int(os.getenv("AGENT_MIN_REPLY_TOKENS", "256"))  # Smallest reply that can still hold a tool call
+SAFETY_MARGIN_TOKENS = 256  # Slack for the approximate token counter
+
+
+class BudgetExceededError(Exception):
+    """Raised when the prompt leaves no room for a useful reply; callers should stop the agent and fall back."""
+
+
+class PromptBudget:
+    """Token accounting for one agent conversation against the model's context window.
+
+    Keeps the prompt plus the reply inside the window by trimming history, sizes each reply, and
+    records what every request sent so the cost of a conversation can be reported.
+    """
+
+    def __init__(self, tools: list | None = None, context_window: int = CONTEXT_WINDOW,
+                 reply_tokens: int = AGENT_REPLY_TOKENS):
+        self.context_window = context_window
+        self.reply_tokens = reply_tokens
+        self.tool_tokens = count_tokens(json.dumps(tools)) if tools else 0
+        self.sent = []  # Prompt tokens of each request
+        self._notes = []  # Messages explaining a failed reply, only useful until the next one
+
+    def add_retry_note(self, messages: list[dict], content: str) -> None:
+        """Append a note about a reply that could not be used; superseded notes are dropped by fit()."""
+        note = {"role": "assistant", "content": content}
+        self._notes.append(note)
+        messages.append(note)
+
+    def prompt_tokens(self, messages: list[dict]) -> int:
+        return self.tool_tokens + sum(message_tokens(message) for message in messages)
+
+    def available(self, messages: list[dict]) -> int:
+        """Tokens that can still be added to the conversation while leaving room for the reply."""
+        return self.context_window - SAFETY_MARGIN_TOKENS - self.reply_tokens - self.prompt_tokens(messages)
+
+    def fit(self, messages: list[dict]) -> list[dict]:
+        """Drop redundant history until the conversation fits.
+
+        Notes about earlier failed replies are kept only when they are the latest message. If that is
+        not enough, the oldest turns after the system prompt and the original request go first.
+        """
+        fitted = [message for i, message in enumerate(messages)
+                  if i == len(messages) - 1 or not any(message is note for note in self._notes)]
+        while self.available(fitted) < 0 and len(fitted) > 3:
+            del fitted[2]
+        return fitted
+
+    def max_tokens(self, messages: list[dict]) -> int:
+        """Reply size for the next request: the reply budget, or whatever the window still has room for.
+
+        Raises BudgetExceededError when that is less than MIN_REPLY_TOKENS, even after fit().
+        """
+        room = self.context_window - SAFETY_MARGIN_TOKENS - self.prompt_tokens(messages)
+        if room < MIN_REPLY_TOKENS:
+            raise BudgetExceededError(f"Prompt of {self.prompt_tokens(messages)} tokens leaves {max(room, 0)} of the "
+                                      f"{self.context_window}-token window for the reply; {MIN_REPLY_TOKENS} are needed.")
+        return min(self.reply_tokens, room)
+
+    def record(self, messages: list[dict]) -> int:
+        tokens = self.prompt_tokens(messages)
+        self.sent.append(tokens)
+        return tokens
+
+    def report(self) -> dict:
+        return {"requests": len(self.sent), "prompt_tokens": sum(self.sent), "largest_prompt_tokens": max(self.sent, default=0)}
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import threading
+import hashlib
+import logging
+import sqlite3
+import json
+import time
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache/summaries.db")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", str(24 * 3600)))  # Seconds an entry is served as fresh
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", str(7 * 24 * 3600)))  # Seconds a stale entry may still be served while it is refreshed
+
+
+def cache_key(video_id: str, language: str, model: str, prompt_version: str) -> str:
+    """Build a content address for a summary from everything that determines its output."""
+    raw = json.dumps([video_id, language, model, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-level summary cache: an in-process LRU with TTL in front of a SQLite store."""
+
+    def __init__(self, path: str = CACHE_DB_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl: int = CACHE_TTL, stale_ttl: int = CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._memory = OrderedDict()  # key -> (payload, created_at)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "writes": 0, "invalidations": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, video_id TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS summaries_video_id ON summaries (video_id)")
+        self._db.commit()
+
+    def get(self, key: str) -> tuple[dict, bool] | None:
+        """Return (payload, is_stale) for a key, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                source = "memory_hits"
+            else:
+                row = self._db.execute("SELECT payload, created_at FROM summaries WHERE key = ?", (key,)).fetchone()
+                entry = (json.loads(row[0]), row[1]) if row else None
+                source = "disk_hits"
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            payload, created_at = entry
+            age = now - created_at
+            if age > self.ttl + self.stale_ttl:
+                self._delete(key)
+                self._stats["misses"] += 1
+                return None
+
+            if source == "disk_hits":
+                self._remember(key, payload, created_at)
+            self._stats[source] += 1
+            stale = age > self.ttl
+            if stale:
+                self._stats["stale_hits"] += 1
+            return dict(payload), stale
+
+    def set(self, key: str, video_id: str, payload: dict) -> None:
+        """Store a summary payload in both layers."""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, payload, created_at)
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries (key, video_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, video_id, json.dumps(payload), created_at)
+            )
+            self._db.commit()
+            self._stats["writes"] += 1
+
+    def invalidate(self, video_id: str | None = None) -> int:
+        """Drop every cached summary for a video, or the whole cache when no video ID is given."""
+        with self._lock:
+            if video_id is None:
+                removed = self._db.execute("DELETE FROM summaries").rowcount
+                self._memory.clear()
+            else:
+                keys = [row[0] for row in self._db.execute("SELECT key FROM summaries WHERE video_id = ?", (video_id,))]
+                removed = self._db.execute("DELETE FROM summaries WHERE video_id = ?", (video_id,)).rowcount
+                for key in keys:
+                    self._memory.pop(key, None)
+            self._db.commit()
+            self._stats["invalidations"] += removed
+            return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current layer sizes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, payload: dict, created_at: float) -> None:
+        self._memory[key] = (payload, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str) -> None:
+        self._memory.pop(key, None)
+        self._db.execute("DELETE FROM summaries WHERE key = ?", (key,))
+        self._db.commit()
+
+
+result_cache = ResultCache()
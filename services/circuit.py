@@ -0,0 +1,110 @@
+from dotenv import load_dotenv
+import threading
+import logging
+import requests
+import httpx
+import time
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open a circuit; 0 disables
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # Seconds an open circuit fails fast before a trial call
+
+# Errors that say the service is unreachable or broken, as opposed to an answer we did not like.
+TRANSPORT_ERRORS = (OSError, TimeoutError, httpx.TransportError, requests.ConnectionError, requests.Timeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open; callers fail fast with it."""
+
+
+def is_failure(error: BaseException, failures: tuple[type, ...] = ()) -> bool:
+    """5xx responses and transport errors count against a circuit; 429s and 'not found' answers do not."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    return isinstance(error, TRANSPORT_ERRORS + failures)
+
+
+class CircuitBreaker:
+    """Closed → open after `threshold` consecutive failures → half-open trial after `reset_timeout`.
+
+    While open, calls fail immediately with CircuitOpenError instead of waiting on timeouts and
+    retries. One trial call is let through once the timeout passes; its outcome closes or reopens
+    the circuit. State is per worker process and safe to use from threads.
+    """
+
+    def __init__(self, name: str, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.stats = {"failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self.stats["rejected"] += 1
+        wait = f"for up to {remaining:.0f}s" if remaining > 0 else "while a trial call is in flight"
+        raise CircuitOpenError(f"{self.name} is unavailable; failing fast {wait}.")
+
+    def record(self, error: BaseException | None, failures: tuple[type, ...] = ()) -> None:
+        """Report the outcome of an admitted call."""
+        if self.threshold <= 0:
+            return
+        failed = error is not None and is_failure(error, failures)
+        with self._lock:
+            self._trial_running = False
+            if error is not None and not isinstance(error, Exception):
+                return  # Cancelled: says nothing about the upstream
+            if not failed:
+                if self.state != "closed":
+                    logger.info(f"Circuit for {self.name} closed")
+                self.state = "closed"
+                self._failures = 0
+                return
+            self.stats["failures"] += 1
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.threshold:
+                if self.state != "open":
+                    self.stats["opened"] += 1
+                    logger.warning(f"Circuit for {self.name} opened after {self._failures} failures: {str(error)}")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic() if self.state == "open" else 0.0
+            return dict(self.stats, state=self.state, consecutive_failures=self._failures, retry_in=round(max(retry_in, 0.0), 1))
+
+
+breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    """The circuit breaker of an upstream, created on first use."""
+    with _breakers_lock:
+        if name not in breakers:
+            breakers[name] = CircuitBreaker(name)
+        return breakers[name]
+
+
+def circuit_stats() -> dict:
+    return {name: circuit.snapshot() for name, circuit in list(breakers.items())}
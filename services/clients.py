@@ -0,0 +1,34 @@
+from requests.adapters import HTTPAdapter
+from youtube_transcript_api import YouTubeTranscriptApi
+from dotenv import load_dotenv
+from groq import AsyncGroq
+import requests
+import httpx
+import os
+
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+# One pooled keep-alive client shared by every async upstream call (Groq, SerpApi, oEmbed).
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+    timeout=httpx.Timeout(HTTP_TIMEOUT, connect=5.0)
+)
+
+# GROQ_BASE_URL is honoured by the SDK itself, which lets benchmarks point it at a local fake.
+# Retries are left to services.rate_limit, which shares one quota across every caller.
+groq_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+
+# youtube-transcript-api only speaks requests, so it gets its own pooled session and runs in worker threads.
+transcript_session = requests.Session()
+transcript_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_MAX_KEEPALIVE))
+transcript_api = YouTubeTranscriptApi(http_client=transcript_session)
+
+
+async def close_clients():
+    """Release pooled connections on application shutdown."""
+    await http_client.aclose()
+    transcript_session.close()
@@ -0,0 +1,61 @@
+from typing import Any, Awaitable, Callable
+import logging
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+flights = {}  # name -> SingleFlight, for reporting
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight upstream call.
+
+    Every waiter receives the shared result or exception. A waiter that is cancelled (for example
+    because its client disconnected) leaves without affecting the others; when the last waiter
+    leaves, the shared call is cancelled too unless `cancel_orphans` is False.
+    """
+
+    def __init__(self, name: str, cancel_orphans: bool = True):
+        self.name = name
+        self.cancel_orphans = cancel_orphans
+        self._calls = {}  # key -> {"task": asyncio.Task, "waiters": int}
+        self.stats = {"upstream_calls": 0, "coalesced": 0, "errors": 0, "orphans_cancelled": 0}
+        flights[name] = self
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._calls.get(key)
+        if entry is None:
+            entry = {"task": asyncio.create_task(factory()), "waiters": 0}
+            self._calls[key] = entry
+            entry["task"].add_done_callback(lambda task: self._finished(key, entry, task))
+            self.stats["upstream_calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and self.cancel_orphans and not entry["task"].done():
+                # Nobody is left to use the result; free the upstream call and let new callers start afresh.
+                self._forget(key, entry)
+                entry["task"].cancel()
+                self.stats["orphans_cancelled"] += 1
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _finished(self, key: str, entry: dict, task: asyncio.Task) -> None:
+        self._forget(key, entry)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def _forget(self, key: str, entry: dict) -> None:
+        if self._calls.get(key) is entry:
+            del self._calls[key]
+
+
+def coalescing_stats() -> dict:
+    """Per-call-site counters; `coalesced` is the number of upstream calls saved."""
+    return {name: dict(flight.stats, in_flight=flight.in_flight()) for name, flight in flights.items()}
@@ -0,0 +1,126 @@
+from services.clients import http_client
+from services.circuit import circuit_stats
+from services.jobs import job_store
+from services import tools
+from dotenv import load_dotenv
+import threading
+import logging
+import asyncio
+import signal
+import time
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_TTL = float(os.getenv("HEALTH_CHECK_TTL", "10"))  # Seconds upstream probe results are reused
+HEALTH_CHECK_TIMEOUT = 3.0
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com")
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+
+# Cheap, quota-free endpoints that show whether each upstream answers at all.
+UPSTREAM_PROBES = {
+    "groq": lambda: http_client.get(f"{GROQ_BASE_URL}/openai/v1/models", headers={"Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}"}),
+    "serpapi": lambda: http_client.get(f"{SERPAPI_BASE_URL}/account.json", params={"api_key": os.getenv("SERPAPI_API_KEY")}),
+    "youtube": lambda: http_client.get("https://www.youtube.com/generate_204"),
+}
+
+
+class Lifecycle:
+    """Whether this worker has finished starting up and whether it is draining for shutdown."""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.started_at = None
+
+    def start(self) -> None:
+        self.ready = True
+        self.started_at = time.time()
+
+    def drain(self) -> None:
+        if not self.draining:
+            logger.info("Draining: readiness now fails and open streams are being closed")
+        self.draining = True
+
+    def install_signal_handlers(self) -> None:
+        """Start draining on SIGTERM/SIGINT, then hand the signal on to the server's own handler.
+
+        Uvicorn stops accepting connections and waits for in-flight requests on the same signal;
+        draining first lets readiness fail and long-lived streams end instead of holding shutdown up.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+
+            def handler(received, frame, previous=previous):
+                self.drain()
+                if callable(previous):
+                    previous(received, frame)
+                else:
+                    signal.signal(received, previous)
+                    signal.raise_signal(received)
+
+            signal.signal(signum, handler)
+
+
+lifecycle = Lifecycle()
+_probe_cache = {"checked_at": 0.0, "results": {}}
+_probe_lock = asyncio.Lock()
+
+
+async def probe_upstream(name: str) -> dict:
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(UPSTREAM_PROBES[name](), HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    if response.status_code in (401, 403):
+        return {"ok": False, "error": "unauthorized", "latency_ms": latency_ms}
+    # A 429 or 404 still proves the service is up; only server errors count against it.
+    return {"ok": response.status_code < 500, "status": response.status_code, "latency_ms": latency_ms}
+
+
+async def upstream_health() -> dict:
+    """Reachability of each upstream, probed at most every HEALTH_CHECK_TTL seconds, with its circuit state."""
+    async with _probe_lock:
+        if time.monotonic() - _probe_cache["checked_at"] > HEALTH_CHECK_TTL:
+            results = await asyncio.gather(*(probe_upstream(name) for name in UPSTREAM_PROBES))
+            _probe_cache["results"] = dict(zip(UPSTREAM_PROBES, results))
+            _probe_cache["checked_at"] = time.monotonic()
+    circuits = circuit_stats()
+    report = {}
+    for name, result in _probe_cache["results"].items():
+        report[name] = dict(result)
+    for name, circuit in circuits.items():
+        entry = report.setdefault(name, {"ok": True})
+        entry["circuit"] = circuit["state"]
+        if circuit["state"] == "open":
+            entry["ok"] = False
+    return report
+
+
+async def readiness(strict: bool = False) -> tuple[bool, dict]:
+    """Whether this worker should receive traffic, with the checks behind the answer.
+
+    Local problems (still starting, draining, job store unusable, models not yet warmed when
+    WARMUP_MODELS is set) make it not ready. Unreachable upstreams only do so with `strict`, since
+    they affect every worker alike and taking all of them out of rotation would not help.
+    """
+    checks = {"started": lifecycle.ready, "draining": lifecycle.draining}
+    try:
+        job_store.ping()
+        checks["job_store"] = True
+    except Exception as e:
+        checks["job_store"] = False
+        logger.error(f"Job store check failed: {str(e)}")
+    checks["models"] = "ready" if tools.models_ready() else ("loading" if tools.WARMUP_MODELS else "lazy")
+    upstreams = await upstream_health()
+
+    ready = lifecycle.ready and not lifecycle.draining and checks["job_store"] and checks["models"] != "loading"
+    degraded = [name for name, status in upstreams.items() if not status["ok"]]
+    if strict and degraded:
+        ready = False
+    return ready, {"status": "ready" if ready else "not_ready", "checks": checks, "upstreams": upstreams, "degraded": degraded}
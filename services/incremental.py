@@ -0,0 +1,248 @@
+from services.transcript import refresh_video_transcript
+from services.transcript_store import transcript_store, segments_digest, TRANSCRIPT_DB_PATH
+from services.summarizer import generate_summary_and_themes, update_summary, PROMPT_VERSION
+from services.pipeline import store_summary, is_cacheable
+from services.video_search import get_video_details
+from services.coalesce import SingleFlight
+from services.rate_limit import use_priority, PRIORITY_BACKGROUND
+from services.jobs import job_queue, job_store, QueueFullError, ProgressCallback, ACTIVE_STATUSES
+from dotenv import load_dotenv
+import threading
+import logging
+import asyncio
+import sqlite3
+import time
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+WATCH_INTERVAL = int(os.getenv("WATCH_INTERVAL", "300"))  # Default seconds between refreshes of a watched video
+WATCH_MIN_INTERVAL = int(os.getenv("WATCH_MIN_INTERVAL", "60"))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "15"))  # Seconds between checks for watches that are due
+WATCH_IDLE_LIMIT = int(os.getenv("WATCH_IDLE_LIMIT", "12"))  # Refreshes in a row without new captions before a watch pauses; 0 never pauses
+
+refresh_flight = SingleFlight("refresh_summary")
+
+
+def covers_prefix(progress: dict | None, segments: list[dict]) -> bool:
+    """Whether a rolling summary still describes the start of these segments, so only the rest is new."""
+    if progress is None or progress["prompt_version"] != PROMPT_VERSION or progress["segment_count"] > len(segments):
+        return False
+    return segments_digest(segments[:progress["segment_count"]]) == progress["digest"]
+
+
+async def refresh_summary(video_id: str, language: str | None = None, progress: ProgressCallback | None = None) -> dict:
+    """Bring a video's rolling summary up to date, sharing one refresh among concurrent callers."""
+    key = f"{video_id}:{language or 'auto'}"
+    return dict(await refresh_flight.do(key, lambda: summarize_new_segments(video_id, language, progress)))
+
+
+async def summarize_new_segments(video_id: str, language: str | None, progress: ProgressCallback | None = None) -> dict:
+    """Summarize only the transcript segments the video's rolling summary does not cover yet.
+
+    The first refresh summarizes the whole transcript. So does any refresh after already summarized
+    captions were rewritten or the prompts changed. The result also replaces the video's summary
+    cache entry, so /summarize/ serves the latest version.
+    """
+    report = progress or (lambda fraction, message: None)
+    report(0.0, "Fetching transcript")
+    record = await refresh_video_transcript(video_id)
+    if record is None:
+        return {"video_id": video_id, "status": "no_transcript"}
+
+    segments = record["segments"]
+    summary_language = language or record["language"]
+    state = transcript_store.get_progress(video_id, summary_language)
+    covered = state["segment_count"] if covers_prefix(state, segments) else 0
+    new_segments = segments[covered:]
+    outcome = {
+        "video_id": video_id,
+        "language": summary_language,
+        "segments": len(segments),
+        "new_segments": len(new_segments),
+        "new_characters": sum(len(segment["text"]) for segment in new_segments),
+    }
+    if covered and not new_segments:
+        return dict(outcome, status="unchanged")
+
+    if covered:
+        report(0.3, f"Summarizing {len(new_segments)} new segments")
+        details = state["summary"]
+        summary = await update_summary(details, " ".join(segment["text"] for segment in new_segments), summary_language)
+    else:
+        report(0.3, "Summarizing the whole transcript")
+        details = await get_video_details(video_id)
+        summary = await generate_summary_and_themes(record["text"], details["title"], language=summary_language)
+    result = {field: details.get(field) for field in ("title", "channel", "link")}
+    result.update({field: summary[field] for field in ("summary", "sentiment", "key_themes")})
+    result["fallback"] = summary.get("fallback", False)
+    if not is_cacheable(result):
+        raise RuntimeError("Summary generation failed; the new segments will be retried on the next refresh.")
+
+    transcript_store.set_progress(video_id, summary_language, segments, PROMPT_VERSION, result)
+    store_summary(video_id, language, result, summary_language)
+    report(1.0, "Done")
+    return dict(outcome, status="updated", mode="incremental" if covered else "full", summary=result)
+
+
+class WatchStore:
+    """SQLite list of videos whose summaries are refreshed on a schedule, shared by all workers."""
+
+    def __init__(self, path: str = TRANSCRIPT_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS watches (
+                video_id TEXT PRIMARY KEY, language TEXT, interval REAL NOT NULL, next_run_at REAL,
+                idle_runs INTEGER NOT NULL DEFAULT 0, last_status TEXT, last_run_at REAL, summary_language TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+
+    def add(self, video_id: str, language: str | None, interval: float) -> dict:
+        """Watch a video, or update and resume an existing watch; the first refresh is due at once."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO watches (video_id, language, interval, next_run_at, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET language = excluded.language, interval = excluded.interval, "
+                "next_run_at = excluded.next_run_at, idle_runs = 0",
+                (video_id, language, interval, now, now)
+            )
+            self._db.commit()
+        return self.get(video_id)
+
+    def get(self, video_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM watches WHERE video_id = ?", (video_id,)).fetchone()
+        return dict(row) if row else None
+
+    def all(self) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute("SELECT * FROM watches ORDER BY created_at")]
+
+    def remove(self, video_id: str) -> bool:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM watches WHERE video_id = ?", (video_id,)).rowcount
+            self._db.commit()
+        return bool(removed)
+
+    def claim_due(self, now: float) -> list[dict]:
+        """Watches due for a refresh, each moved to its next run so other workers do not claim it too."""
+        claimed = []
+        with self._lock:
+            due = self._db.execute("SELECT * FROM watches WHERE next_run_at <= ? ORDER BY next_run_at", (now,)).fetchall()
+            for watch in due:
+                updated = self._db.execute(
+                    "UPDATE watches SET next_run_at = ? WHERE video_id = ? AND next_run_at = ?",
+                    (now + watch["interval"], watch["video_id"], watch["next_run_at"])
+                ).rowcount
+                if updated:
+                    claimed.append(dict(watch))
+            self._db.commit()
+        return claimed
+
+    def reschedule(self, video_id: str, at: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE watches SET next_run_at = ? WHERE video_id = ? AND next_run_at IS NOT NULL", (at, video_id))
+            self._db.commit()
+
+    def finish(self, video_id: str, status: str, summary_language: str | None = None) -> None:
+        """Record a refresh's outcome; a watch whose refreshes keep finding nothing new is paused."""
+        idle = status in ("unchanged", "no_transcript")
+        with self._lock:
+            self._db.execute(
+                "UPDATE watches SET last_status = ?, last_run_at = ?, summary_language = COALESCE(?, summary_language), "
+                "idle_runs = CASE WHEN ? THEN idle_runs + 1 ELSE 0 END WHERE video_id = ?",
+                (status, time.time(), summary_language, idle, video_id)
+            )
+            if WATCH_IDLE_LIMIT > 0:
+                paused = self._db.execute(
+                    "UPDATE watches SET next_run_at = NULL WHERE video_id = ? AND idle_runs >= ? AND next_run_at IS NOT NULL",
+                    (video_id, WATCH_IDLE_LIMIT)
+                ).rowcount
+                if paused:
+                    logger.info(f"Paused watch of {video_id} after {WATCH_IDLE_LIMIT} refreshes without new captions")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            active, paused = self._db.execute(
+                "SELECT COALESCE(SUM(next_run_at IS NOT NULL), 0), COALESCE(SUM(next_run_at IS NULL), 0) FROM watches"
+            ).fetchone()
+        return {"active": active, "paused": paused}
+
+
+class WatchScheduler:
+    """Poll the watch list and queue a background refresh job for each watch that is due."""
+
+    def __init__(self, store: WatchStore, poll_interval: float = WATCH_POLL_INTERVAL):
+        self.store = store
+        self.poll_interval = poll_interval
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def tick(self) -> int:
+        """Queue refreshes for the watches that are due and return how many were queued."""
+        queued = 0
+        for watch in self.store.claim_due(time.time()):
+            job = job_store.find_by_artifact(watch_artifact(watch["video_id"]))
+            if job and job["status"] in ACTIVE_STATUSES:
+                continue  # The previous refresh is still running; this one would find the same new segments
+            try:
+                submit_refresh(watch["video_id"], watch["language"])
+            except QueueFullError as e:
+                logger.warning(f"Refresh of watched video {watch['video_id']} not queued: {str(e)}")
+                self.store.reschedule(watch["video_id"], time.time() + self.poll_interval)
+                continue
+            queued += 1
+        return queued
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Watch scheduler tick failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+
+def watch_artifact(video_id: str) -> str:
+    return f"watch:{video_id}"
+
+
+def submit_refresh(video_id: str, language: str | None) -> str:
+    """Queue a refresh of a video's rolling summary and return the job ID; raises QueueFullError."""
+    return job_queue.submit("refresh_summary", {"video_id": video_id, "language": language}, artifact=watch_artifact(video_id))
+
+
+async def refresh_summary_job(payload: dict, report: ProgressCallback) -> dict:
+    """Job handler for scheduled and on-demand refreshes of a rolling summary."""
+    video_id = payload["video_id"]
+    try:
+        with use_priority(PRIORITY_BACKGROUND):
+            outcome = await refresh_summary(video_id, payload.get("language"), report)
+    except Exception:
+        watch_store.finish(video_id, "failed")
+        raise
+    watch_store.finish(video_id, outcome["status"], outcome.get("language"))
+    return outcome
+
+job_queue.register("refresh_summary", refresh_summary_job)
+
+watch_store = WatchStore()
+watch_scheduler = WatchScheduler(watch_store)
@@ -0,0 +1,238 @@
+from typing import Awaitable, Callable
+from services.metrics import span, request_id
+from dotenv import load_dotenv
+import threading
+import logging
+import asyncio
+import sqlite3
+import json
+import time
+import uuid
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "cache/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# Batches run for minutes to hours, so they get their own workers and never hold up audio, summary or refresh jobs.
+BATCH_JOB_WORKERS = int(os.getenv("BATCH_JOB_WORKERS", "1"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # Seconds finished jobs are kept
+
+ACTIVE_STATUSES = ("queued", "running")
+
+ProgressCallback = Callable[[float, str], None]
+JobHandler = Callable[[dict, ProgressCallback], Awaitable[dict | None]]
+
+
+def pid_alive(pid: int | None) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity; callers should answer with HTTP 429."""
+
+
+class JobStore:
+    """SQLite-backed record of job state, progress and results."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0,
+                message TEXT, artifact TEXT, result TEXT, error TEXT, worker_pid INTEGER,
+                created_at REAL NOT NULL, started_at REAL, finished_at REAL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_artifact ON jobs (artifact)")
+        self._db.commit()
+
+    def create(self, kind: str, artifact: str | None = None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, artifact, worker_pid, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, artifact, os.getpid(), time.time())
+            )
+            self._db.commit()
+        return job_id
+
+    def ping(self) -> None:
+        """Raise if the database cannot be queried, for readiness checks."""
+        with self._lock:
+            self._db.execute("SELECT 1").fetchone()
+
+    def update(self, job_id: str, **fields) -> None:
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def find_by_artifact(self, artifact: str) -> dict | None:
+        """Most recent job producing the given artifact (e.g. an audio file name)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE artifact = ? ORDER BY created_at DESC LIMIT 1", (artifact,)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def queue_position(self, job: dict, kinds: tuple[str, ...]) -> int:
+        """Number of queued jobs of the given kinds that were submitted before this one."""
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ? AND kind IN ({placeholders})",
+                (job["created_at"], *kinds)
+            ).fetchone()[0]
+
+    def average_duration(self, kind: str, sample: int = 50) -> float | None:
+        """Mean run time of the most recent completed jobs of a kind, used for ETAs."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs "
+                "WHERE kind = ? AND status = 'done' ORDER BY finished_at DESC LIMIT ?)", (kind, sample)
+            ).fetchone()
+        return row[0]
+
+    def fail_interrupted(self) -> int:
+        """Mark jobs owned by dead worker processes as failed; their in-memory queue entries are gone.
+
+        Jobs of sibling workers that are still running are left alone.
+        """
+        count = 0
+        with self._lock:
+            pids = [row[0] for row in self._db.execute("SELECT DISTINCT worker_pid FROM jobs WHERE status IN ('queued', 'running')")]
+            for pid in pids:
+                if pid != os.getpid() and pid_alive(pid):
+                    continue
+                count += self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart.', finished_at = ? "
+                    "WHERE status IN ('queued', 'running') AND worker_pid IS ?", (time.time(), pid)
+                ).rowcount
+            self._db.commit()
+        return count
+
+    def prune(self, max_age: int = JOB_RETENTION) -> int:
+        with self._lock:
+            count = self._db.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND created_at < ?", (time.time() - max_age,)
+            ).rowcount
+            self._db.commit()
+        return count
+
+    @staticmethod
+    def _to_dict(row) -> dict | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobQueue:
+    """Bounded in-process queue drained by a fixed pool of asyncio workers."""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE):
+        self.store = store
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._handlers = {}
+        self._tasks = []
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def handles(self, kind: str) -> bool:
+        return kind in self._handlers
+
+    def submit(self, kind: str, payload: dict, artifact: str | None = None) -> str:
+        """Queue a job and return its ID, or raise QueueFullError when the queue is at capacity."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if self._queue.full():
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} pending jobs).")
+        job_id = self.store.create(kind, artifact)
+        self._queue.put_nowait((job_id, kind, payload, request_id.get()))
+        return job_id
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def describe(self, job: dict) -> dict:
+        """Job record with an ETA in seconds for jobs that have not finished."""
+        average = self.store.average_duration(job["kind"])
+        eta = None
+        if job["status"] == "queued" and average is not None:
+            eta = (self.store.queue_position(job, tuple(self._handlers)) // self.workers + 1) * average
+        elif job["status"] == "running":
+            elapsed = time.time() - job["started_at"]
+            if job["progress"] > 0:
+                eta = elapsed / job["progress"] * (1 - job["progress"])
+            elif average is not None:
+                eta = max(average - elapsed, 0.0)
+        job["eta_seconds"] = round(eta, 1) if eta is not None else None
+        return job
+
+    def start(self) -> None:
+        failed = self.store.fail_interrupted()
+        pruned = self.store.prune()
+        if failed or pruned:
+            logger.info(f"Job store: {failed} interrupted jobs marked failed, {pruned} old jobs pruned")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id, kind, payload, submitted_by = await self._queue.get()
+            self.store.update(job_id, status="running", started_at=time.time())
+            # Job logs carry the submitting request's ID, so a request can be followed into its jobs.
+            token = request_id.set(submitted_by if submitted_by != "-" else job_id[:16])
+
+            def report(progress: float, message: str) -> None:
+                self.store.update(job_id, progress=round(min(max(progress, 0.0), 1.0), 3), message=message)
+
+            try:
+                with span(f"job.{kind}"):
+                    result = await self._handlers[kind](payload, report)
+                self.store.update(job_id, status="done", progress=1.0, result=result, finished_at=time.time())
+            except asyncio.CancelledError:
+                self.store.update(job_id, status="failed", error="Cancelled during shutdown.", finished_at=time.time())
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} ({kind}) failed: {str(e)}")
+                self.store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                request_id.reset(token)
+                self._queue.task_done()
+
+
+job_store = JobStore()
+job_queue = JobQueue(job_store)
+batch_queue = JobQueue(job_store, workers=BATCH_JOB_WORKERS)
@@ -0,0 +1,112 @@
+from typing import Any, Callable
+from collections import Counter
+from services.tools import get_pipeline
+from services.tokens import chunk_text, content_words
+from dotenv import load_dotenv
+import logging
+import asyncio
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_BATCH_SIZE", "8"))
+LOCAL_BATCH_WINDOW_MS = float(os.getenv("LOCAL_BATCH_WINDOW_MS", "20"))  # How long to gather requests into one batch
+LOCAL_CHUNK_TOKENS = 700  # Stays under BART's 1024-token input limit with the approximate counter
+
+
+class MicroBatcher:
+    """Gather concurrent requests for up to `window_ms` (or `max_batch` items) and run them as one forward pass."""
+
+    def __init__(self, name: str, run_batch: Callable[[list], list], max_batch: int = LOCAL_BATCH_SIZE,
+                 window_ms: float = LOCAL_BATCH_WINDOW_MS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.stats = {"requests": 0, "batches": 0}
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        self.stats["requests"] += 1
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            pending = [(item, future) for item, future in batch if not future.cancelled()]
+            if not pending:
+                continue
+            self.stats["batches"] += 1
+            try:
+                # One thread runs inference; torch parallelises the padded batch across its own intra-op threads.
+                results = await asyncio.to_thread(self.run_batch, [item for item, _ in pending])
+                for (_, future), result in zip(pending, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def run_summaries(texts: list[str]) -> list[str]:
+    """Summarize a padded batch of texts with BART in a single call."""
+    outputs = get_pipeline("summarizer")(
+        texts, batch_size=len(texts), max_length=130, min_length=30, do_sample=False, truncation=True
+    )
+    return [output["summary_text"] for output in outputs]
+
+def run_sentiments(texts: list[str]) -> list[str]:
+    """Classify sentiment for a padded batch of texts in a single call."""
+    outputs = get_pipeline("sentiment_analyzer")(texts, batch_size=len(texts), truncation=True)
+    return [output["label"] for output in outputs]
+
+summary_batcher = MicroBatcher("summarizer", run_summaries)
+sentiment_batcher = MicroBatcher("sentiment_analyzer", run_sentiments)
+
+def extract_key_themes(text: str, count: int = 5) -> str:
+    """Most frequent content words, as a stand-in for the themes Groq would name."""
+    words = content_words(text)
+    return ", ".join(word for word, _ in Counter(words).most_common(count)) or "Unknown"
+
+async def local_summary_and_themes(text: str, language: str = "en") -> dict:
+    """Summarize a transcript with the local models, in the same shape as generate_summary_and_themes.
+
+    Chunks of one transcript, and chunks of concurrent requests, share batches through the micro-batchers.
+    The BART model is English-only, so the summary is always in English whatever language was asked
+    for, and the result is marked as a fallback so it is not cached in place of Groq's summary.
+    """
+    chunks = chunk_text(text, LOCAL_CHUNK_TOKENS)
+    if not chunks:
+        raise ValueError("Nothing to summarize.")
+    partials = await asyncio.gather(*(summary_batcher.submit(chunk) for chunk in chunks))
+    summary = " ".join(partials)
+    while len(partials) > 1 and len(chunk_text(summary, LOCAL_CHUNK_TOKENS)) > 1:
+        partials = await asyncio.gather(*(summary_batcher.submit(chunk) for chunk in chunk_text(summary, LOCAL_CHUNK_TOKENS)))
+        summary = " ".join(partials)
+    sentiment = await sentiment_batcher.submit(summary)
+    return {
+        "summary": summary,
+        "sentiment": sentiment.capitalize(),
+        "key_themes": extract_key_themes(text),
+        "language": "en",
+        "fallback": True
+    }
@@ -0,0 +1,117 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+from dotenv import load_dotenv
+import multiprocessing
+import functools
+import logging
+import asyncio
+import time
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Cores left over from the event loop, shared among the server's worker processes; 0 runs media work in threads.
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", str(max(1, ((os.cpu_count() or 2) - 1) // int(os.getenv("WEB_CONCURRENCY", "1"))))))
+MEDIA_QUEUE_SIZE = int(os.getenv("MEDIA_QUEUE_SIZE", "32"))  # Tasks allowed to wait for a worker
+MEDIA_TASK_TIMEOUT = float(os.getenv("MEDIA_TASK_TIMEOUT", "120"))
+MEDIA_MAX_TASKS_PER_CHILD = int(os.getenv("MEDIA_MAX_TASKS_PER_CHILD", "100"))  # Recycles workers to cap memory growth
+
+
+class MediaPoolBusyError(Exception):
+    """Raised when every worker is busy and the wait queue is full; callers should answer with HTTP 503."""
+
+
+class MediaPool:
+    """Process pool for CPU-bound audio work, so decoding never competes with the event loop for the GIL.
+
+    Admission is bounded: at most `workers` tasks run and `queue_size` wait, beyond which submit fails
+    fast. Workers are spawned (not forked, so no inherited locks or sockets) on first use and replaced
+    after `max_tasks_per_child` tasks.
+    """
+
+    def __init__(self, workers: int = MEDIA_WORKERS, queue_size: int = MEDIA_QUEUE_SIZE,
+                 timeout: float = MEDIA_TASK_TIMEOUT, max_tasks_per_child: int = MEDIA_MAX_TASKS_PER_CHILD):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._pending = 0  # Tasks admitted and not yet finished, including ones whose caller timed out
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "rejected": 0, "restarts": 0}
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child or None
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float | None = None) -> Any:
+        """Run a picklable top-level function in a worker process and return its result.
+
+        Raises MediaPoolBusyError when the queue is full and asyncio.TimeoutError after `timeout` seconds.
+        A timed-out task cannot be interrupted inside its worker; it keeps its slot until it finishes.
+        """
+        capacity = max(self.workers, 1) + self.queue_size
+        if self._pending >= capacity:
+            self.stats["rejected"] += 1
+            raise MediaPoolBusyError(f"Media workers are busy ({self._pending} tasks in flight); try again shortly.")
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        executor = self._get_executor() if self.workers > 0 else None
+        if executor is not None:
+            future = loop.run_in_executor(executor, functools.partial(fn, *args))
+        else:
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        self._pending += 1
+        self.stats["submitted"] += 1
+        future.add_done_callback(functools.partial(self._finished, start))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"Media task {getattr(fn, '__name__', fn)} timed out after {timeout or self.timeout:g}s")
+            raise
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+    def _finished(self, start: float, future: asyncio.Future) -> None:
+        self._pending -= 1
+        self._busy_seconds += time.perf_counter() - start
+        if future.cancelled() or future.exception() is not None:
+            self.stats["failed"] += 1
+        else:
+            self.stats["completed"] += 1
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """Replace a pool whose worker died (killed or out of memory); the next task spawns fresh workers."""
+        if self._executor is executor:
+            logger.error("A media worker died unexpectedly; restarting the media pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.stats["restarts"] += 1
+
+    async def shutdown(self) -> None:
+        """Cancel queued tasks, let running ones finish and stop the workers."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats,
+            workers=self.workers,
+            queue_size=self.queue_size,
+            in_flight=self._pending,
+            busy_seconds=round(self._busy_seconds, 2),
+        )
+
+
+media_pool = MediaPool()
@@ -0,0 +1,239 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable
+from services.circuit import breaker
+from dotenv import load_dotenv
+import threading
+import bisect
+import logging
+import time
+import uuid
+import re
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+request_id = ContextVar("request_id", default="-")
+# Spans finished during the current request, shared by the tasks and threads it starts.
+request_spans = ContextVar("request_spans", default=None)
+
+Family = tuple[str, str, str, list[tuple[dict, float]]]  # (name, type, help, [(labels, value)])
+
+
+def new_request_id(candidate: str | None = None) -> str:
+    """Use a caller-supplied request ID when it is safe to log and to use in file names, else make one."""
+    if candidate and re.fullmatch(r"[A-Za-z0-9._-]{1,64}", candidate):
+        return candidate
+    return uuid.uuid4().hex[:16]
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter keyed by label values; safe to update from worker threads."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> list[Family]:
+        with self._lock:
+            samples = [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+        return [(self.name, self.type, self.help, samples)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values, in the Prometheus exposition layout."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            counts[index] += 1
+            counts[-1] += value
+
+    def collect(self) -> list[Family]:
+        samples = []
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(({**labels, "le": "+Inf" if bound == float("inf") else f"{bound:g}", "__suffix": "_bucket"}, cumulative))
+            samples.append(({**labels, "__suffix": "_sum"}, counts[-1]))
+            samples.append(({**labels, "__suffix": "_count"}, cumulative))
+        return [(self.name, self.type, self.help, samples)]
+
+
+class Registry:
+    """Metrics of this worker process plus collectors that read existing service stats at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        families = [family for metric in self._metrics for family in metric.collect()]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {str(e)}")
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = dict(labels)
+                suffix = labels.pop("__suffix", "")
+                lines.append(f"{name}{suffix}{format_labels(labels)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time until the response body is complete, by route; includes streamed bodies.", ("method", "route", "status"))
+stage_seconds = registry.histogram(
+    "stage_duration_seconds", "Duration of pipeline stages (search, transcript, summary, parse, tts...).", ("stage", "outcome"))
+upstream_seconds = registry.histogram(
+    "upstream_request_duration_seconds", "Duration of calls to external services.", ("upstream", "outcome"))
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Calls to external services by outcome.", ("upstream", "outcome"))
+groq_tokens = registry.counter(
+    "groq_tokens_total", "Tokens Groq reported as used, by kind.", ("kind",))
+
+
+def record_span(stage: str, seconds: float) -> None:
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into stage_duration_seconds and the current request's Server-Timing breakdown."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage, outcome=outcome)
+        record_span(stage, elapsed)
+        logger.debug(f"stage={stage} outcome={outcome} ms={elapsed * 1000:.1f}")
+
+
+@contextmanager
+def upstream_call(upstream: str, failures: tuple[type, ...] = ()):
+    """Guard one call to an external service with its circuit breaker, and count and time it.
+
+    Raises CircuitOpenError without calling when the circuit is open. `failures` adds the service's
+    own exception types that mean it is down, next to 5xx responses and transport errors.
+    """
+    circuit = breaker(upstream)
+    try:
+        circuit.before_call()
+    except Exception:
+        upstream_requests.inc(upstream=upstream, outcome="circuit_open")
+        raise
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        circuit.record(e, failures)
+        status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+        outcome = "rate_limited" if status == 429 else "error"
+        raise
+    else:
+        circuit.record(None)
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_seconds.observe(elapsed, upstream=upstream, outcome=outcome)
+        upstream_requests.inc(upstream=upstream, outcome=outcome)
+        record_span(f"upstream.{upstream}", elapsed)
+
+
+def server_timing(spans: list[tuple[str, float]]) -> str:
+    """Server-Timing header value summing repeated stages, e.g. 'search;dur=120.5, groq;dur=900.1;desc="x3"'."""
+    totals = {}
+    for stage, seconds in spans:
+        total, count = totals.get(stage, (0.0, 0))
+        totals[stage] = (total + seconds, count + 1)
+    entries = []
+    for stage, (total, count) in totals.items():
+        entry = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', stage)};dur={total * 1000:.1f}"
+        entries.append(entry + (f';desc="x{count}"' if count > 1 else ""))
+    return ", ".join(entries)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp every log record with the ID of the request (or job) it was logged for."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """Send application logs to stderr with the request ID, once per process."""
+    root = logging.getLogger()
+    if any(isinstance(f, RequestIdFilter) for handler in root.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One line per upstream request is noise next to the spans
@@ -0,0 +1,181 @@
+from services.video_search import search_youtube_video, extract_videoid, video_id_from_query, get_video_details
+from services.transcript import get_video_transcript, has_transcript
+from services.summarizer import generate_summary_and_themes, MODEL, PROMPT_VERSION
+from services.text_to_speech import text_to_speech, audio_file_name, AUDIO_DIR
+from services.cache import result_cache, cache_key
+from services.rate_limit import use_priority, PRIORITY_BACKGROUND
+from services.jobs import job_queue, job_store, QueueFullError, ProgressCallback, ACTIVE_STATUSES
+from services.metrics import span
+from typing import Callable
+import logging
+import asyncio
+import os
+
+logger = logging.getLogger(__name__)
+
+EventCallback = Callable[[str, dict], None]  # (event name, data), for streaming stages to clients
+
+RESULT_FIELDS = ("title", "channel", "link", "summary", "sentiment", "key_themes", "audio", "error", "fallback")
+
+_background_tasks = set()
+_revalidating = set()
+
+def new_result() -> dict:
+    """Empty summary result with the fields of VideoSummaryResponse."""
+    return {"title": "N/A", "channel": None, "link": "", "summary": "", "sentiment": "N/A", "key_themes": "", "audio": None, "error": None, "fallback": False}
+
+def summary_cache_key(video_id: str, language: str | None) -> str:
+    """Cache key for a video's summary under the current model and prompt templates."""
+    return cache_key(video_id, language or "auto", MODEL, PROMPT_VERSION)
+
+def is_cacheable(result: dict) -> bool:
+    """Only complete, error-free summaries from Groq are worth caching; local fallback summaries are not."""
+    summary = result.get("summary") or ""
+    return bool(summary) and not result.get("error") and not result.get("fallback") and not summary.startswith("Summary unavailable")
+
+async def synthesize_audio(payload: dict, report: ProgressCallback) -> dict:
+    """Job handler: render a summary to its content-addressed MP3 file."""
+    report(0.1, "Synthesizing audio")
+    audio_path = await text_to_speech(payload["text"], language=payload["language"])
+    if not audio_path:
+        raise RuntimeError("Audio synthesis failed.")
+    return {"audio": audio_path}
+
+job_queue.register("audio", synthesize_audio)
+
+def attach_audio(result: dict, language: str) -> None:
+    """Queue speech synthesis for the summary and record where the audio will be served from.
+
+    Audio already on disk or already queued is reused. Clients can poll /audio-status/{file_name}
+    or play /stream-audio/{file_name} while it is being synthesized.
+    """
+    file_name = audio_file_name(result["summary"], language)
+    result["audio"] = f"/static/{file_name}"
+    if os.path.exists(os.path.join(AUDIO_DIR, file_name)):
+        return
+    job = job_store.find_by_artifact(file_name)
+    if job and job["status"] in ACTIVE_STATUSES:
+        return
+
+    payload = {"text": result["summary"], "language": language}
+    try:
+        job_queue.submit("audio", payload, artifact=file_name)
+    except QueueFullError as e:
+        logger.warning(f"Audio synthesis not queued: {str(e)}")
+        result["audio"] = None
+        return
+    logger.info(f"Assigned audio path: /static/{file_name}")
+
+def store_summary(video_id: str, language: str | None, result: dict, summary_language: str) -> None:
+    """Cache a finished summary, without per-request fields such as audio."""
+    if not is_cacheable(result):
+        return
+    payload = {field: result.get(field) for field in RESULT_FIELDS if field not in ("audio", "error", "fallback")}
+    payload["language"] = summary_language
+    result_cache.set(summary_cache_key(video_id, language), video_id, payload)
+
+async def cached_summary(video_id: str, language: str | None, tts: bool) -> dict | None:
+    """Serve a cached summary, refreshing it in the background when it is stale."""
+    with span("cache.lookup"):
+        cached = result_cache.get(summary_cache_key(video_id, language))
+    if cached is None:
+        return None
+    payload, stale = cached
+    if stale:
+        schedule_revalidation(video_id, language, payload)
+
+    result = new_result()
+    result.update({field: payload[field] for field in RESULT_FIELDS if field in payload})
+    result["audio"] = None
+    if tts:
+        attach_audio(result, payload.get("language", "en"))
+    logger.info(f"Cache hit for video {video_id} (stale={stale})")
+    return result
+
+def schedule_revalidation(video_id: str, language: str | None, payload: dict):
+    """Start a single background refresh for a stale cache entry."""
+    key = summary_cache_key(video_id, language)
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+    with use_priority(PRIORITY_BACKGROUND):  # The task inherits the priority from the current context
+        task = asyncio.create_task(revalidate(video_id, language, payload))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def revalidate(video_id: str, language: str | None, payload: dict):
+    """Re-summarize a known video directly from its transcript and refresh the cache entry.
+
+    Without a transcript the existing entry is kept, since a summary of the title alone is worse.
+    """
+    key = summary_cache_key(video_id, language)
+    try:
+        transcript, detected_language = await get_video_transcript(video_id)
+        if not has_transcript(transcript):
+            logger.info(f"Kept cached summary for video {video_id}: its transcript is unavailable")
+            return
+        summary_data = await generate_summary_and_themes(transcript, payload.get("title"), language=language or detected_language)
+        store_summary(video_id, language, dict(payload, **summary_data), summary_data["language"])
+        logger.info(f"Revalidated cached summary for video {video_id}")
+    except Exception as e:
+        logger.warning(f"Failed to revalidate cached summary for video {video_id}: {str(e)}")
+    finally:
+        _revalidating.discard(key)
+
+async def run_pipeline(query: str, tts: bool, language: str | None = None,
+                       progress: ProgressCallback | None = None,
+                       emit: EventCallback | None = None, found: dict | None = None) -> tuple[dict, str | None, str]:
+    """Summarize a video by running search, transcript, summary and TTS directly in code.
+
+    Links skip search entirely, and so does a search result the caller already `found` for the query
+    (whose summary the caller has already looked up in the cache). Returns the result together with the
+    video ID to cache it under and the language of the summary. The video ID is None when there is
+    nothing to cache: the result came from the cache, no video was found, or the transcript could not
+    be fetched and the summary only reflects the title.
+    With `emit`, each stage's output is also sent as it completes ("video", "transcript", "token",
+    "summary"), with summary tokens streamed from Groq.
+    """
+    report = progress or (lambda fraction, message: None)
+    send = emit or (lambda event, data: None)
+    result = new_result()
+    summary_language = language or "en"
+
+    report(0.0, "Resolving video")
+    video_id = video_id_from_query(query)
+    if video_id:
+        result.update(await get_video_details(video_id))
+        send("video", {field: result[field] for field in ("title", "channel", "link")})
+    else:
+        search_result = found or await search_youtube_video(query)
+        if "error" in search_result:
+            result["error"] = search_result["error"]
+            return result, None, summary_language
+        result.update(search_result)
+        video_id = extract_videoid(search_result["link"])
+        if not video_id:
+            result["error"] = f"No video found for '{query}'."
+            return result, None, summary_language
+        send("video", {field: result[field] for field in ("title", "channel", "link")})
+        cached = None if found else await cached_summary(video_id, language, tts)
+        if cached:
+            return cached, None, summary_language
+
+    report(0.2, "Fetching transcript")
+    transcript, detected_language = await get_video_transcript(video_id)
+    send("transcript", {"available": has_transcript(transcript), "language": detected_language})
+    report(0.4, "Generating summary")
+    on_token = (lambda token: send("token", {"text": token})) if emit else None
+    summary_data = await generate_summary_and_themes(transcript, result["title"], language=language or detected_language,
+                                                     on_token=on_token)
+    summary_language = summary_data["language"]
+    result["summary"] = summary_data["summary"]
+    result["sentiment"] = summary_data["sentiment"]
+    result["key_themes"] = summary_data["key_themes"]
+    result["fallback"] = summary_data.get("fallback", False)
+    send("summary", summary_data)
+    if tts:
+        attach_audio(result, summary_language)
+    report(1.0, "Done")
+    if not has_transcript(transcript):
+        return result, None, summary_language  # Transcript fetches often fail transiently; do not pin a title-only summary
+    return result, video_id, summary_language
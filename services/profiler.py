@@ -0,0 +1,72 @@
+from collections import Counter
+from dotenv import load_dotenv
+import threading
+import logging
+import time
+import sys
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Off unless enabled: a request then asks for a profile with ?profile=1 or an X-Profile: 1 header.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "cache/profiles")
+PROFILE_MAX_DEPTH = 64
+
+
+class SamplingProfiler:
+    """Sample one thread's Python stack at a fixed interval from a background thread.
+
+    Pointed at the event loop thread, it shows where the loop spends its time while a request is in
+    flight, including other requests' work interleaved with it. Output is collapsed stacks, which
+    flamegraph.pl, speedscope and similar viewers read directly.
+    """
+
+    def __init__(self, thread_id: int | None = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def save(self, name: str) -> str:
+        """Write the collapsed stacks under PROFILE_DIR and return the file path."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}.collapsed")
+        with open(path, "w") as profile_file:
+            profile_file.write(self.collapsed())
+        logger.info(f"Profile of {sum(self.samples.values())} samples over {time.perf_counter() - self._started:.2f}s written to {path}")
+        return path
+
+
+def profile_requested(query_params, headers) -> bool:
+    return PROFILING_ENABLED and (query_params.get("profile") in ("1", "true") or headers.get("x-profile") in ("1", "true"))
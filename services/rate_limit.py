@@ -0,0 +1,262 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from services.clients import groq_client, http_client
+from services.tokens import count_tokens
+from services.metrics import span, upstream_call, groq_tokens
+from groq import RateLimitError, APIConnectionError, InternalServerError
+from dotenv import load_dotenv
+import itertools
+import logging
+import asyncio
+import random
+import heapq
+import httpx
+import json
+import time
+import re
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Starting quotas (Groq's free tier for llama3-70b-8192); the token limit follows Groq's response headers.
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "6000"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "5"))
+GROQ_BACKOFF_BASE = 1.0  # Seconds before the first retry when Groq gives no Retry-After
+GROQ_BACKOFF_MAX = 60.0
+COMPLETION_TOKEN_ESTIMATE = 1024  # Reserved per request for the reply, settled against the reported usage
+
+# Lower values are served first when callers are waiting for quota.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_BATCH = 2
+
+groq_priority = ContextVar("groq_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def use_priority(priority: int):
+    """Run the Groq calls made inside the block (and the tasks it starts) at the given priority."""
+    token = groq_priority.set(priority)
+    try:
+        yield
+    finally:
+        groq_priority.reset(token)
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse Groq's reset durations such as '7.66s', '2m59.56s' or '120ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    return sum(float(amount) * units[unit] for amount, unit in parts) if parts else None
+
+
+class RateLimiter:
+    """Token buckets for requests/min and tokens/min, granting quota to waiting callers in priority order.
+
+    Callers wait instead of failing. The token bucket never holds more than Groq reports as remaining,
+    which keeps several workers sharing one API key under the quota, and a 429 pauses everyone until
+    its Retry-After has passed.
+    """
+
+    def __init__(self, rpm: float = GROQ_RPM, tpm: float = GROQ_TPM, period: float = 60.0):
+        self.rpm = rpm  # Requests per `period`, which is a minute except in benchmarks
+        self.tpm = tpm
+        self.period = period
+        self._requests = rpm
+        self._tokens = tpm
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []  # heap of (priority, sequence, tokens, future)
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._dispatcher = None
+        self.stats = {"granted": 0, "waited": 0, "wait_seconds": 0.0, "rate_limited": 0, "retries": 0}
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Wait until one request and `tokens` tokens are available, behind any higher-priority callers."""
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        self._wakeup.set()
+        start = time.monotonic()
+        await future
+        waited = time.monotonic() - start
+        if waited > 0.01:
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += waited
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct the token bucket once the response reports how many tokens the request really used."""
+        self._refill()
+        self._tokens = min(self._tokens + reserved - used, self.tpm)
+
+    def block(self, seconds: float) -> None:
+        """Hold every caller back for `seconds`, e.g. after a 429."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def observe(self, headers: httpx.Headers) -> None:
+        """Adapt to the quota Groq reports in its x-ratelimit-* response headers."""
+        limit_tokens = headers.get("x-ratelimit-limit-tokens")
+        if limit_tokens and float(limit_tokens) != self.tpm:
+            logger.info(f"Groq token limit is {limit_tokens}/min (was {self.tpm:g})")
+            self.tpm = float(limit_tokens)
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self._refill()
+            self._tokens = min(self._tokens, float(remaining_tokens))
+        # The request headers describe the daily quota; only an exhausted one changes what we do.
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            self.block(parse_duration(headers.get("x-ratelimit-reset-requests")) or GROQ_BACKOFF_MAX)
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return dict(
+            self.stats,
+            wait_seconds=round(self.stats["wait_seconds"], 3),
+            rpm=self.rpm,
+            tpm=self.tpm,
+            available_requests=round(self._requests, 2),
+            available_tokens=round(self._tokens),
+            waiting=sum(1 for *_, future in self._waiters if not future.done()),
+            blocked_for=round(max(self._blocked_until - time.monotonic(), 0.0), 2),
+        )
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self._requests + elapsed * self.rpm / self.period, self.rpm)
+        self._tokens = min(self._tokens + elapsed * self.tpm / self.period, self.tpm)
+
+    def _delay(self, tokens: int) -> float:
+        """Seconds until a request for `tokens` tokens fits in both buckets."""
+        self._refill()
+        tokens = min(tokens, self.tpm)  # Oversized requests go through once the bucket is full
+        delays = [self._blocked_until - time.monotonic(), 0.0]
+        if self._requests < 1:
+            delays.append((1 - self._requests) * self.period / self.rpm)
+        if self._tokens < tokens:
+            delays.append((tokens - self._tokens) * self.period / self.tpm)
+        return max(delays)
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():  # The caller was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay(tokens)
+            if delay <= 0:
+                heapq.heappop(self._waiters)
+                self._requests -= 1
+                self._tokens -= min(tokens, self.tpm)
+                self.stats["granted"] += 1
+                future.set_result(None)
+                continue
+            # Sleep until the head of the queue fits, waking early when a higher-priority caller arrives.
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+def hinted_delay(headers: httpx.Headers) -> float | None:
+    """Seconds Groq asks us to wait after a 429: its Retry-After, or else its token reset time."""
+    return parse_duration(headers.get("retry-after")) or parse_duration(headers.get("x-ratelimit-reset-tokens"))
+
+def retry_delay(attempt: int, hinted: float | None = None) -> float:
+    """Exponential backoff with full jitter, on top of the delay Groq hinted at when there is one.
+
+    The growing jitter spreads out callers that hit the same 429, so they do not all retry the moment
+    the quota returns and burn their attempts on one another.
+    """
+    return (hinted or 0.0) + random.uniform(0, min(GROQ_BACKOFF_BASE * 2 ** attempt, GROQ_BACKOFF_MAX))
+
+def estimate_tokens(request: dict) -> int:
+    """Tokens a chat completion request is expected to consume, prompt plus reply."""
+    prompt = sum(count_tokens(message.get("content") or "") for message in request["messages"])
+    if request.get("tools"):
+        prompt += count_tokens(json.dumps(request["tools"]))
+    return prompt + min(request.get("max_tokens") or COMPLETION_TOKEN_ESTIMATE, COMPLETION_TOKEN_ESTIMATE)
+
+def record_usage(reserved: int, usage) -> None:
+    """Settle a request's reserved tokens against the usage Groq reported, or keep the reservation without it."""
+    groq_limiter.settle(reserved, usage.total_tokens if usage is not None else reserved)
+    if usage is not None:
+        groq_tokens.inc(usage.prompt_tokens, kind="prompt")
+        groq_tokens.inc(usage.completion_tokens, kind="completion")
+
+async def settled_stream(stream, reserved: int):
+    """Pass a streamed completion's chunks through, settling its reservation once the stream ends or is closed.
+
+    Groq reports usage in the last chunk, under x_groq (or usage in OpenAI-style responses).
+    """
+    usage = None
+    try:
+        async for chunk in stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(chunk, "usage", None) or getattr(x_groq, "usage", None) or usage
+            yield chunk
+    finally:
+        await stream.close()
+        record_usage(reserved, usage)
+
+async def groq_chat_completion(priority: int | None = None, **request):
+    """Create a Groq chat completion within the shared quota, retrying 429s and transient errors.
+
+    Waits for quota rather than failing; raises only once GROQ_MAX_RETRIES retries are exhausted.
+    With stream=True the chunks are returned as an async iterator that settles the quota when it ends.
+    """
+    priority = groq_priority.get() if priority is None else priority
+    estimate = estimate_tokens(request)
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        with span("groq.quota_wait"):
+            await groq_limiter.acquire(estimate, priority)
+        try:
+            with upstream_call("groq", failures=(APIConnectionError,)):
+                response = await groq_client.chat.completions.create(**request)
+        except RateLimitError as e:
+            groq_limiter.stats["rate_limited"] += 1
+            hinted = hinted_delay(e.response.headers)
+            if hinted is not None:
+                groq_limiter.block(hinted)  # The quota is gone for everyone until then
+            if attempt == GROQ_MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt, hinted)
+            logger.warning(f"Groq rate limit hit; retrying in {delay:.1f}s ({attempt + 1}/{GROQ_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+        except (APIConnectionError, InternalServerError) as e:
+            if attempt == GROQ_MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            logger.warning(f"Groq request failed: {str(e)}; retrying in {delay:.1f}s ({attempt + 1}/{GROQ_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+        else:
+            if request.get("stream"):
+                return settled_stream(response, estimate)
+            record_usage(estimate, response.usage)
+            return response
+        groq_limiter.stats["retries"] += 1
+
+async def observe_response(response: httpx.Response) -> None:
+    """httpx response hook feeding Groq's rate-limit headers to the limiter."""
+    if "/openai/v1/" in response.request.url.path:
+        groq_limiter.observe(response.headers)
+
+
+groq_limiter = RateLimiter()
+http_client.event_hooks["response"].append(observe_response)
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from services.cache import CACHE_DB_PATH
+from services.tokens import STOPWORDS
+from dotenv import load_dotenv
+import unicodedata
+import threading
+import difflib
+import logging
+import sqlite3
+import json
+import time
+import re
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds a query's search results are reused
+SEARCH_RESULTS_KEPT = int(os.getenv("SEARCH_RESULTS_KEPT", "5"))  # Top results stored per query
+SEARCH_FUZZY_CUTOFF = float(os.getenv("SEARCH_FUZZY_CUTOFF", "0.7"))  # Minimum match score for a fuzzy hit; above 1 disables
+SEARCH_INDEX_MAX_ENTRIES = int(os.getenv("SEARCH_INDEX_MAX_ENTRIES", "20000"))  # Titles and queries kept for fuzzy lookups
+SEARCH_INDEX_REFRESH = 10.0  # Seconds between picking up entries other workers wrote
+SEARCH_FUZZY_MIN_WORDS = 2  # Shorter queries are too ambiguous to match without searching
+SEARCH_FUZZY_MAX_CANDIDATES = 200
+WORD_TYPO_CUTOFF = 0.8
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, Unicode variants, punctuation and whitespace so equivalent queries share a key.
+
+    '+' and '#' survive so 'C++ tutorial' and 'C# tutorial' stay distinct.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(re.sub(r"[^\w+#]+|_", " ", text).split())
+
+
+def match_words(normalized: str) -> list[str]:
+    """The words of a normalized query or title that identify it, without stopwords."""
+    words = [word for word in normalized.split() if word not in STOPWORDS]
+    return words or normalized.split()
+
+
+def match_score(query_words: list[str], candidate_words: list[str], exact_numbers: bool) -> float:
+    """How well a candidate title or past query answers a query, from 0 to 1.
+
+    Every query word has to appear in the candidate, allowing small typos in longer words, and
+    numbers must match exactly ('iphone 15' never matches 'iphone 14'). The score is then the F1 of
+    matched words, so long titles with a few of the query's words score low.
+    """
+    query_numbers = {word for word in query_words if any(char.isdigit() for char in word)}
+    candidate_numbers = {word for word in candidate_words if any(char.isdigit() for char in word)}
+    if not query_numbers <= candidate_numbers or (exact_numbers and query_numbers != candidate_numbers):
+        return 0.0
+    candidates = set(candidate_words)
+    for word in query_words:
+        if word in candidates:
+            continue
+        if word in query_numbers or len(word) < 4 or not difflib.get_close_matches(word, candidates, n=1, cutoff=WORD_TYPO_CUTOFF):
+            return 0.0
+    precision = min(len(set(query_words)) / len(candidates), 1.0)
+    return 2 * precision / (precision + 1)
+
+
+class SearchCache:
+    """SQLite cache of search results by normalized query, with a fuzzy index of known titles.
+
+    Exact lookups return the stored top results of a query for SEARCH_CACHE_TTL seconds. When a
+    query has not been seen, it is matched against the titles of videos earlier searches returned
+    and against earlier queries; a close enough match answers with that video and SerpApi is not
+    called. The fuzzy index is held in memory per worker and filled from the shared database.
+    """
+
+    def __init__(self, path: str = CACHE_DB_PATH, ttl: int = SEARCH_CACHE_TTL, fuzzy_cutoff: float = SEARCH_FUZZY_CUTOFF,
+                 max_index_entries: int = SEARCH_INDEX_MAX_ENTRIES):
+        self.ttl = ttl
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.max_index_entries = max_index_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "expired": 0, "links": 0, "writes": 0}
+        self._index = OrderedDict()  # ("title", video_id) or ("query", normalized) -> (words, result, created_at)
+        self._words = {}  # word -> set of index keys
+        self._loaded = {"searches": 0, "videos": 0}  # Highest rowid read from each table
+        self._refreshed_at = 0.0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, results TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, title TEXT NOT NULL, channel TEXT, link TEXT NOT NULL, seen_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def lookup(self, query: str, count_misses: bool = True) -> list[dict] | None:
+        """Cached results for a query: its own top results, or the one video a fuzzy match points to.
+
+        Pass `count_misses=False` for a peek ahead of a search that will count the miss itself.
+        """
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT results, created_at FROM searches WHERE query = ?", (normalized,)).fetchone()
+            if row and time.time() - row[1] <= self.ttl:
+                self._stats["hits"] += 1
+                return json.loads(row[0])
+            if row:
+                self._stats["expired"] += count_misses
+            self._refresh()
+            match = self._fuzzy_match(normalized)
+            if match is not None:
+                self._stats["fuzzy_hits"] += 1
+                return [dict(match)]
+            self._stats["misses"] += count_misses
+            return None
+
+    def store(self, query: str, results: list[dict]) -> None:
+        """Remember a query's top results and index their titles for fuzzy lookups."""
+        normalized = normalize_query(query)
+        results = [dict(result) for result in results[:SEARCH_RESULTS_KEPT]]
+        if not normalized or not results:
+            return
+        now = time.time()
+        videos = []
+        for result in results:
+            video_id = re.search(r"(?:v=|/)([0-9A-Za-z_-]{11})", result.get("link", ""))
+            if video_id and result.get("title"):
+                videos.append((video_id.group(1), result["title"], result.get("channel"), result["link"], now))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, results, created_at) VALUES (?, ?, ?)",
+                (normalized, json.dumps(results), now)
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO videos (video_id, title, channel, link, seen_at) VALUES (?, ?, ?, ?, ?)", videos
+            )
+            self._db.commit()
+            self._stats["writes"] += 1
+            self._add(("query", normalized), normalized, results[0], now)
+            for video_id, title, channel, link, seen_at in videos:
+                self._add(("title", video_id), normalize_query(title), {"title": title, "link": link, "channel": channel}, seen_at)
+
+    def count_link(self) -> None:
+        """Count a query that was a link or video ID and so needed no search at all."""
+        with self._lock:
+            self._stats["links"] += 1
+
+    def invalidate(self) -> int:
+        """Forget every cached search and known title."""
+        with self._lock:
+            removed = self._db.execute("DELETE FROM searches").rowcount
+            self._db.execute("DELETE FROM videos")
+            self._db.commit()
+            self._index.clear()
+            self._words.clear()
+            self._loaded = {"searches": 0, "videos": 0}
+            return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored queries and titles."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queries"] = self._db.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            stats["titles"] = self._db.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+            stats["index_entries"] = len(self._index)
+        hits = stats["hits"] + stats["fuzzy_hits"]
+        lookups = hits + stats["misses"] + stats["expired"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _fuzzy_match(self, normalized: str) -> dict | None:
+        if self.fuzzy_cutoff > 1:
+            return None
+        query_words = match_words(normalized)
+        if len(query_words) < SEARCH_FUZZY_MIN_WORDS:
+            return None
+        # Candidates share at least one exact word; the rarest words narrow them down first.
+        candidates = []
+        for word in sorted(set(query_words), key=lambda word: len(self._words.get(word, ()))):
+            candidates.extend(self._words.get(word, ()))
+            if len(candidates) >= SEARCH_FUZZY_MAX_CANDIDATES:
+                break
+        now = time.time()
+        best, best_score = None, self.fuzzy_cutoff
+        for key in dict.fromkeys(candidates):
+            words, result, created_at = self._index[key]
+            if key[0] == "query" and now - created_at > self.ttl:
+                continue
+            score = match_score(query_words, words, exact_numbers=key[0] == "query")
+            if score >= best_score:
+                best, best_score = result, score
+        if best is not None:
+            logger.debug(f"Fuzzy search match for '{normalized}': {best.get('title')} (score {best_score:.2f})")
+        return best
+
+    def _add(self, key: tuple[str, str], normalized: str, result: dict, created_at: float) -> None:
+        self._discard(key)
+        words = match_words(normalized)
+        self._index[key] = (words, result, created_at)
+        for word in set(words):
+            self._words.setdefault(word, set()).add(key)
+        while len(self._index) > self.max_index_entries:
+            self._discard(next(iter(self._index)))
+
+    def _discard(self, key: tuple[str, str]) -> None:
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        for word in set(entry[0]):
+            keys = self._words.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._words[word]
+
+    def _refresh(self) -> None:
+        """Index rows written since the last refresh, by this worker or another one."""
+        if time.monotonic() - self._refreshed_at < SEARCH_INDEX_REFRESH:
+            return
+        self._refreshed_at = time.monotonic()
+        rows = self._db.execute(
+            "SELECT rowid, query, results, created_at FROM searches WHERE rowid > ? ORDER BY rowid DESC LIMIT ?",
+            (self._loaded["searches"], self.max_index_entries)
+        ).fetchall()
+        for rowid, query, results, created_at in reversed(rows):
+            self._add(("query", query), query, json.loads(results)[0], created_at)
+            self._loaded["searches"] = max(self._loaded["searches"], rowid)
+        rows = self._db.execute(
+            "SELECT rowid, video_id, title, channel, link, seen_at FROM videos WHERE rowid > ? ORDER BY rowid DESC LIMIT ?",
+            (self._loaded["videos"], self.max_index_entries)
+        ).fetchall()
+        for rowid, video_id, title, channel, link, seen_at in reversed(rows):
+            self._add(("title", video_id), normalize_query(title), {"title": title, "link": link, "channel": channel}, seen_at)
+            self._loaded["videos"] = max(self._loaded["videos"], rowid)
+
+
+search_cache = SearchCache()
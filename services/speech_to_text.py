@@ -1,25 +1,105 @@
-import speech_recognition as sr
-from typing import Optional
+from typing import AsyncIterator, Optional
+from services.media_pool import media_pool
+from services.metrics import span, upstream_call
+from dotenv import load_dotenv
+import logging
+import tempfile
+import asyncio
+import shutil
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "uploads"
+STT_MAX_UPLOAD_BYTES = int(os.getenv("STT_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+STT_CHUNK_SECONDS = float(os.getenv("STT_CHUNK_SECONDS", "30"))  # Audio sent to the recognizer per request
+STT_DECODE_TIMEOUT = float(os.getenv("STT_DECODE_TIMEOUT", "600"))  # Seconds allowed to decode a whole upload
+STT_POLL_INTERVAL = 0.05  # Seconds between checks for the next decoded chunk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds STT_MAX_UPLOAD_MB; callers should answer with HTTP 413."""
+
+
+async def save_upload(chunks: AsyncIterator[bytes], suffix: str = "", max_bytes: int = STT_MAX_UPLOAD_BYTES) -> str:
+    """Write an upload to a uniquely named file as its chunks arrive, stopping at `max_bytes`. The caller removes it."""
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="stt-", suffix=suffix, dir=UPLOAD_DIR)
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as upload_file:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(f"Audio upload exceeds {max_bytes // (1024 * 1024)} MB.")
+                upload_file.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def recognize_chunk(samples) -> str:
+    """Blocking recognition of one chunk of 16 kHz mono int16 samples; empty when nothing was understood."""
+    import speech_recognition as sr
+    from services.audio import SAMPLE_RATE
 
-def speech_to_text(audio_file_path: str) -> Optional[str]:
-    """Convert an audio file to text using speech recognition."""
     recognizer = sr.Recognizer()
-    
     try:
-        # Load the audio file
-        with sr.AudioFile(audio_file_path) as source:
-            audio_data = recognizer.record(source)
-        
-        # Recognize speech using Google Speech Recognition (free tier)
-        text = recognizer.recognize_google(audio_data)
-        return text
-    
+        with upstream_call("google_speech", failures=(sr.RequestError,)):
+            return recognizer.recognize_google(sr.AudioData(samples.tobytes(), SAMPLE_RATE, 2))
     except sr.UnknownValueError:
-        print("Speech recognition could not understand the audio.")
-        return None
+        return ""
+
+async def transcribe_stream(audio_file_path: str, chunk_seconds: float = STT_CHUNK_SECONDS) -> AsyncIterator[dict]:
+    """Decode and recognize an audio file chunk by chunk, yielding each partial transcript as it is ready.
+
+    The file is decoded in a single pass by one media pool task, which stores each chunk as it is cut;
+    chunks are recognized while later ones are still being decoded. Recognition is a network call and
+    runs on a thread.
+    """
+    from services.audio import store_chunks, load_chunk, SAMPLE_RATE  # NumPy is only loaded when speech input is used
+
+    chunk_dir = tempfile.mkdtemp(prefix="stt-chunks-", dir=os.path.dirname(audio_file_path) or ".")
+    decode = asyncio.ensure_future(media_pool.run(store_chunks, audio_file_path, chunk_seconds, chunk_dir,
+                                                  timeout=STT_DECODE_TIMEOUT))
+    offset, index = 0.0, 0
+    try:
+        while True:
+            with span("stt.decode"):
+                samples = load_chunk(chunk_dir, index)
+                while samples is None:
+                    if decode.done():
+                        decode.result()  # Raises if decoding failed
+                        samples = load_chunk(chunk_dir, index)  # Written just before the task finished
+                        if samples is None:
+                            return
+                        break
+                    await asyncio.sleep(STT_POLL_INTERVAL)
+                    samples = load_chunk(chunk_dir, index)
+            with span("stt.recognize"):
+                text = await asyncio.to_thread(recognize_chunk, samples)
+            yield {"offset": round(offset, 2), "duration": round(len(samples) / SAMPLE_RATE, 2), "text": text}
+            offset += len(samples) / SAMPLE_RATE
+            index += 1
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)  # Also stops a decode the caller abandoned
+        if decode.done():
+            decode.cancelled() or decode.exception()  # Already raised, or irrelevant once the caller stopped reading
+        else:
+            decode.cancel()
+
+async def speech_to_text(audio_file_path: str) -> Optional[str]:
+    """Convert an audio file to text using speech recognition."""
+    import speech_recognition as sr  # Deferred so workers that never take speech input skip the import
+
+    try:
+        parts = [partial["text"] async for partial in transcribe_stream(audio_file_path)]
+        return " ".join(part for part in parts if part) or None
     except sr.RequestError as e:
-        print(f"Could not request results from speech recognition service; {str(e)}")
+        logger.error(f"Could not request results from speech recognition service; {str(e)}")
         return None
     except Exception as e:
-        print(f"Error processing audio file: {str(e)}")
-        return None
\ No newline at end of file
+        logger.error(f"Error processing audio file: {str(e)}")
+        return None
@@ -1,59 +1,243 @@
 import re
 import json
-from groq import Groq
+import asyncio
+import hashlib
+from services.transcript import has_transcript
+from services.rate_limit import groq_chat_completion
+from services.tokens import count_tokens, chunk_text
+from services.coalesce import SingleFlight
+from services.metrics import span
+from services.circuit import CircuitOpenError
+from services.local_inference import local_summary_and_themes
+from groq import RateLimitError, APIConnectionError, InternalServerError
 from dotenv import load_dotenv
+from typing import Callable
+import logging
 import os
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+logger = logging.getLogger(__name__)
 
-def generate_summary_and_themes(text: str, title: str = None, language: str = "en") -> dict:
-    """Generate AI summary, sentiment, and key themes using Groq, respecting the language."""
-    if "Transcript error" in text and title:
-        prompt = f"""
+MODEL = "llama3-70b-8192"
+CONTEXT_WINDOW = 8192
+
+TITLE_PROMPT = """
         There is no transcript available for this video. Based on the title '{title}', please provide:
         1. A detailed summary (600-700 words) in {language}.
         2. Sentiment as a single word or phrase (Positive, Negative, or Neutral).
         3. 3-5 key themes as one-word or one-phrase items in a comma-separated string.
         Return the response with sections: **Detailed Summary:**, **Sentiment:**, **Key Themes:**.
         """
-    else:
-        prompt = f"""
+
+TRANSCRIPT_PROMPT = """
         Analyze this video transcript in {language} and provide:
         1. A detailed summary (600-700 words) including core message, storyline, emotional tone, notable participants/casts and directors, and notable figures.
         2. Sentiment as a single word or phrase (Positive, Negative, or Neutral).
         3. 3-5 key themes as one-word or one-phrase items in a comma-separated string.
         Return the response with sections: **Detailed Summary:**, **Sentiment:**, **Key Themes:**.
-        Transcript: {text[:10000]}
+        Transcript: {text}
         """
 
-    try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",
+CHUNK_PROMPT = """
+        This is part {index} of {total} of a video transcript in {language}.
+        Summarize this part in 150-250 words in {language}, keeping the key events, arguments, participants and emotional tone.
+        Return only the summary text.
+        Transcript part: {text}
+        """
+
+COMBINE_PROMPT = """
+        These are summaries of consecutive parts of a video, in order. Merge them into one coherent summary
+        of 250-400 words in {language} that keeps the storyline and the most important points.
+        Return only the summary text.
+        Part summaries:
+        {text}
+        """
+
+REDUCE_PROMPT = """
+        These are summaries of consecutive parts of a video transcript in {language}, in order. Using all of them, provide:
+        1. A detailed summary (600-700 words) including core message, storyline, emotional tone, notable participants/casts and directors, and notable figures.
+        2. Sentiment as a single word or phrase (Positive, Negative, or Neutral).
+        3. 3-5 key themes as one-word or one-phrase items in a comma-separated string.
+        Return the response with sections: **Detailed Summary:**, **Sentiment:**, **Key Themes:**.
+        Part summaries:
+        {text}
+        """
+
+UPDATE_PROMPT = """
+        This is the current summary of a video whose transcript has grown, followed by the transcript's new part in {language}.
+        Update the summary so it also covers the new part, keeping what is still accurate, and provide:
+        1. A detailed summary (600-700 words) of the whole video so far in {language}.
+        2. Sentiment of the whole video as a single word or phrase (Positive, Negative, or Neutral).
+        3. 3-5 key themes as one-word or one-phrase items in a comma-separated string.
+        Return the response with sections: **Detailed Summary:**, **Sentiment:**, **Key Themes:**.
+        Current summary: {summary}
+        Current sentiment: {sentiment}
+        Current key themes: {key_themes}
+        New part: {text}
+        """
+
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))  # Transcript tokens per map request
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))  # Parallel Groq requests per summary
+SUMMARY_REDUCE_FANOUT = int(os.getenv("SUMMARY_REDUCE_FANOUT", "6"))  # Partial summaries merged per reduce request
+PARTIAL_SUMMARY_MAX_TOKENS = 600
+MIN_COMPLETION_TOKENS = 1024  # Reply room every final prompt must leave; a 600-700 word summary needs about this much
+# Serve summaries from the local BART/sentiment models when Groq is rate limited or unreachable.
+LOCAL_FALLBACK = os.getenv("LOCAL_FALLBACK", "").lower() in ("1", "true", "yes")
+GROQ_UNAVAILABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError, CircuitOpenError)
+
+summary_flight = SingleFlight("generate_summary_and_themes")
+
+# Changes whenever a prompt template changes, so cached summaries from older prompts are not reused.
+PROMPT_VERSION = hashlib.sha256(
+    (TITLE_PROMPT + TRANSCRIPT_PROMPT + CHUNK_PROMPT + COMBINE_PROMPT + REDUCE_PROMPT + UPDATE_PROMPT).encode("utf-8")
+).hexdigest()[:12]
+
+TokenCallback = Callable[[str], None]
+
+def fits_context(prompt: str, reply_tokens: int = MIN_COMPLETION_TOKENS) -> bool:
+    """Whether the prompt leaves at least `reply_tokens` of the context window for the reply."""
+    return count_tokens(prompt) + reply_tokens <= CONTEXT_WINDOW
+
+def completion_budget(prompt: str) -> int:
+    """Reply tokens to request after a prompt: what is left of the context window, within sane bounds."""
+    return max(MIN_COMPLETION_TOKENS, min(4096, CONTEXT_WINDOW - count_tokens(prompt)))
+
+async def complete(prompt: str, max_tokens: int = 4096, on_token: TokenCallback | None = None) -> str:
+    """Run a single-turn Groq completion and return its text, passing each token to `on_token` as it arrives."""
+    if on_token is None:
+        response = await groq_chat_completion(
+            model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
-            max_tokens=4096
+            max_tokens=max_tokens
         )
-        content = response.choices[0].message.content.strip()
+        return response.choices[0].message.content.strip()
 
-        summary_match = re.search(r"\*\*Detailed Summary:\*\*\s*(.*?)(?=\*\*Sentiment:|\Z)", content, re.DOTALL)
-        sentiment_match = re.search(r"\*\*Sentiment:\*\*\s*(\w+(?:\s+\w+)?)", content)
-        themes_match = re.search(r"\*\*Key Themes:\*\*\s*(.*)", content)
+    stream = await groq_chat_completion(
+        model=MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    parts = []
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            on_token(delta)
+    return "".join(parts).strip()
 
-        summary = summary_match.group(1).strip() if summary_match else "Summary unavailable."
-        sentiment = sentiment_match.group(1).strip() if sentiment_match else "N/A"
-        raw_themes = themes_match.group(1).strip() if themes_match else "Unknown"
+def parse_summary(content: str, language: str) -> dict:
+    """Extract the summary, sentiment and key themes sections from a model response."""
+    summary_match = re.search(r"\*\*Detailed Summary:\*\*\s*(.*?)(?=\*\*Sentiment:|\Z)", content, re.DOTALL)
+    sentiment_match = re.search(r"\*\*Sentiment:\*\*\s*(\w+(?:\s+\w+)?)", content)
+    themes_match = re.search(r"\*\*Key Themes:\*\*\s*(.*)", content)
 
-        key_themes = ", ".join([theme.strip() for theme in raw_themes.split(",")][:5]) if raw_themes != "Unknown" else "Unknown"
+    summary = summary_match.group(1).strip() if summary_match else "Summary unavailable."
+    sentiment = sentiment_match.group(1).strip() if sentiment_match else "N/A"
+    raw_themes = themes_match.group(1).strip() if themes_match else "Unknown"
 
-        return {
-            "summary": summary,
-            "sentiment": sentiment,
-            "key_themes": key_themes,
-            "language": language
-        }
+    key_themes = ", ".join([theme.strip() for theme in raw_themes.split(",")][:5]) if raw_themes != "Unknown" else "Unknown"
+
+    return {
+        "summary": summary,
+        "sentiment": sentiment,
+        "key_themes": key_themes,
+        "language": language
+    }
+
+async def summarize_chunks(text: str, language: str, chunk_tokens: int, max_concurrency: int, fanout: int) -> list[str]:
+    """Map step: summarize sentence-aligned chunks concurrently, then merge them until at most `fanout` remain."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # A chunk size configured beyond what fits next to the prompt and reply is capped.
+    chunk_tokens = min(chunk_tokens, CONTEXT_WINDOW - PARTIAL_SUMMARY_MAX_TOKENS - count_tokens(CHUNK_PROMPT))
+
+    async def bounded(prompt: str) -> str:
+        async with semaphore:
+            return await complete(prompt, max_tokens=PARTIAL_SUMMARY_MAX_TOKENS)
+
+    chunks = chunk_text(text, chunk_tokens)
+    with span("summary.map"):
+        partials = await asyncio.gather(*(
+            bounded(CHUNK_PROMPT.format(index=i + 1, total=len(chunks), language=language, text=chunk))
+            for i, chunk in enumerate(chunks)
+        ))
+    with span("summary.combine"):
+        while len(partials) > fanout:
+            groups = [partials[i:i + fanout] for i in range(0, len(partials), fanout)]
+            partials = await asyncio.gather(*(
+                bounded(COMBINE_PROMPT.format(language=language, text="\n\n".join(group))) for group in groups
+            ))
+    return list(partials)
+
+async def generate_summary_and_themes(text: str, title: str = None, language: str = "en",
+                                      chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                                      max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+                                      fanout: int = SUMMARY_REDUCE_FANOUT,
+                                      on_token: TokenCallback | None = None) -> dict:
+    """Generate AI summary, sentiment, and key themes, sharing one generation among concurrent identical requests.
+
+    With `on_token`, the final completion is streamed to the callback. Streamed generations are not
+    coalesced, since the tokens of one upstream call cannot be replayed to later waiters.
+    """
+    with span("summary"):
+        if on_token is not None:
+            return await summarize_transcript(text, title, language, chunk_tokens, max_concurrency, fanout, on_token)
+        key = hashlib.sha256(json.dumps([text, title, language, chunk_tokens, fanout]).encode("utf-8")).hexdigest()
+        return dict(await summary_flight.do(
+            key, lambda: summarize_transcript(text, title, language, chunk_tokens, max_concurrency, fanout)
+        ))
+
+async def update_summary(previous: dict, text: str, language: str = "en",
+                         chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                         max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+                         fanout: int = SUMMARY_REDUCE_FANOUT) -> dict:
+    """Fold newly transcribed text into an existing summary with one cheap update request.
+
+    The cost follows the new text rather than the whole transcript: a new part longer than
+    `chunk_tokens` is condensed with the map step first. Errors propagate, so callers can keep the
+    previous summary and retry the same new part later.
+    """
+    with span("summary.update"):
+        if count_tokens(text) > chunk_tokens:
+            text = "\n\n".join(await summarize_chunks(text, language, chunk_tokens, max_concurrency, fanout))
+        prompt = UPDATE_PROMPT.format(language=language, text=text, summary=previous["summary"],
+                                      sentiment=previous["sentiment"], key_themes=previous["key_themes"])
+        with span("summary.completion"):
+            content = await complete(prompt, max_tokens=completion_budget(prompt))
+        summary = parse_summary(content, language)
+        if summary["summary"] == "Summary unavailable.":
+            raise ValueError("Summary update returned no summary section.")
+        return summary
+
+async def summarize_transcript(text: str, title: str, language: str, chunk_tokens: int, max_concurrency: int, fanout: int,
+                               on_token: TokenCallback | None = None) -> dict:
+    """Generate AI summary, sentiment, and key themes using Groq, respecting the language.
+
+    Transcripts longer than `chunk_tokens` are summarized map-reduce style instead of being truncated.
+    """
+    try:
+        if not has_transcript(text) and title:
+            prompt = TITLE_PROMPT.format(title=title, language=language)
+        elif count_tokens(text) <= chunk_tokens and fits_context(TRANSCRIPT_PROMPT.format(text=text, language=language)):
+            prompt = TRANSCRIPT_PROMPT.format(text=text, language=language)
+        else:
+            partials = await summarize_chunks(text, language, chunk_tokens, max_concurrency, fanout)
+            prompt = REDUCE_PROMPT.format(text="\n\n".join(partials), language=language)
+
+        max_tokens = completion_budget(prompt)
+        with span("summary.completion"):
+            content = await complete(prompt, max_tokens=max_tokens, on_token=on_token)
+        with span("summary.parse"):
+            return parse_summary(content, language)
     except Exception as e:
-        print(f"Error in summary generation: {str(e)}")
+        logger.error(f"Error in summary generation: {str(e)}")
+        if LOCAL_FALLBACK and has_transcript(text) and isinstance(e, GROQ_UNAVAILABLE_ERRORS):
+            try:
+                return await local_summary_and_themes(text, language)
+            except Exception as local_error:
+                logger.error(f"Error in local summary fallback: {str(local_error)}")
         return {
             "summary": "Summary unavailable due to processing error.",
             "sentiment": "N/A",
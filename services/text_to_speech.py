@@ -1,31 +1,143 @@
-from gtts import gTTS
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from services.coalesce import SingleFlight
+from services.metrics import span, upstream_call
+import hashlib
+import asyncio
+import time
 import os
 import logging
 
+load_dotenv()
 logger = logging.getLogger(__name__)
 
-def text_to_speech(text: str, language: str = "en", filename: str = "summary.mp3") -> str:
-    """Convert summary text to an audio file in the detected language."""
+AUDIO_DIR = "static"
+TTS_VOICE = os.getenv("TTS_VOICE", "com")  # gTTS top-level domain, which selects the accent
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "500")) * 1024 * 1024
+AUDIO_CACHE_MAX_AGE = int(os.getenv("AUDIO_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+AUDIO_GC_INTERVAL = 60  # Seconds between garbage collection passes
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_IDLE_TIMEOUT = 30  # Seconds a stream waits for synthesis to produce more audio
+
+# Synthesis keeps running when every requester has gone, since the artifact will be reused.
+tts_flight = SingleFlight("text_to_speech", cancel_orphans=False)
+_last_gc = 0.0
+
+def audio_file_name(text: str, language: str = "en", voice: str = TTS_VOICE) -> str:
+    """Content-addressed file name, so identical requests share one artifact."""
+    digest = hashlib.sha256(f"{language}\0{voice}\0{text}".encode("utf-8")).hexdigest()[:24]
+    return f"tts-{digest}.mp3"
+
+def synthesize(text: str, language: str, voice: str, filepath: str) -> None:
+    """Blocking synthesis that appends MP3 chunks as gTTS produces them, so streams can tail the file."""
+    from gtts import gTTS, gTTSError  # Deferred to keep worker start-up fast
+
+    partial_path = f"{filepath}.part"  # Renamed into place once complete, so the file is never served half-written
+    try:
+        tts = gTTS(text=text, lang=language, tld=voice, slow=False)
+        with open(partial_path, "wb") as audio_file, upstream_call("gtts", failures=(gTTSError,)):
+            for chunk in tts.stream():
+                audio_file.write(chunk)
+                audio_file.flush()
+        os.replace(partial_path, filepath)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+async def text_to_speech(text: str, language: str = "en", voice: str = TTS_VOICE) -> str:
+    """Convert summary text to an audio file in the detected language.
+
+    Existing artifacts are reused, and concurrent calls for the same artifact wait on one synthesis.
+    """
     if not text:
         logger.error("No text provided for text-to-speech conversion.")
         return None
 
-    static_dir = "static"
-    os.makedirs(static_dir, exist_ok=True)
-    filepath = os.path.join(static_dir, filename)
-    temp_status = f"{filepath}.status"
-
-    with open(temp_status, "w") as status_file:
-        status_file.write("processing")
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    file_name = audio_file_name(text, language, voice)
+    filepath = os.path.join(AUDIO_DIR, file_name)
+    if os.path.exists(filepath):
+        os.utime(filepath)  # Keeps frequently requested audio at the back of the GC queue
+        return f"/{filepath}"
 
     try:
         logger.info(f"Generating audio for text: {text[:50]}... in language: {language}")
-        tts = gTTS(text=text, lang=language, slow=False)  # Fixed: Removed "t READY"
-        tts.save(filepath)
-        os.remove(temp_status)
+        # gTTS only has a blocking requests client
+        with span("tts"):
+            await tts_flight.do(file_name, lambda: asyncio.to_thread(synthesize, text, language, voice, filepath))
         logger.info(f"Audio file generated at: {filepath}")
+        collect_garbage()
         return f"/{filepath}"
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.error(f"Failed to generate audio: {str(e)}")
-        os.remove(temp_status)
-        return None
\ No newline at end of file
+        return None
+
+async def stream_audio(file_name: str) -> AsyncIterator[bytes]:
+    """Yield an audio file's bytes, following it while synthesis is still writing."""
+    filepath = os.path.join(AUDIO_DIR, file_name)
+    partial_path = f"{filepath}.part"
+    waited = 0.0
+
+    while not os.path.exists(filepath) and not os.path.exists(partial_path):
+        if waited >= STREAM_IDLE_TIMEOUT:
+            return
+        await asyncio.sleep(0.1)
+        waited += 0.1
+
+    try:
+        audio_file = open(partial_path if not os.path.exists(filepath) else filepath, "rb")
+    except FileNotFoundError:
+        audio_file = open(filepath, "rb")  # Synthesis finished between the check and the open
+
+    with audio_file:
+        idle = 0.0
+        while True:
+            chunk = audio_file.read(STREAM_CHUNK_SIZE)
+            if chunk:
+                idle = 0.0
+                yield chunk
+                continue
+            # The handle survives the rename, so once the final file exists everything has been read.
+            if os.path.exists(filepath):
+                remainder = audio_file.read()
+                if remainder:
+                    yield remainder
+                return
+            if not os.path.exists(partial_path) or idle >= STREAM_IDLE_TIMEOUT:
+                return  # Synthesis failed or stalled
+            await asyncio.sleep(0.05)
+            idle += 0.05
+
+def collect_garbage(max_bytes: int = AUDIO_CACHE_MAX_BYTES, max_age: int = AUDIO_CACHE_MAX_AGE, force: bool = False) -> int:
+    """Delete expired audio artifacts, then the least recently used ones until under the size cap."""
+    global _last_gc
+    now = time.time()
+    if not force and now - _last_gc < AUDIO_GC_INTERVAL:
+        return 0
+    _last_gc = now
+
+    files = []
+    for entry in os.scandir(AUDIO_DIR):
+        if not entry.name.startswith("tts-") or not entry.is_file():
+            continue
+        stat = entry.stat()
+        if entry.name.endswith(".part"):
+            if now - stat.st_mtime > 3600:  # Left behind by a crashed synthesis
+                os.remove(entry.path)
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    removed = 0
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"Audio GC removed {removed} files, {total} bytes remain")
+    return removed
@@ -0,0 +1,134 @@
+from collections import Counter
+import json
+import math
+import re
+
+# Llama 3 averages roughly four characters per token on English text, but far fewer on other scripts.
+# To budget without shipping the tokenizer, text is measured in "ASCII-character equivalents":
+# non-ASCII characters below U+0800 (accented Latin, Greek, Cyrillic, Arabic, Hebrew) count double,
+# and anything above (CJK, kana, Hangul, Thai, Indic scripts, emoji) counts as a whole token.
+# The estimate errs high, so a prompt that is budgeted to fit really does.
+CHARS_PER_TOKEN = 4
+NON_ASCII = re.compile(r"[^\x00-\x7f]")
+WIDE_SCRIPT = re.compile(r"[^\x00-\u07ff]")
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？])\s*")
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators the chat template adds around every message
+EXTRACT_SENTENCE_TOKENS = 60  # Unpunctuated captions are cut into pieces of this size before selection
+
+STOPWORDS = set("""a about after all also an and any are as at be because been but by can could do does for from had has
+have he her his how i if in into is it its just like more most no not now of on one or our out over said she so some
+such than that the their them then there these they this to up us was we were what when which who will with would you
+your i'm it's don't that's we're you're gonna yeah okay oh uh um know think going get got really right well""".split())
+
+def tokens_for_chars(chars: int) -> int:
+    """Approximate the number of model tokens in ASCII text of the given length."""
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def token_weight(text: str) -> int:
+    """Length of text in ASCII-character equivalents, so that tokens_for_chars() of it estimates its tokens."""
+    if text.isascii():
+        return len(text)
+    wide = len(WIDE_SCRIPT.findall(text))
+    return len(text) + len(NON_ASCII.findall(text)) + 2 * wide
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of model tokens in a piece of text, in any script."""
+    return tokens_for_chars(token_weight(text))
+
+def split_sentences(text: str, max_tokens: int) -> list[str]:
+    """Split text into sentences, breaking unpunctuated runs (common in auto-captions) on word boundaries.
+
+    Runs without spaces (as in Chinese or Japanese) are cut every `max_tokens` characters, which
+    always fits since no character is estimated at more than one token.
+    """
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        if count_tokens(sentence) <= max_tokens:
+            if sentence:
+                sentences.append(sentence)
+            continue
+        current, current_weight = [], -1
+        for long_word in sentence.split():
+            pieces = [long_word] if len(long_word) <= max_tokens else [long_word[i:i + max_tokens] for i in range(0, len(long_word), max_tokens)]
+            for word in pieces:
+                weight = token_weight(word)
+                if current and tokens_for_chars(current_weight + 1 + weight) > max_tokens:
+                    sentences.append(" ".join(current))
+                    current, current_weight = [], -1
+                current.append(word)
+                current_weight += 1 + weight
+        if current:
+            sentences.append(" ".join(current))
+    return sentences
+
+def chunk_text(text: str, max_tokens: int) -> list[str]:
+    """Pack whole sentences into chunks of at most max_tokens each."""
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text, max_tokens):
+        tokens = count_tokens(sentence) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def message_tokens(message: dict) -> int:
+    """Approximate the tokens a chat message adds to a prompt, including any tool calls it carries."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        tokens += count_tokens(json.dumps(tool_call))
+    return tokens
+
+def content_words(text: str) -> list[str]:
+    return [word for word in re.findall(r"[a-zA-Z']{3,}", text.lower()) if word not in STOPWORDS]
+
+def extract_key_sentences(text: str, max_tokens: int) -> str:
+    """Shrink text to max_tokens by keeping its most informative sentences, in their original order.
+
+    Sentences are scored by how frequent their content words are across the whole text, normalised
+    by length, and picked round-robin from evenly sized sections so the whole transcript is covered
+    rather than just its opening minutes.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    sentences = split_sentences(text, EXTRACT_SENTENCE_TOKENS)
+    words = [content_words(sentence) for sentence in sentences]
+    frequencies = Counter(word for sentence_words in words for word in set(sentence_words))
+    top = max(frequencies.values(), default=1)
+
+    def score(index: int) -> float:
+        unique = set(words[index])
+        return sum(frequencies[word] for word in unique) / top / math.sqrt(len(words[index]) or 1)
+
+    section_count = max(1, min(len(sentences), max_tokens // 150))
+    section_size = math.ceil(len(sentences) / section_count)
+    sections = [sorted(range(start, min(start + section_size, len(sentences))), key=score, reverse=True)
+                for start in range(0, len(sentences), section_size)]
+
+    chosen, seen, budget = set(), set(), max_tokens
+    for rank in range(section_size):
+        for section in sections:
+            if rank >= len(section):
+                continue
+            index = section[rank]
+            normalised = " ".join(words[index])
+            tokens = count_tokens(sentences[index]) + 1
+            if normalised in seen or tokens > budget:
+                continue  # Repeated caption lines carry nothing new
+            chosen.add(index)
+            seen.add(normalised)
+            budget -= tokens
+        if budget < 5:
+            break
+
+    parts, previous = [], None
+    for index in sorted(chosen):
+        if previous is not None and index != previous + 1:
+            parts.append("…")
+        parts.append(sentences[index])
+        previous = index
+    return " ".join(parts)
@@ -1,46 +1,87 @@
-from transformers import pipeline
-import torch
-from youtube_transcript_api import YouTubeTranscriptApi
-from serpapi import GoogleSearch
-from gtts import gTTS
+from services.clients import http_client, transcript_api
 from fastapi import HTTPException
 from dotenv import load_dotenv
+import threading
+import asyncio
+import logging
 import os
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+LOCAL_CPU_THREADS = int(os.getenv("LOCAL_CPU_THREADS", "0"))  # 0 keeps torch's default intra-op thread count
+LOCAL_QUANTIZE = os.getenv("LOCAL_QUANTIZE", "").lower() in ("1", "true", "yes")  # Dynamic int8 quantization on CPU
+# Pay the local model load at start-up instead of on the first request that needs it.
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "").lower() in ("1", "true", "yes")
+
+# torch and transformers are imported on first use: they cost tens of seconds and gigabytes of RAM
+# per worker, and the main /summarize/ path never needs them.
+PIPELINE_SPECS = {
+    "summarizer": {"task": "summarization", "model": "facebook/bart-large-cnn"},
+    "sentiment_analyzer": {"task": "sentiment-analysis"},
+}
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+_device = None
 
 # Device detection
 def get_device():
-    if torch.backends.mps.is_available():
-        return "mps"
-    elif torch.cuda.is_available():
-        return "cuda"
-    else:
-        return "cpu"
+    global _device
+    if _device is None:
+        import torch
+        if torch.backends.mps.is_available():
+            _device = "mps"
+        elif torch.cuda.is_available():
+            _device = "cuda"
+        else:
+            _device = "cpu"
+            if LOCAL_CPU_THREADS:
+                torch.set_num_threads(LOCAL_CPU_THREADS)
+        logger.info(f"Using device: {_device}")
+    return _device
 
-device = get_device()
-print(f"Using device: {device}")
+def get_pipeline(name: str):
+    """Return a transformers pipeline, loading it thread-safely on first use."""
+    loaded = _pipelines.get(name)
+    if loaded is not None:
+        return loaded
+    with _pipelines_lock:
+        if name not in _pipelines:
+            from transformers import pipeline
+            device = get_device()
+            logger.info(f"Loading {name} pipeline")
+            loaded = pipeline(**PIPELINE_SPECS[name], device=device if device != "cpu" else -1)
+            if device == "cpu" and LOCAL_QUANTIZE:
+                import torch
+                loaded.model = torch.quantization.quantize_dynamic(loaded.model, {torch.nn.Linear}, dtype=torch.qint8)
+            _pipelines[name] = loaded
+        return _pipelines[name]
 
-# Initialize pipelines
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn", device=device if device != "cpu" else -1)
-sentiment_analyzer = pipeline("sentiment-analysis", device=device if device != "cpu" else -1)
+def warm_up(names: tuple[str, ...] = tuple(PIPELINE_SPECS)) -> None:
+    """Load the given pipelines ahead of the first request (e.g. from the application lifespan)."""
+    for name in names:
+        get_pipeline(name)
 
-def search_video(query: str) -> str:
+def models_ready(names: tuple[str, ...] = tuple(PIPELINE_SPECS)) -> bool:
+    return all(name in _pipelines for name in names)
+
+async def search_video(query: str) -> str:
     """Search for a YouTube video URL."""
     params = {"engine": "youtube", "search_query": query, "api_key": SERPAPI_KEY}
-    search = GoogleSearch(params)
-    results = search.get_dict()
+    response = await http_client.get(f"{SERPAPI_BASE_URL}/search.json", params=params)
+    results = response.json()
     try:
         return results["video_results"][0]["link"]
     except (IndexError, KeyError):
         raise HTTPException(status_code=404, detail="No video found.")
 
-def get_transcript(video_url: str) -> str:
+async def get_transcript(video_url: str) -> str:
     """Extract transcript from a YouTube video."""
     try:
         video_id = video_url.split("v=")[1].split("&")[0]
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
+        transcript = (await asyncio.to_thread(transcript_api.fetch, video_id)).to_raw_data()
         return " ".join([entry["text"] for entry in transcript])
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Transcript unavailable: {str(e)}")
@@ -51,13 +92,6 @@ def summarize_text(text: str) -> dict:
     truncated = len(text) > max_input_length
     if truncated:
         text = text[:max_input_length]
-    summary = summarizer(text, max_length=100, min_length=30, do_sample=False)[0]["summary_text"]
-    sentiment = sentiment_analyzer(summary)[0]["label"]
+    summary = get_pipeline("summarizer")(text, max_length=100, min_length=30, do_sample=False)[0]["summary_text"]
+    sentiment = get_pipeline("sentiment_analyzer")(summary)[0]["label"]
     return {"summary": summary, "sentiment": sentiment, "text": text if truncated else text}
-
-def text_to_speech(text: str) -> str:
-    """Convert text to an audio file."""
-    audio_file = "static/summary.mp3"
-    tts = gTTS(text)
-    tts.save(audio_file)
-    return audio_file
\ No newline at end of file
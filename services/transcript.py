@@ -1,12 +1,131 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from langdetect import detect
+from services.clients import transcript_api
+from services.coalesce import SingleFlight
+from services.transcript_store import transcript_store
+from services.jobs import ProgressCallback
+from services.metrics import span, upstream_call
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+from youtube_transcript_api import RequestBlocked, YouTubeRequestFailed
+import threading
+import logging
+import asyncio
+import time
 
-def get_video_transcript(video_id: str) -> tuple[str, str]:
-    """Extract transcript and detect its language."""
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_UNAVAILABLE = "Transcript unavailable. Generating summary from video title instead."  # The video has none
+# The fetch failed (blocked, network error, open circuit); a later request may well get the transcript.
+TRANSCRIPT_FETCH_FAILED = "Transcript could not be fetched. Generating summary from video title instead."
+LANGUAGE_SAMPLE_CHARS = 3000  # Text handed to language detection, however long the transcript
+PREWARM_CONCURRENCY = 4
+# Errors that mean the video has no usable transcript, as opposed to a failed request worth retrying.
+NO_TRANSCRIPT_ERRORS = (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable)
+# Errors that mean YouTube itself is failing or blocking us; enough of them open the transcript circuit.
+YOUTUBE_FAILURES = (RequestBlocked, YouTubeRequestFailed)
+
+transcript_flight = SingleFlight("get_video_transcript")
+_detect_lock = threading.Lock()  # langdetect loads its profiles lazily and is not thread-safe
+
+def has_transcript(text: str) -> bool:
+    """Whether get_video_transcript() returned captions rather than one of its placeholders."""
+    return text not in (TRANSCRIPT_UNAVAILABLE, TRANSCRIPT_FETCH_FAILED)
+
+def failure_reason(error: Exception) -> str:
+    """One-line description of a failed fetch; youtube_transcript_api's messages span paragraphs."""
+    first_line = next((line.strip() for line in str(error).splitlines() if line.strip()), "")
+    return f"{type(error).__name__}: {first_line}" if first_line else type(error).__name__
+
+def language_sample(text: str, max_chars: int = LANGUAGE_SAMPLE_CHARS) -> str:
+    """Bounded sample from the start, middle and end, so a foreign intro or outro does not decide alone."""
+    if len(text) <= max_chars:
+        return text
+    part = max_chars // 3
+    middle = (len(text) - part) // 2
+    return " ".join((text[:part], text[middle:middle + part], text[-part:]))
+
+def detect_language(text: str) -> str:
+    from langdetect import detect, DetectorFactory  # Deferred to keep worker start-up fast
+
+    sample = language_sample(text)
+    with _detect_lock:
+        DetectorFactory.seed = 0  # langdetect is randomized; a fixed seed keeps stored languages reproducible
+        return detect(sample)  # e.g., "es" for Spanish, "fr" for French
+
+def fetch_transcript(video_id: str) -> tuple[str, str]:
+    """Blocking transcript fetch and language detection, run off the event loop. The result is stored."""
+    start = time.perf_counter()
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        text = " ".join([entry["text"] for entry in transcript])
-        language = detect(text)  # e.g., "es" for Spanish, "fr" for French
-        return text, language
-    except Exception as e:
-        return "Transcript unavailable. Generating summary from video title instead.", "en"
\ No newline at end of file
+        with upstream_call("youtube_transcript", failures=YOUTUBE_FAILURES):
+            fetched = transcript_api.fetch(video_id)
+    except NO_TRANSCRIPT_ERRORS as e:
+        transcript_store.set_unavailable(video_id, type(e).__name__)
+        raise
+    segments = fetched.to_raw_data()
+    text = " ".join([entry["text"] for entry in segments])
+    with span("transcript.language"):
+        language = detect_language(text)
+    transcript_store.set(
+        video_id, segments, language,
+        source_language=getattr(fetched, "language_code", None),
+        is_generated=getattr(fetched, "is_generated", None),
+        fetch_seconds=round(time.perf_counter() - start, 3)
+    )
+    return text, language
+
+async def get_video_transcript(video_id: str) -> tuple[str, str]:
+    """Extract transcript and detect its language, from the transcript store when the video was seen before.
+
+    Fetches are shared among concurrent callers. Returns TRANSCRIPT_UNAVAILABLE when the video has no
+    transcript and TRANSCRIPT_FETCH_FAILED when fetching it failed, in place of the text. Stored
+    auto-generated captions are fetched again once they are older than TRANSCRIPT_GENERATED_TTL,
+    since those of a live stream keep growing; the stored copy is used if that fetch fails.
+    """
+    with span("transcript"):
+        stored = transcript_store.get(video_id)
+        if stored is not None and not stored["expired"]:
+            return (stored["text"], stored["language"]) if stored["available"] else (TRANSCRIPT_UNAVAILABLE, "en")
+        try:
+            return await transcript_flight.do(video_id, lambda: asyncio.to_thread(fetch_transcript, video_id))
+        except NO_TRANSCRIPT_ERRORS:
+            return TRANSCRIPT_UNAVAILABLE, "en"
+        except Exception as e:
+            if stored is not None:
+                logger.warning(f"Could not re-fetch transcript of {video_id}, using the stored one: {failure_reason(e)}")
+                return stored["text"], stored["language"]
+            logger.warning(f"Could not fetch transcript of {video_id}: {failure_reason(e)}")
+            return TRANSCRIPT_FETCH_FAILED, "en"
+
+async def refresh_video_transcript(video_id: str) -> dict | None:
+    """Fetch a video's current transcript even when one is stored, for live streams and updated captions.
+
+    Returns the stored record with its segments, or None when the video has no transcript (yet).
+    """
+    with span("transcript.refresh"):
+        try:
+            await transcript_flight.do(video_id, lambda: asyncio.to_thread(fetch_transcript, video_id))
+        except Exception:
+            return None
+        stored = transcript_store.get(video_id)
+        return stored if stored is not None and stored["available"] else None
+
+async def prewarm_transcripts(video_ids: list[str], concurrency: int = PREWARM_CONCURRENCY,
+                              progress: ProgressCallback | None = None) -> dict:
+    """Fetch and store transcripts for many videos ahead of time, skipping those already stored."""
+    report = progress or (lambda fraction, message: None)
+    counts = {"stored": 0, "fetched": 0, "unavailable": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    unique_ids = list(dict.fromkeys(video_ids))
+    done = 0
+
+    async def warm(video_id: str):
+        nonlocal done
+        if transcript_store.contains(video_id):
+            counts["stored"] += 1
+        else:
+            async with semaphore:
+                text, _ = await get_video_transcript(video_id)
+            counts["unavailable" if text == TRANSCRIPT_UNAVAILABLE else "failed" if text == TRANSCRIPT_FETCH_FAILED else "fetched"] += 1
+        done += 1
+        report(done / len(unique_ids), f"Pre-warmed {done} of {len(unique_ids)} transcripts")
+
+    await asyncio.gather(*(warm(video_id) for video_id in unique_ids))
+    return counts
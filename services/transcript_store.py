@@ -0,0 +1,211 @@
+from dotenv import load_dotenv
+import threading
+import logging
+import sqlite3
+import json
+import time
+import hashlib
+import zlib
+import os
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_DB_PATH = os.getenv("TRANSCRIPT_DB_PATH", "cache/transcripts.db")
+TRANSCRIPT_MISS_TTL = int(os.getenv("TRANSCRIPT_MISS_TTL", "3600"))  # Seconds a video without captions is remembered as such
+# Seconds before stored auto-generated captions are fetched again. Live streams only have those, and they keep
+# growing; manual captions are kept until invalidated. 0 never re-fetches.
+TRANSCRIPT_GENERATED_TTL = int(os.getenv("TRANSCRIPT_GENERATED_TTL", "3600"))
+
+
+def pack_segments(segments: list[dict]) -> bytes:
+    """Compress timestamped segments as zlib'd JSON rows of [start, duration, text]."""
+    rows = [[segment["start"], segment["duration"], segment["text"]] for segment in segments]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack_segments(blob: bytes) -> list[dict]:
+    return [{"start": start, "duration": duration, "text": text} for start, duration, text in json.loads(zlib.decompress(blob))]
+
+
+def segments_digest(segments: list[dict]) -> str:
+    """Fingerprint of segments' timing and text, to tell whether already summarized captions were rewritten."""
+    digest = hashlib.sha256()
+    for segment in segments:
+        digest.update(f"{segment['start']:.2f}\x1f{segment['text']}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptStore:
+    """SQLite store of fetched transcripts, keyed by video ID, so a video's captions are downloaded once."""
+
+    def __init__(self, path: str = TRANSCRIPT_DB_PATH, miss_ttl: int = TRANSCRIPT_MISS_TTL,
+                 generated_ttl: int = TRANSCRIPT_GENERATED_TTL):
+        self.miss_ttl = miss_ttl
+        self.generated_ttl = generated_ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT PRIMARY KEY,
+                available INTEGER NOT NULL,
+                language TEXT,
+                source_language TEXT,
+                is_generated INTEGER,
+                segments BLOB,
+                segment_count INTEGER NOT NULL DEFAULT 0,
+                characters INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                fetch_seconds REAL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS transcripts_language ON transcripts (language)")
+        # Rolling summaries: how many leading segments of a video's transcript a summary already covers.
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS summary_progress (
+                video_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                segment_count INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (video_id, language)
+            )"""
+        )
+        self._db.commit()
+
+    def get(self, video_id: str) -> dict | None:
+        """Return a stored transcript with its text and segments, or None when it has to be fetched.
+
+        Auto-generated captions older than `generated_ttl` are returned with "expired" set, so the
+        caller can fetch them again and fall back to this copy.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT available, language, source_language, is_generated, segments, error, fetch_seconds, fetched_at "
+                "FROM transcripts WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None or (not row[0] and time.time() - row[7] > self.miss_ttl):
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+
+        available, language, source_language, is_generated, blob, error, fetch_seconds, fetched_at = row
+        segments = unpack_segments(blob) if available else []
+        return {
+            "video_id": video_id,
+            "available": bool(available),
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": language,
+            "source_language": source_language,
+            "is_generated": bool(is_generated) if is_generated is not None else None,
+            "error": error,
+            "fetch_seconds": fetch_seconds,
+            "fetched_at": fetched_at,
+            "expired": bool(available and is_generated and self.generated_ttl and time.time() - fetched_at > self.generated_ttl),
+        }
+
+    def contains(self, video_id: str) -> bool:
+        """Whether a lookup would be served without fetching, without decompressing anything."""
+        with self._lock:
+            row = self._db.execute("SELECT available, fetched_at FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None and (row[0] or time.time() - row[1] <= self.miss_ttl)
+
+    def set(self, video_id: str, segments: list[dict], language: str, source_language: str | None = None,
+            is_generated: bool | None = None, fetch_seconds: float | None = None) -> None:
+        """Store a fetched transcript's segments together with its detected language and fetch metadata."""
+        blob = pack_segments(segments)
+        characters = sum(len(segment["text"]) for segment in segments)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, available, language, source_language, is_generated, segments, "
+                "segment_count, characters, error, fetch_seconds, fetched_at) VALUES (?, 1, ?, ?, ?, ?, ?, ?, NULL, ?, ?)",
+                (video_id, language, source_language, is_generated, blob, len(segments), characters, fetch_seconds, time.time())
+            )
+            self._db.commit()
+            self._stats["writes"] += 1
+
+    def set_unavailable(self, video_id: str, error: str) -> None:
+        """Remember that a video has no transcript, so repeat requests skip the fetch for a while."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, available, error, fetched_at) VALUES (?, 0, ?, ?)",
+                (video_id, error, time.time())
+            )
+            self._db.commit()
+
+    def get_progress(self, video_id: str, language: str) -> dict | None:
+        """The rolling summary of a video and how many transcript segments it covers, if there is one."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT segment_count, digest, prompt_version, summary, updated_at FROM summary_progress "
+                "WHERE video_id = ? AND language = ?", (video_id, language)
+            ).fetchone()
+        if row is None:
+            return None
+        segment_count, digest, prompt_version, summary, updated_at = row
+        return {
+            "video_id": video_id,
+            "language": language,
+            "segment_count": segment_count,
+            "digest": digest,
+            "prompt_version": prompt_version,
+            "summary": json.loads(summary),
+            "updated_at": updated_at,
+        }
+
+    def set_progress(self, video_id: str, language: str, segments: list[dict], prompt_version: str, summary: dict) -> None:
+        """Record that `summary` covers exactly these leading segments of the video's transcript."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO summary_progress (video_id, language, segment_count, digest, prompt_version, summary, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language, len(segments), segments_digest(segments), prompt_version,
+                 json.dumps(summary, ensure_ascii=False), time.time())
+            )
+            self._db.commit()
+
+    def invalidate(self, video_id: str | None = None) -> int:
+        """Drop a stored transcript, or every transcript when no video ID is given."""
+        with self._lock:
+            if video_id is None:
+                removed = self._db.execute("DELETE FROM transcripts").rowcount
+            else:
+                removed = self._db.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,)).rowcount
+            self._db.commit()
+            return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, entry counts per language and the stored size."""
+        with self._lock:
+            stats = dict(self._stats)
+            available, unavailable, compressed, characters = self._db.execute(
+                "SELECT COALESCE(SUM(available), 0), COALESCE(SUM(1 - available), 0), "
+                "COALESCE(SUM(LENGTH(segments)), 0), COALESCE(SUM(characters), 0) FROM transcripts"
+            ).fetchone()
+            languages = dict(self._db.execute(
+                "SELECT language, COUNT(*) FROM transcripts WHERE available = 1 GROUP BY language"
+            ).fetchall())
+            rolling = self._db.execute("SELECT COUNT(*) FROM summary_progress").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "transcripts": available,
+            "unavailable": unavailable,
+            "languages": languages,
+            "stored_bytes": compressed,
+            "characters": characters,
+            "rolling_summaries": rolling,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        })
+        return stats
+
+
+transcript_store = TranscriptStore()
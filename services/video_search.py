@@ -1,25 +1,127 @@
-from serpapi import GoogleSearch
+from services.clients import http_client
+from services.coalesce import SingleFlight
+from services.search_cache import search_cache, normalize_query, SEARCH_RESULTS_KEPT
+from services.metrics import span, upstream_call
+from urllib.parse import urlsplit, parse_qs
 from dotenv import load_dotenv
+import re
 import os
 
 load_dotenv()
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+OEMBED_URL = "https://www.youtube.com/oembed"
+PLAYLIST_URL = "https://www.youtube.com/playlist"
+VIDEO_ID_PATTERN = r"[0-9A-Za-z_-]{11}"
+YOUTUBE_LINK_PATTERN = r"(?:https?://)?(?:[\w-]+\.)*(?:youtube\.com|youtube-nocookie\.com|youtu\.be)/\S*"
 
-def search_youtube_video(query: str) -> dict:
-    """Search for a YouTube video URL using SerpApi."""
+search_flight = SingleFlight("search_youtube_video")
+
+def extract_videoid(url: str) -> str:
+    """Extract YouTube video ID from URL"""
+    regex = r"(?:v=|/)([0-9A-Za-z_-]{11}).*"
+    match = re.search(regex, url)
+    return match.group(1) if match else None
+
+def playlist_id_from_query(query: str) -> str | None:
+    """Return the playlist ID from a playlist link, or the query itself when it already is one."""
+    match = re.search(r"[?&]list=([0-9A-Za-z_-]+)", query)
+    if match:
+        return match.group(1)
+    return query if re.fullmatch(r"(?:PL|UU|OL|FL|LL|RD)[0-9A-Za-z_-]{10,}", query) else None
+
+def video_id_from_query(query: str) -> str | None:
+    """Return the video ID when the query is a YouTube link or a bare video ID, so it never reaches search.
+
+    Links are watch, youtu.be, shorts, embed and live URLs, with or without a scheme, anywhere in
+    the query. A bare ID needs a digit and an upper-case letter so 11-letter words are not taken for one.
+    """
+    text = query.strip()
+    if re.fullmatch(VIDEO_ID_PATTERN, text) and re.search(r"[0-9]", text) and re.search(r"[A-Z]", text):
+        return text
+    match = re.search(YOUTUBE_LINK_PATTERN, text)
+    if not match:
+        return None
+    link = match.group(0)
+    url = urlsplit(link if "://" in link else f"https://{link}")
+    if url.hostname == "youtu.be":
+        candidate = url.path.strip("/").split("/")[0]
+    else:
+        candidate = parse_qs(url.query).get("v", [""])[0]
+        if not candidate:
+            path = re.match(r"/(?:shorts|embed|live|v|e)/([^/]+)", url.path)
+            candidate = path.group(1) if path else ""
+    return candidate if re.fullmatch(VIDEO_ID_PATTERN, candidate) else None
+
+async def search_youtube_video(query: str) -> dict:
+    """Find the YouTube video for a query: links resolve directly, then the search cache, then SerpApi."""
+    video_id = video_id_from_query(query)
+    if video_id:
+        search_cache.count_link()
+        return await get_video_details(video_id)
+    with span("search"):
+        results = await search_youtube_videos(query)
+    if "error" in results:
+        return results
+    return dict(results[0]) if results else {"title": "Unknown Title", "link": "", "channel": "Unknown Channel"}
+
+async def search_youtube_videos(query: str) -> list[dict] | dict:
+    """Top search results for a query, from the search cache when it knows the query or a close match.
+
+    Concurrent identical queries share one SerpApi call, whose results are cached for the rest.
+    """
+    cached = search_cache.lookup(query)
+    if cached is not None:
+        return cached
+
+    async def search_and_store():
+        results = await serpapi_search(query)
+        if isinstance(results, list):
+            search_cache.store(query, results)
+        return results
+
+    return await search_flight.do(normalize_query(query), search_and_store)
+
+async def serpapi_search(query: str) -> list[dict] | dict:
+    """Search YouTube through SerpApi and return the top results."""
     params = {
         "engine": "youtube",
-        "search_query": f'"{query}" site:youtube.com',
+        "search_query": query,
         "api_key": SERPAPI_API_KEY
     }
     try:
-        search = GoogleSearch(params)
-        results = search.get_dict()
-        video = results.get("video_results", [{}])[0]
-        return {
+        with upstream_call("serpapi"):
+            response = await http_client.get(f"{SERPAPI_BASE_URL}/search.json", params=params)
+            response.raise_for_status()
+        videos = response.json().get("video_results", [])[:SEARCH_RESULTS_KEPT]
+        return [{
             "title": video.get("title", "Unknown Title"),
             "link": video.get("link", ""),
             "channel": video.get("channel", {}).get("name", "Unknown Channel")
-        }
+        } for video in videos]
     except Exception as e:
-        return {"error": f"Search failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Search failed: {str(e)}"}
+
+async def get_video_details(video_id: str) -> dict:
+    """Look up title and channel for a known video ID via YouTube's keyless oEmbed endpoint."""
+    link = f"https://www.youtube.com/watch?v={video_id}"
+    try:
+        with upstream_call("youtube_oembed"):
+            response = await http_client.get(OEMBED_URL, params={"url": link, "format": "json"}, timeout=5.0)
+            response.raise_for_status()
+        details = response.json()
+        return {
+            "title": details.get("title", "Unknown Title"),
+            "link": link,
+            "channel": details.get("author_name", "Unknown Channel")
+        }
+    except Exception:
+        return {"title": "Unknown Title", "link": link, "channel": "Unknown Channel"}
+
+async def get_playlist_video_ids(playlist_id: str) -> list[str]:
+    """List the videos of a public playlist, in order, from its page (the first 100 entries YouTube renders)."""
+    with upstream_call("youtube_playlist"):
+        response = await http_client.get(PLAYLIST_URL, params={"list": playlist_id}, headers={"Accept-Language": "en"})
+        response.raise_for_status()
+    video_ids = re.findall(r'"playlistVideoRenderer":\{"videoId":"([0-9A-Za-z_-]{11})"', response.text)
+    return list(dict.fromkeys(video_ids))
@@ -0,0 +1,86 @@
+"""Summarize many YouTube videos or a playlist from the command line, printing one JSON line per video.
+
+Usage:
+    python summarize_batch.py VIDEO [VIDEO ...] [--file ids.txt] [--playlist URL] [--tts] [--language es]
+    python summarize_batch.py --resume BATCH_ID [--retry-failed]
+
+Progress is recorded in the batch store as each video finishes, so an interrupted run can be resumed
+with --resume; results that were already written are printed again first.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from services.batch import batch_store, create_batch, run_batch, StageLimits, BatchError
+from services.batch import BATCH_TRANSCRIPT_CONCURRENCY, BATCH_SUMMARY_CONCURRENCY, BATCH_TTS_CONCURRENCY
+from services.clients import close_clients
+
+
+def write_line(output, record: dict) -> None:
+    output.write(json.dumps(record) + "\n")
+    output.flush()
+
+
+async def run(args, output) -> int:
+    try:
+        if args.resume:
+            batch_id = args.resume
+            batch = batch_store.get(batch_id)
+            if batch is None:
+                raise BatchError(f"Batch {batch_id} not found.")
+            if batch["running"]:
+                raise BatchError(f"Batch {batch_id} is already being run by process {batch['owner_pid']}.")
+            if args.retry_failed:
+                batch_store.reset_failed(batch_id)
+            for item in batch_store.finished_items(batch_id):
+                write_line(output, item)
+        else:
+            videos = list(args.videos)
+            if args.file:
+                with open(args.file) as video_file:
+                    videos += [line.strip() for line in video_file if line.strip() and not line.startswith("#")]
+            batch_id = await create_batch(videos, args.playlist, args.tts, args.language)
+        print(f"Batch {batch_id}; resume with: python summarize_batch.py --resume {batch_id}", file=sys.stderr)
+
+        limits = StageLimits(args.transcript_concurrency, args.summary_concurrency, args.tts_concurrency)
+        summary = await run_batch(batch_id, on_item=lambda item: write_line(output, item), limits=limits)
+        write_line(output, dict(summary, status="finished"))
+        return 1 if summary["failed"] else 0
+    except BatchError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    finally:
+        await close_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("videos", nargs="*", help="Video IDs or YouTube links")
+    parser.add_argument("--file", help="File with one video ID or link per line")
+    parser.add_argument("--playlist", help="Playlist ID or link to summarize")
+    parser.add_argument("--tts", action="store_true", help="Also synthesize audio for each summary")
+    parser.add_argument("--language", help="Summary language; detected per video when omitted")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Continue an interrupted batch")
+    parser.add_argument("--retry-failed", action="store_true", help="With --resume, retry the videos that failed")
+    parser.add_argument("--output", help="Write NDJSON here instead of standard output")
+    parser.add_argument("--transcript-concurrency", type=int, default=BATCH_TRANSCRIPT_CONCURRENCY)
+    parser.add_argument("--summary-concurrency", type=int, default=BATCH_SUMMARY_CONCURRENCY)
+    parser.add_argument("--tts-concurrency", type=int, default=BATCH_TTS_CONCURRENCY)
+    args = parser.parse_args()
+    if not args.resume and not args.videos and not args.file and not args.playlist:
+        parser.error("give video IDs or links, --file, --playlist or --resume")
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        sys.exit(asyncio.run(run(args, output)))
+    except KeyboardInterrupt:
+        print("Interrupted; finished videos are saved and the batch can be resumed.", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()